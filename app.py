@@ -1,91 +1,205 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple, Union
 
 import dash
 import dash_bootstrap_components as dbc
-import pandas as pd
+import flask
+import numpy as np
 from dash.dependencies import ClientsideFunction, Input, Output, State
-
-from model import get_doubling_time_ts_df, corona_country_data, corona_table_data
+from dash.exceptions import PreventUpdate
+
+from model import (
+    DataNotLoaded,
+    DataSnapshot,
+    TrajectoryIndex,
+    get_doubling_time_series,
+    get_data_version,
+    data_store,
+)
+from model.derived import DEFAULT_WINDOW, metric_name
+from model.regions import PATH_SEPARATOR, RegionView
 from view import (
     layout_parent,
-    app_layout,
+    serve_layout,
     line_graph,
     GRAY,
     GRAY_TRANSP,
     get_color,
     title_mapping,
 )
+from view.api import api
+from view.figure_cache import FigureCache
+from view.metrics import PROMETHEUS_CONTENT_TYPE, CallbackMetrics
+from view.trace_compression import (
+    MAX_FRAME_POINTS,
+    MAX_TRACE_POINTS,
+    downsample_indices,
+    downsample_traces,
+    frame_days,
+    round_relative,
+)
 from view.utils import registered_popovers
 
 
-# this is the application/server
-app = dash.Dash(
-    __name__,
-    meta_tags=[{"name": "viewport", "content": "width=device-width"}],
-    external_stylesheets=[dbc.themes.LUX],
-)
-server = app.server
-app.layout = app_layout
+# most visitors land on the same default views, so keep recently built figures around
+figure_cache = FigureCache(get_data_version)
 
-# Create callback for resizing the charts
-app.clientside_callback(
-    ClientsideFunction(namespace="clientside", function_name="resize"),
-    Output("output-clientside", "children"),
-    [Input("count_graph", "figure")],
-)
+# latency and response size of every callback, served on /metrics
+callback_metrics = CallbackMetrics()
+
+# seconds after which clients should ask again while the data is loading
+RETRY_AFTER = 5
 
 
-@app.callback(
-    Output("count_graph", "figure"),
-    [
-        Input("countries", "value"),
-        Input("data_source", "value"),
-        Input("line_graph_view", "value"),
-        Input("line_graph_scaler", "value"),
-        Input("date_slider", "value"),
-        Input("count_graph", "hoverData"),
-    ],
-)
 def update_time_series(
     countries: List[str],
     data_source: str,
     line_graph_view: str,
+    since_threshold: float,
     line_graph_scaler: str,
     date_slider: int,
-    hover_data: dict,
-) -> Dict[str, List]:
-
+    trajectory_animate: List[str],
+    region: str = None,
+    smoothing_window: int = None,
+) -> Dict:
+    """Build the line graph figure. Hovering is handled in the browser, which recolors the lines of the trajectory
+    chart with `highlight_colors` (see assets/clientside.js), so mouse moves never reach the server."""
+
+    # only pass on inputs which affect the figure, so equivalent requests share a cache entry
     if line_graph_view == "trajectory":
-        return update_trajectory_chart(
-            countries, data_source, line_graph_scaler, date_slider, hover_data,
+        animate = "animate" in (trajectory_animate or [])
+        figure = update_trajectory_chart(
+            countries,
+            data_source,
+            line_graph_scaler,
+            None if animate else date_slider,
+            animate,
+            region or None,
+        )
+        names = dict.fromkeys(trace["name"] for trace in figure["data"])
+        return dict(
+            figure=figure,
+            highlight_colors={name: get_color(name) for name in names},
+            default_color=GRAY_TRANSP,
         )
 
+    if line_graph_view == "since_n" and since_threshold is None:
+        since_threshold = line_graph.DEFAULT_SINCE_THRESHOLD
+    elif line_graph_view == "since_n":
+        # the input only limits the value in the browser
+        since_threshold = max(since_threshold, 0)
+    elif line_graph_view != "since_n":
+        since_threshold = None
+    if line_graph_view in line_graph.SMOOTHED_VIEWS:
+        smoothing_window = smoothing_window or DEFAULT_WINDOW
+    else:
+        smoothing_window = None
+    figure = _build_time_series_chart(
+        countries,
+        data_source,
+        line_graph_view,
+        since_threshold,
+        line_graph_scaler,
+        region or None,
+        smoothing_window,
+    )
+    return dict(figure=figure)
+
+
+def _region_data(
+    countries: List[str], data_source: str, region: str = None
+) -> Tuple[Union[DataSnapshot, RegionView], List[str], str]:
+    """Return the data to plot, the names of the lines and a title suffix.
+
+    Without a region these are the snapshot, the selected countries and nothing. With a region, they are the data of
+    its subregions, the largest of them and the region's name. Regions without data for the source, like the US
+    counties without recovered cases, fall back to the countries.
+    """
+    snapshot = data_store.snapshot
+    if not region:
+        return snapshot, countries, ""
+    path = tuple(region.split(PATH_SEPARATOR))
+    view = snapshot.regions.view(path)
+    if view is None or data_source not in view.cube.sources:
+        return snapshot, countries, ""
+
+    # rank the subregions by their latest confirmed cases, for the same lines in every source
+    latest = np.nan_to_num(view.cube.matrix("confirmed", "cumulative")[:, -1])
+    largest = np.argsort(-latest, kind="stable")[: line_graph.FIRST_N_COUNTRIES]
+    return view, [view.cube.countries[i] for i in largest], " / ".join(path)
+
+
+@figure_cache.memoize
+def update_region_options(countries: List[str], region: str) -> List[Dict[str, str]]:
+    """Offer the current region with the regions above and below it, and the selected countries which have regions.
+
+    Only looks at the hierarchies loaded with the snapshot, the time series of a region are processed once it is viewed,
+    and the options are cached per data version along with the figures.
+    """
+    regions = data_store.snapshot.regions
+    paths = []
+    if region:
+        path = tuple(region.split(PATH_SEPARATOR))
+        paths += [path[: i + 1] for i in range(len(path))]
+        paths += regions.subregions(path)
+    paths += [(c,) for c in countries or [] if regions.has_subregions((c,))]
+    return [
+        {"label": " / ".join(path), "value": PATH_SEPARATOR.join(path)}
+        for path in dict.fromkeys(paths)
+    ]
+
+
+@figure_cache.memoize
+def _build_time_series_chart(
+    countries: List[str],
+    data_source: str,
+    line_graph_view: str,
+    since_threshold: float,
+    line_graph_scaler: str,
+    region: str = None,
+    smoothing_window: int = None,
+) -> Dict[str, List]:
+
+    data, countries, region_name = _region_data(countries, data_source, region)
+
     # special filtering for viewing "from n days setting"
-    if line_graph_view in ["since_100", "since_10"]:
-        df = get_doubling_time_ts_df(countries, line_graph_view, data_source)
-        countries += list(filter(lambda x: "double" in x, df.index))
-        x_vals = df.columns
+    if line_graph_view == "since_n":
+        names, values = get_doubling_time_series(
+            countries, since_threshold, data.threshold_indices[data_source]
+        )
+        x_vals = list(range(values.shape[1]))
     else:
-        df = corona_country_data[data_source][line_graph_view].copy()
-        x_vals = [x[:-3] for x in df.columns]
+        metric = line_graph_view
+        if smoothing_window:
+            metric = metric_name(line_graph_view, smoothing_window)
+        names, values = data.cube.select(data_source, metric, countries)
+        x_vals = data.cube.axis_labels
+
+    # long histories have more points than the chart has pixels, only send the ones that shape the lines
+    indices = downsample_indices(
+        np.arange(values.shape[1]), values, log_y=line_graph_scaler == "log"
+    )
 
     # popualte the data output field
-    data = []
-    for country in countries:
-        if country in df.index:
-            data.append(
-                dict(
-                    type="scatter",
-                    mode="lines",
-                    name=country,
-                    showlegend=True if "double" not in country else False,
-                    y=df.loc[country],
-                    x=x_vals,
-                    line=dict(shape="spline", smoothing="2", color=get_color(country),),
-                )
+    traces = []
+    for name, y, idx in zip(names, values, indices):
+        traces.append(
+            dict(
+                type="scatter",
+                mode="lines",
+                name=name,
+                showlegend=True if "double" not in name else False,
+                y=round_relative(y[idx]),
+                x=[x_vals[i] for i in idx],
+                line=dict(shape="spline", smoothing="2", color=get_color(name),),
             )
+        )
 
-    title = f"{title_mapping[data_source]} - {title_mapping[line_graph_view]}"
+    view_title = title_mapping[line_graph_view].format(since_threshold)
+    if smoothing_window:
+        view_title += f" ({smoothing_window} Day Average)"
+    title = f"{title_mapping[data_source]} - {view_title}"
+    if region_name:
+        title += f" in {region_name}"
     layout_count = {
         **layout_parent,
         "title": title,
@@ -101,69 +215,186 @@ def update_time_series(
             "spikethickness": 1,
         },
         "margin": {"l": 70, "b": 70, "r": 10, "t": 50},
+        # keep the zoom level while the figure updates, until the view itself changes
+        "uirevision": f"{data_source}-{line_graph_view}-{line_graph_scaler}",
     }
 
-    return dict(data=data, layout=layout_count)
+    return dict(data=traces, layout=layout_count)
+
+
+def _trajectory_traces(
+    names: List[str],
+    ids: np.ndarray,
+    trajectory: TrajectoryIndex,
+    day: int,
+    keep_empty: bool = False,
+    line_graph_scaler: str = None,
+    num_points: int = MAX_TRACE_POINTS,
+) -> List[Dict]:
+    """Return the line and scatter trace of each country, up to and including the day.
+
+    Countries without data above the minimum count are skipped, unless `keep_empty` is set, in which case they
+    get empty traces, so the traces line up between all frames of an animation. If the scaler of the axes is given,
+    long traces are downsampled to the `num_points` points which shape them on that scale.
+    """
+    traces = [trajectory.trace(country_id, day) for country_id in ids]
+    if line_graph_scaler:
+        log = line_graph_scaler == "log"
+        traces = downsample_traces(traces, num_points, log_x=log, log_y=log)
+
+    data = []
+    for country, (x, y) in zip(names, traces):
+        if not len(x) and not keep_empty:
+            continue
+        x, y = round_relative(x), round_relative(y)
+        data.append(
+            dict(
+                type="scatter",
+                mode="lines",
+                name=country,
+                y=y,
+                x=x,
+                customdata=country,
+                line=dict(shape="spline", smoothing="2", color=GRAY_TRANSP),
+                showlegend=False,
+            )
+        )
+        data.append(
+            dict(
+                type="scatter",
+                y=y[-1:],
+                x=x[-1:],
+                text=country,
+                name=country,
+                mode="markers+text",
+                textposition="top center",
+                showlegend=False,
+                marker={"size": 8, "color": get_color(country),},
+            ),
+        )
+    return data
+
+
+def _axis_range(values: np.ndarray, scaler: str) -> List[float]:
+    """Return a fixed axis range covering all values, so the axes don't jump between animation frames."""
+    if scaler == "log":
+        values = values[values > 0]
+        if not len(values):
+            return [0, 1]
+        return [np.log10(values.min()), np.log10(values.max()) + 0.1]
+    if not len(values):
+        return [0, 1]
+    return [min(values.min(), 0), values.max() * 1.05]
+
+
+def _animation_controls(frame_names: List[str]) -> Dict[str, List]:
+    """Return the play and pause buttons and the date slider of an animation, starting on the last frame."""
+    frame_args = {"frame": {"duration": 100, "redraw": False}, "mode": "immediate"}
+    pause_args = {"frame": {"duration": 0, "redraw": False}, "mode": "immediate"}
+    return {
+        "updatemenus": [
+            {
+                "type": "buttons",
+                "showactive": False,
+                "x": 0.05,
+                "y": 1.15,
+                "buttons": [
+                    {"label": "Play", "method": "animate", "args": [None, frame_args]},
+                    {
+                        "label": "Pause",
+                        "method": "animate",
+                        "args": [[None], pause_args],
+                    },
+                ],
+            }
+        ],
+        "sliders": [
+            {
+                "active": len(frame_names) - 1,
+                "currentvalue": {"prefix": "Date: "},
+                "steps": [
+                    {"label": name, "method": "animate", "args": [[name], frame_args]}
+                    for name in frame_names
+                ],
+            }
+        ],
+    }
 
 
+def _trajectory_animation(
+    names: List[str],
+    ids: np.ndarray,
+    trajectory: TrajectoryIndex,
+    dates: List[str],
+    line_graph_scaler: str,
+) -> Tuple[List[Dict], Dict]:
+    """Return the frames of the days, and the layout to play them in the browser without any further callbacks.
+
+    Every frame carries the traces up to its day, so the size of an animation grows with the number of frames times the
+    points per trace. Long periods get a frame every few days, and the traces of a frame are downsampled to fewer
+    points than a static chart.
+    """
+    days = frame_days(trajectory.first_visible_day(ids), len(dates))
+    frames = [
+        dict(
+            name=dates[day],
+            data=_trajectory_traces(
+                names,
+                ids,
+                trajectory,
+                day,
+                keep_empty=True,
+                line_graph_scaler=line_graph_scaler,
+                num_points=MAX_FRAME_POINTS,
+            ),
+        )
+        for day in days
+    ]
+
+    # fix the axes to the full extent of the data, so they don't jump between frames
+    last_traces = [trajectory.trace(i, len(dates) - 1) for i in ids]
+    all_x = np.concatenate([np.empty(0)] + [x for x, _ in last_traces])
+    all_y = np.concatenate([np.empty(0)] + [y for _, y in last_traces])
+
+    layout = {
+        "xaxis": {"range": _axis_range(all_x, line_graph_scaler)},
+        "yaxis": {"range": _axis_range(all_y, line_graph_scaler)},
+        **_animation_controls([frame["name"] for frame in frames]),
+    }
+    return frames, layout
+
+
+@figure_cache.memoize
 def update_trajectory_chart(
     countries: List[str],
     data_source: str,
     line_graph_scaler: str,
     date_slider: int,
-    hover_data,
+    animate: bool = False,
+    region: str = None,
 ) -> Dict[str, List]:
 
-    country_on_hover = None
-    if hover_data:
-        # divide by two because we are graphing two traces at at time (line and scatter)
-        idx = hover_data["points"][0]["curveNumber"] // 2
-        country_on_hover = countries[idx]
-
-    # ts data to operate on
-    df_cumulative = corona_country_data[data_source]["cumulative"]
-    df_daily = corona_country_data[data_source]["daily_increase"]
-    date = pd.to_datetime(df_cumulative.columns[date_slider])
+    # the trajectory of every country is precomputed once per data version, and of subregions once per region
+    region_data, countries, region_name = _region_data(countries, data_source, region)
+    cube = region_data.cube
+    trajectory = region_data.trajectories[data_source]
+    names, ids = cube.lookup(countries)
+    if animate or date_slider is None:
+        date_slider = cube.num_days - 1
+    # subregions may be reported over fewer days than the countries
+    date_slider = min(date_slider, cube.num_days - 1)
 
     # popualte the time series data output field.
     # if the date and minimum number of cases is exceeded, then plot the scatter and line trace.
-    data = []
-    for country in countries:
-        if country in df_cumulative.index:
-            x = df_cumulative.loc[country]
-            y = df_daily.loc[country]
-            index = (pd.to_datetime(x.index) <= date) & (x > 50)
-            trace_color = (
-                get_color(country) if country == country_on_hover else GRAY_TRANSP
-            )
-            if True in list(index):
-                data.append(
-                    dict(
-                        type="scatter",
-                        mode="lines",
-                        name=country,
-                        y=y[index],
-                        x=x[index],
-                        customdata=country,
-                        line=dict(shape="spline", smoothing="2", color=trace_color),
-                        showlegend=False,
-                    )
-                )
-                data.append(
-                    dict(
-                        type="scatter",
-                        y=[y[index].iloc[-1]],
-                        x=[x[index].iloc[-1]],
-                        text=country,
-                        name=country,
-                        mode="markers+text",
-                        textposition="top center",
-                        showlegend=False,
-                        marker={"size": 8, "color": get_color(country),},
-                    ),
-                )
-
-    title = f"Trajectory of Covid {title_mapping[data_source]} {df_cumulative.columns[date_slider - 1]}"
+    data = _trajectory_traces(
+        names, ids, trajectory, date_slider, animate, line_graph_scaler
+    )
+
+    title = f"Trajectory of Covid {title_mapping[data_source]}"
+    if region_name:
+        title += f" in {region_name}"
+    if not animate:
+        title += f" {cube.date_labels[date_slider]}"
     layout_count = {
         **layout_parent,
         "autosize": False,
@@ -181,23 +412,20 @@ def update_trajectory_chart(
             "spikethickness": 1,
         },
         "margin": {"l": 70, "b": 70, "r": 10, "t": 50},
+        "uirevision": f"{data_source}-trajectory-{line_graph_scaler}",
     }
+    if not animate:
+        return dict(data=data, layout=layout_count)
 
-    return dict(data=data, layout=layout_count)
+    frames, animation_layout = _trajectory_animation(
+        names, ids, trajectory, cube.date_labels, line_graph_scaler
+    )
+    for axis in ["xaxis", "yaxis"]:
+        layout_count[axis].update(animation_layout.pop(axis))
+    layout_count.update(animation_layout)
+    return dict(data=data, layout=layout_count, frames=frames)
 
 
-@app.callback(
-    Output("scatter_plot", "figure"),
-    [
-        Input("countries", "value"),
-        Input("scatter_x_data", "value"),
-        Input("scatter_y_data", "value"),
-        Input("scatter_x_scaler", "value"),
-        Input("scatter_y_scaler", "value"),
-        Input("min_cases_thresh", "value"),
-        Input("show_labels", "value"),
-    ],
-)
 def update_scatter_plot(
     countries: List[str],
     x_axis: str,
@@ -206,11 +434,67 @@ def update_scatter_plot(
     y_scaler: str,
     min_cases_thresh: str,
     show_labels: str,
+    scatter_animate: List[str] = None,
+):
+    return _build_scatter_plot(
+        countries,
+        x_axis,
+        y_axis,
+        x_scaler,
+        y_scaler,
+        int(min_cases_thresh),
+        show_labels,
+        "animate" in (scatter_animate or []),
+    )
+
+
+@figure_cache.memoize
+def _build_scatter_plot(
+    countries: List[str],
+    x_axis: str,
+    y_axis: str,
+    x_scaler: str,
+    y_scaler: str,
+    min_cases_thresh: int,
+    show_labels: str,
+    animate: bool = False,
 ):
-    df = corona_table_data[corona_table_data["Total Cases"] > int(min_cases_thresh)]
+    layout_scatter = {
+        **layout_parent,
+        "title": f"{y_axis} vs. {x_axis}",
+        "xaxis": {
+            "title": f"{x_axis} {title_mapping[x_scaler]}",
+            "type": x_scaler,
+            "showspikes": True,
+            "spikethickness": 1,
+        },
+        "yaxis": {
+            "title": f"{y_axis} {title_mapping[y_scaler]}",
+            "type": y_scaler,
+            "showspikes": True,
+            "spikethickness": 1,
+        },
+        "margin": {"l": 70, "b": 70, "r": 10, "t": 50},
+        "textposition": "top center",
+    }
+    if animate:
+        data, frames, animation_layout = _scatter_animation(
+            countries, x_axis, y_axis, x_scaler, y_scaler, min_cases_thresh, show_labels
+        )
+        for axis in ["xaxis", "yaxis"]:
+            layout_scatter[axis].update(animation_layout.pop(axis))
+        layout_scatter.update(animation_layout)
+        return dict(data=data, layout=layout_scatter, frames=frames)
+
+    snapshot = data_store.snapshot
+    corona_table_data = snapshot.corona_table_data
+    rows = corona_table_data["Total Cases"].to_numpy() > min_cases_thresh
+    df = corona_table_data[rows]
     names = df["Country"] if show_labels else countries
-    colors = list(
-        map(lambda x: get_color(x) if x in countries else GRAY, df["Country"])
+    colors = snapshot.countries.colors_of(
+        snapshot.countries.table_ids[rows],
+        snapshot.countries.lookup(countries or []),
+        GRAY,
     )
     data = [
         dict(
@@ -230,51 +514,170 @@ def update_scatter_plot(
             },
         )
     ]
+    return dict(data=data, layout=layout_scatter)
 
-    layout_scatter = {
+
+def _scatter_animation(
+    countries: List[str],
+    x_axis: str,
+    y_axis: str,
+    x_scaler: str,
+    y_scaler: str,
+    min_cases_thresh: int,
+    show_labels: str,
+) -> Tuple[List[Dict], List[Dict], Dict]:
+    """Return the scatter trace of the last day, the frames of the days and the layout to play them in the browser.
+
+    The columns are the JHU time series where there is one (see model/table_series.py), so the values of all countries
+    on all days come out of two country x date arrays at once. A country is hidden on the days it has no more than the
+    minimum number of cases. Frames only carry the positions, the names and colors of the points stay the same. Like
+    the trajectory animation, long periods get a frame every few days, and beyond `MAX_FRAME_POINTS` countries only the
+    selected ones and those with the most cases are shown.
+    """
+    snapshot = data_store.snapshot
+    series = snapshot.table_series
+    highlighted = np.isin(series.cube_ids, snapshot.countries.lookup(countries or []))
+    rows = np.arange(len(series.names))
+    if MAX_FRAME_POINTS and len(rows) > MAX_FRAME_POINTS:
+        latest = np.nan_to_num(series.column("Total Cases")[:, -1], nan=-np.inf)
+        rows = np.sort(np.lexsort((-latest, ~highlighted))[:MAX_FRAME_POINTS])
+
+    hidden = ~(series.column("Total Cases")[rows] > min_cases_thresh)
+    x = round_relative(np.where(hidden, np.nan, series.column(x_axis)[rows]))
+    y = round_relative(np.where(hidden, np.nan, series.column(y_axis)[rows]))
+    highlighted = highlighted[rows]
+    names = [series.names[i] for i in rows]
+    colors = np.where(
+        highlighted, snapshot.countries.colors[series.cube_ids[rows]], GRAY
+    )
+    text = np.where(highlighted | bool(show_labels), names, "")
+    dates = snapshot.cube.date_labels
+    visible_days = np.flatnonzero((~hidden).any(axis=0))
+    first_day = visible_days[0] if len(visible_days) else len(dates) - 1
+    days = frame_days(first_day, len(dates))
+
+    # one conversion of each array, the frames take their columns
+    x_days, y_days = x[:, days].T.tolist(), y[:, days].T.tolist()
+    frames = [
+        dict(name=dates[day], data=[dict(x=x_days[i], y=y_days[i])])
+        for i, day in enumerate(days)
+    ]
+    data = [
+        dict(
+            type="scatter",
+            y=y_days[-1],
+            x=x_days[-1],
+            text=text.tolist(),
+            name="",
+            hovertext=names,
+            hoverinfo="text+x+y",
+            mode="markers+text",
+            textposition="top center",
+            showlegend=False,
+            marker={
+                "size": 8,
+                "opacity": 1,
+                "line": {"width": 0.5, "color": "white"},
+                "color": colors.tolist(),
+            },
+        )
+    ]
+    layout = {
+        "xaxis": {"range": _axis_range(x[np.isfinite(x)], x_scaler)},
+        "yaxis": {"range": _axis_range(y[np.isfinite(y)], y_scaler)},
+        **_animation_controls([frame["name"] for frame in frames]),
+    }
+    return data, frames, layout
+
+
+@figure_cache.memoize
+def update_world_map(data_source: str, metric: str, map_scaler: str) -> Dict:
+    """Build the map without values, only for another source, metric or scaling. The values of the date picked on the
+    slider come from `update_world_map_values`, and are filled in by the browser (see assets/clientside.js)."""
+    world_map = data_store.snapshot.world_map
+    log = map_scaler == "log"
+    zmin, zmax = world_map.color_range(data_source, metric, log)
+    colorbar = {"thickness": 15}
+    if log:
+        powers = range(int(np.floor(zmin)), int(np.ceil(zmax)) + 1)
+        colorbar.update(
+            tickvals=list(powers),
+            ticktext=[f"{10.0 ** p:,.{max(-p, 0)}f}" for p in powers],
+        )
+    data = [
+        dict(
+            type="choropleth",
+            locations=world_map.locations,
+            locationmode="ISO-3",
+            text=world_map.names,
+            z=[],
+            zmin=zmin,
+            zmax=zmax,
+            colorscale="Reds",
+            colorbar=colorbar,
+            marker={"line": {"width": 0.5, "color": "white"}},
+            hovertemplate="%{text}: %{customdata:,.2f}<extra></extra>",
+        )
+    ]
+    layout_map = {
         **layout_parent,
-        "title": f"{y_axis} vs. {x_axis}",
-        "xaxis": {
-            "title": f"{x_axis} {title_mapping[x_scaler]}",
-            "type": x_scaler,
-            "showspikes": True,
-            "spikethickness": 1,
+        "geo": {
+            "showframe": False,
+            "showcoastlines": False,
+            "projection": {"type": "natural earth"},
         },
-        "yaxis": {
-            "title": f"{y_axis} {title_mapping[y_scaler]}",
-            "type": y_scaler,
-            "showspikes": True,
-            "spikethickness": 1,
-        },
-        "margin": {"l": 70, "b": 70, "r": 10, "t": 50},
-        "textposition": "top center",
+        "margin": {"l": 10, "b": 10, "r": 10, "t": 50},
+        "uirevision": "world_map",
+    }
+    return {"figure": dict(data=data, layout=layout_map), "log": log}
+
+
+@figure_cache.memoize
+def update_world_map_values(data_source: str, metric: str, date_slider: int) -> Dict:
+    """Return the values of every country on the map for one date, the only data a move of the date slider sends."""
+    snapshot = data_store.snapshot
+    cube = snapshot.cube
+    last_day = cube.num_days - 1
+    day = last_day if date_slider is None else min(date_slider, last_day)
+    values = round_relative(snapshot.world_map.day(data_source, metric, day))
+    title = f"{title_mapping[metric]} {title_mapping[data_source]}"
+    return {
+        "z": np.where(np.isfinite(values), values, None).tolist(),
+        "title": f"{title} {cube.date_labels[day]}",
     }
-    return dict(data=data, layout=layout_scatter)
 
 
-@app.callback(
-    [Output("data_table", "selected_rows"), Output("data_table", "data")],
-    [Input("countries", "value")],
-)
-def update_table_selection_from_country_dropdown(countries: List[str]):
-    """Update the Data Table selection and sorting, based on the country dropdown."""
-
-    # move selected countries to top of table
-    df = corona_table_data.copy()
-    df["new"] = list(range(1, len(df) + 1))
-    df.loc[df[df.Country.isin(countries)].index, "new"] = 0
-    df = df.sort_values(["new", "Total Cases"], ascending=[True, False])
-    df = df.drop("new", axis=1)
-    return [
-        list(range(len(countries))),
-        df.to_dict("records"),
-    ]
+def update_table_page(
+    countries: List[str],
+    sort_by: List[Dict[str, str]],
+    filter_query: str,
+    page_current: int,
+    page_size: int,
+):
+    """Return the visible page of the Data Table, with the countries from the dropdown selected and moved to the top.
+
+    Paging, sorting and filtering happen on the server, using the sort orders precomputed for each column. A page past
+    the last one returns the last page, which `correct_table_page` then moves the table to.
+    """
+    records, selected_rows, page_count, _ = data_store.snapshot.table_index.query(
+        countries or [], sort_by or [], filter_query, page_current or 0, page_size
+    )
+    return records, selected_rows, page_count
+
+
+def correct_table_page(filter_query: str, page_size: int, page_current: int) -> int:
+    """Move the Data Table to its last page if filtering or a larger page size left it past the last one.
+
+    The page is an input of `update_table_page`, so it can't be one of its outputs too.
+    """
+    page = data_store.snapshot.table_index.query(
+        [], [], filter_query, page_current or 0, page_size
+    )[-1]
+    if page == page_current:
+        raise PreventUpdate
+    return page
 
 
-@app.callback(
-    dash.dependencies.Output("line_graph_view", "options"),
-    [dash.dependencies.Input("data_source", "value")],
-)
 def hide_cases_since_dropdowns_if_case_fatalit_set(value: str):
     if value == "case_fatality":
         return line_graph.line_graph_view_options[:3]
@@ -282,10 +685,6 @@ def hide_cases_since_dropdowns_if_case_fatalit_set(value: str):
         return line_graph.line_graph_view_options
 
 
-@app.callback(
-    dash.dependencies.Output("date_slider_div", "style"),
-    [dash.dependencies.Input("line_graph_view", "value")],
-)
 def hide_date_slider_if_trajectory_not_set(value: str):
     if value == "trajectory":
         return {"display": "block"}
@@ -293,6 +692,57 @@ def hide_date_slider_if_trajectory_not_set(value: str):
         return {"display": "none"}
 
 
+def hide_since_threshold_if_since_not_set(value: str):
+    if value == "since_n":
+        return {"display": "block"}
+    else:
+        return {"display": "none"}
+
+
+def hide_smoothing_window_if_not_smoothed(value: str):
+    if value in line_graph.SMOOTHED_VIEWS:
+        return {"display": "block"}
+    else:
+        return {"display": "none"}
+
+
+def data_status():
+    """Report which data version is served and when it was last refreshed."""
+    return flask.jsonify(data_store.status())
+
+
+def metrics():
+    """Callback latency and response size histograms and figure cache counters, in the Prometheus text format."""
+    return flask.Response(
+        callback_metrics.render({"figure": figure_cache}),
+        content_type=PROMETHEUS_CONTENT_TYPE,
+    )
+
+
+def liveness():
+    """The process is up and serving requests, whether or not the data is loaded yet."""
+    return flask.jsonify(alive=True)
+
+
+def readiness():
+    """Ready to serve the app once the data is loaded, which the first check starts in the background."""
+    if not data_store.is_loaded:
+        return not_loaded()
+    return flask.jsonify(data_store.status())
+
+
+def not_loaded(e: DataNotLoaded = None):
+    """Answer requests for data with 503 until it is loaded, which this starts in the background.
+
+    Request threads never load the data themselves, so a slow or unreachable data source can't block them.
+    """
+    data_store.start(block=False)
+    response = flask.jsonify(data_store.status())
+    response.status_code = 503
+    response.headers["Retry-After"] = str(RETRY_AFTER)
+    return response
+
+
 # dynamically create callbacks for each about-info popover we created
 def _toggle_popover(n, is_open):
     if n:
@@ -300,12 +750,157 @@ def _toggle_popover(n, is_open):
     return is_open
 
 
-for p in registered_popovers:
+def create_app() -> dash.Dash:
+    """Create the app with all its callbacks and routes, without loading any data.
+
+    The layout is a function, so the data only starts loading in the background on the first page load or request
+    for data, or explicitly with `data_store.start()`. Until then the page polls the server and reloads itself once the data is there.
+    """
+    app = dash.Dash(
+        __name__,
+        meta_tags=[{"name": "viewport", "content": "width=device-width"}],
+        external_stylesheets=[dbc.themes.LUX],
+        # the ids of the callbacks are validated against the layout, which would load the data
+        suppress_callback_exceptions=True,
+    )
+    server = app.server
+
+    # Create callback for resizing the charts
+    app.clientside_callback(
+        ClientsideFunction(namespace="clientside", function_name="resize"),
+        Output("output-clientside", "children"),
+        [Input("count_graph", "figure")],
+    )
+
+    # Highlight the hovered country in the browser, from the figure stored by update_time_series
+    app.clientside_callback(
+        ClientsideFunction(namespace="trajectory", function_name="highlight_hovered"),
+        Output("count_graph", "figure"),
+        [Input("count_graph_data", "data"), Input("count_graph", "hoverData")],
+    )
+
+    app.callback(
+        Output("count_graph_data", "data"),
+        [
+            Input("countries", "value"),
+            Input("data_source", "value"),
+            Input("line_graph_view", "value"),
+            Input("since_threshold", "value"),
+            Input("line_graph_scaler", "value"),
+            Input("date_slider", "value"),
+            Input("trajectory_animate", "value"),
+            Input("region", "value"),
+            Input("smoothing_window", "value"),
+        ],
+    )(update_time_series)
+    app.callback(
+        Output("region", "options"),
+        [Input("countries", "value"), Input("region", "value")],
+    )(update_region_options)
+    # the map is built once per metric, and the browser fills in the values of the date on the slider
+    app.callback(
+        Output("world_map_base", "data"),
+        [
+            Input("map_data_source", "value"),
+            Input("map_metric", "value"),
+            Input("map_scaler", "value"),
+        ],
+    )(update_world_map)
+    app.callback(
+        Output("world_map_values", "data"),
+        [
+            Input("map_data_source", "value"),
+            Input("map_metric", "value"),
+            Input("map_date_slider", "value"),
+        ],
+    )(update_world_map_values)
+    app.clientside_callback(
+        ClientsideFunction(namespace="world_map", function_name="fill_values"),
+        Output("world_map", "figure"),
+        [Input("world_map_base", "data"), Input("world_map_values", "data")],
+    )
+    app.callback(
+        Output("scatter_plot", "figure"),
+        [
+            Input("countries", "value"),
+            Input("scatter_x_data", "value"),
+            Input("scatter_y_data", "value"),
+            Input("scatter_x_scaler", "value"),
+            Input("scatter_y_scaler", "value"),
+            Input("min_cases_thresh", "value"),
+            Input("show_labels", "value"),
+            Input("scatter_animate", "value"),
+        ],
+    )(update_scatter_plot)
+    app.callback(
+        [
+            Output("data_table", "data"),
+            Output("data_table", "selected_rows"),
+            Output("data_table", "page_count"),
+        ],
+        [
+            Input("countries", "value"),
+            Input("data_table", "sort_by"),
+            Input("data_table", "filter_query"),
+            Input("data_table", "page_current"),
+            Input("data_table", "page_size"),
+        ],
+    )(update_table_page)
+    app.callback(
+        Output("data_table", "page_current"),
+        [Input("data_table", "filter_query"), Input("data_table", "page_size")],
+        [State("data_table", "page_current")],
+    )(correct_table_page)
+    app.callback(
+        Output("line_graph_view", "options"), [Input("data_source", "value")],
+    )(hide_cases_since_dropdowns_if_case_fatalit_set)
     app.callback(
-        Output(f"popover-{p}", "is_open"),
-        [Input(f"popover-target-{p}", "n_clicks")],
-        [State(f"popover-{p}", "is_open")],
-    )(_toggle_popover)
+        Output("date_slider_div", "style"), [Input("line_graph_view", "value")],
+    )(hide_date_slider_if_trajectory_not_set)
+    app.callback(
+        Output("since_threshold_div", "style"), [Input("line_graph_view", "value")],
+    )(hide_since_threshold_if_since_not_set)
+    app.callback(
+        Output("smoothing_window_div", "style"), [Input("line_graph_view", "value")],
+    )(hide_smoothing_window_if_not_smoothed)
+
+    for p in registered_popovers:
+        app.callback(
+            Output(f"popover-{p}", "is_open"),
+            [Input(f"popover-target-{p}", "n_clicks")],
+            [State(f"popover-{p}", "is_open")],
+        )(_toggle_popover)
+
+    # reload the page served while loading, once the data is loaded
+    def _reload_when_loaded(n_intervals: int) -> str:
+        if not data_store.is_loaded:
+            raise PreventUpdate
+        return app.config.requests_pathname_prefix
+
+    app.callback(
+        Output("loading_location", "href"), [Input("loading_interval", "n_intervals")],
+    )(_reload_when_loaded)
+
+    server.route("/status")(data_status)
+    server.route("/metrics")(metrics)
+    server.route("/live")(liveness)
+    server.route("/ready")(readiness)
+    server.register_blueprint(api)
+    # the API and the callbacks read the data, until it is loaded they answer like /ready
+    server.register_error_handler(DataNotLoaded, not_loaded)
+
+    # after all callbacks are registered, including the popover ones above
+    callback_metrics.instrument(app)
+
+    # set last, Dash builds the layout to validate callbacks registered after it
+    app.layout = serve_layout
+    return app
+
+
+# this is the application/server
+app = create_app()
+server = app.server
 
 if __name__ == "__main__":
+    data_store.start(block=False)
     app.run_server(debug=True, port=8001)
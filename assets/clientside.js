@@ -0,0 +1,47 @@
+// Callbacks which run in the browser, registered in app.py with ClientsideFunction
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    trajectory: {
+        // Color the line of the hovered country, and gray out all the others.
+        // Only the line colors change, so hovering never triggers a request to the server.
+        highlight_hovered: function(stored, hoverData) {
+            if (!stored) {
+                return {};
+            }
+            var figure = stored.figure;
+            var colors = stored.highlight_colors;
+            if (!colors || !hoverData || !hoverData.points.length) {
+                return figure;
+            }
+
+            var hovered = figure.data[hoverData.points[0].curveNumber];
+            var hoveredName = hovered ? hovered.name : null;
+            var data = figure.data.map(function(trace) {
+                if (trace.mode !== "lines" || !(trace.name in colors)) {
+                    return trace;
+                }
+                var color = trace.name === hoveredName ? colors[trace.name] : stored.default_color;
+                return Object.assign({}, trace, {line: Object.assign({}, trace.line, {color: color})});
+            });
+            return Object.assign({}, figure, {data: data});
+        }
+    },
+    world_map: {
+        // Fill the values of the date on the slider into the map, which is only rebuilt for another metric.
+        // Values are colored by their log10 on the log scale, and always shown as they are when hovered.
+        fill_values: function(base, values) {
+            if (!base || !values) {
+                return {};
+            }
+            var figure = base.figure;
+            var z = values.z.map(function(value) {
+                if (!base.log || value === null) {
+                    return value;
+                }
+                return value > 0 ? Math.log10(value) : null;
+            });
+            var trace = Object.assign({}, figure.data[0], {z: z, customdata: values.z});
+            var layout = Object.assign({}, figure.layout, {title: values.title});
+            return Object.assign({}, figure, {data: [trace], layout: layout});
+        }
+    }
+});
@@ -0,0 +1,161 @@
+"""Serve data source files over local HTTP, to fetch and benchmark the whole ingestion without network access.
+
+    python -m benchmarks.synthetic dataset
+    python -m benchmarks.stub_server dataset --port 8002
+    JHU_URL=http://127.0.0.1:8002/jhu python app.py
+
+Files are served with an ETag and Last-Modified header, and conditional requests for unchanged files are answered with
+304. `--failures` answers the first requests of every path with 503, to see the retries at work, and `--latency` delays
+every response, like a distant server.
+"""
+import argparse
+import email.utils
+import hashlib
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+
+class StubServer:
+    """Local HTTP server for the files under a directory and extra in-memory pages, in a background thread.
+
+    Paths ending with "/" serve the `index.html` of the directory. Use it as a context manager, `url` is the base URL
+    of the started server and `requests` counts the responses by path and status.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        pages: Optional[Dict[str, bytes]] = None,
+        port: int = 0,
+        latency: float = 0.0,
+        failures: int = 0,
+    ):
+        self.directory = os.path.realpath(directory)
+        self.pages = pages or {}
+        self.latency = latency
+        self.failures = failures
+        self.requests = Counter()  # type: Counter
+        self._lock = threading.Lock()
+        self._modified = time.time()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None  # type: Optional[threading.Thread]
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _content(self, path: str) -> Optional[Tuple[bytes, float]]:
+        """Return the content of a path and the time it was last modified, or None if there is nothing at the path."""
+        path = path.split("?", 1)[0]
+        if path in self.pages:
+            return self.pages[path], self._modified
+        if path.endswith("/"):
+            path += "index.html"
+        file_path = os.path.realpath(os.path.join(self.directory, path.lstrip("/")))
+        if not file_path.startswith(self.directory + os.sep) or not os.path.isfile(
+            file_path
+        ):
+            return None
+        with open(file_path, "rb") as f:
+            return f.read(), os.path.getmtime(file_path)
+
+    def _requests_of(self, path: str) -> int:
+        with self._lock:
+            return sum(n for (p, _), n in self.requests.items() if p == path)
+
+    def _count(self, path: str, status: int):
+        with self._lock:
+            self.requests[(path, status)] += 1
+
+    def _handler(self) -> type:
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            # keep connections open, like the servers of the data sources
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                time.sleep(stub.latency)
+                if stub._requests_of(self.path) < stub.failures:
+                    self._respond(503, {"Retry-After": "0"})
+                    return
+
+                content = stub._content(self.path)
+                if content is None:
+                    self._respond(404)
+                    return
+                body, modified = content
+                etag = '"{}"'.format(hashlib.sha256(body).hexdigest()[:32])
+                headers = {
+                    "ETag": etag,
+                    "Last-Modified": email.utils.formatdate(modified, usegmt=True),
+                }
+                if self._not_modified(etag, modified):
+                    self._respond(304, headers)
+                else:
+                    self._respond(200, headers, body)
+
+            def _not_modified(self, etag: str, modified: float) -> bool:
+                # an ETag takes precedence over the date, like in RFC 7232
+                if "If-None-Match" in self.headers:
+                    return etag in self.headers["If-None-Match"]
+                since = self.headers.get("If-Modified-Since")
+                if since:
+                    since = email.utils.parsedate_to_datetime(since).timestamp()
+                    return int(modified) <= since
+                return False
+
+            def _respond(self, status: int, headers: Dict = None, body: bytes = b""):
+                stub._count(self.path, status)
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                if status != 304:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return _Handler
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("directory", help="directory with the files to serve")
+    arg_parser.add_argument("--port", type=int, default=8002)
+    arg_parser.add_argument("--latency", type=float, default=0.0)
+    arg_parser.add_argument("--failures", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    with StubServer(
+        args.directory, port=args.port, latency=args.latency, failures=args.failures
+    ) as server:
+        print(f"Serving {server.directory} on {server.url}, stop with Ctrl+C")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
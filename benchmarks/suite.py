@@ -0,0 +1,366 @@
+"""Benchmark the data ingestion, derived metrics and Dash callbacks on a synthetic data set.
+
+    python -m benchmarks.suite --regions 200 --days 100
+    python -m benchmarks.suite --regions 5000 --days 3000 --number 3 --compare benchmarks/results/<previous>.json
+    python -m benchmarks.suite --regions 200 --days 1000 --counties 3300
+
+The data set is generated with `benchmarks.synthetic`. Every run is saved as json to `benchmarks/results`, and with
+`--compare` the median timings are checked against a previous run. The exit code is 1 if anything got slower than
+`--threshold` times the previous median.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_dataset
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+
+# differences below this are timer noise, never report them as regressions
+NOISE_MS = 0.5
+
+
+def measure(fn: Callable[[], Any], number: int) -> Dict[str, float]:
+    """Call the function `number` times and return the min, median and mean duration in milliseconds."""
+    durations = []
+    for _ in range(number):
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1e3)
+    return {
+        "min_ms": min(durations),
+        "median_ms": statistics.median(durations),
+        "mean_ms": statistics.mean(durations),
+        "number": number,
+    }
+
+
+def _single(start: float) -> Dict[str, float]:
+    """Return the timing of something which only runs once, like an import, since the start time."""
+    duration = (time.perf_counter() - start) * 1e3
+    return {"min_ms": duration, "median_ms": duration, "mean_ms": duration, "number": 1}
+
+
+def run_suite(directory: str, number: int) -> Dict[str, Dict[str, float]]:
+    """Run all benchmarks on the synthetic data set in the directory.
+
+    The app loads its data and assets relative to the working directory and from `JHU_DATA_DIR`, so both are pointed to
+    the data set before the first import of the app modules.
+    """
+    os.environ["JHU_DATA_DIR"] = os.path.join(directory, "jhu")
+    if not os.path.exists(os.path.join(directory, "assets")):
+        os.symlink(os.path.join(REPO_DIR, "assets"), os.path.join(directory, "assets"))
+    os.chdir(directory)
+    results = {}
+
+    def _record(name: str, timing: Dict[str, float]):
+        results[name] = timing
+        print(f"{name:>50}: {timing['median_ms']:10.1f} ms")
+
+    def _run(name: str, fn: Callable[[], Any]):
+        _record(name, measure(fn, number))
+
+    start = time.perf_counter()
+    import model
+
+    _record("startup/import_model", _single(start))
+
+    # the first load reads all data sources, and fills the JHU disk cache
+    start = time.perf_counter()
+    model.data_store.start()
+    _record("startup/load_data", _single(start))
+
+    from model.cssegisand_data import (
+        ThresholdIndex,
+        _get_time_series_data,
+        get_cached_time_series_data,
+        get_doubling_time_series,
+        get_jhu_sources,
+    )
+    from model.cube import TimeSeriesCube
+    from model.regions import US, RegionData
+    from model.store import load_snapshot
+    from model.table_index import TableIndex
+    from model.trajectory import TrajectoryIndex
+
+    jhu_sources = get_jhu_sources()
+    for name, path in jhu_sources.items():
+        _run(f"ingestion/{name}", lambda: _get_time_series_data(path))
+        _run(
+            f"ingestion/{name}_disk_cache",
+            lambda: get_cached_time_series_data(name, path),
+        )
+    _run("ingestion/load_snapshot", load_snapshot)
+    _run_http_ingestion(directory, jhu_sources, _run)
+
+    frames = {
+        name: get_cached_time_series_data(name, path)
+        for name, path in jhu_sources.items()
+    }
+    _run("derived/time_series_cube", lambda: TimeSeriesCube.from_frames(frames))
+    # each metric on a fresh cube, so it is computed together with all it depends on
+    for source, metric in [
+        ("confirmed", "daily_increase"),
+        ("confirmed", "growth"),
+        ("case_fatality", "cumulative"),
+        ("active_cases", "daily_increase"),
+    ]:
+        _run(
+            f"derived/{source}_{metric}",
+            lambda: TimeSeriesCube.from_frames(frames).matrix(source, metric),
+        )
+    # a refresh which adds a day, extending the metrics of the previous version
+    refresh_metrics = [
+        ("confirmed", "daily_increase"),
+        ("confirmed", "growth"),
+        ("case_fatality", "daily_increase"),
+        ("active_cases", "growth"),
+    ]
+    previous = TimeSeriesCube.from_frames(
+        {name: df.iloc[:, :-1] for name, df in frames.items()}
+    )
+    for source, metric in refresh_metrics:
+        previous.matrix(source, metric)
+    _run("derived/reuse", lambda: TimeSeriesCube.from_frames(frames).reuse(previous))
+
+    snapshot = model.data_store.snapshot
+    cube = snapshot.cube
+    _run("derived/threshold_index", lambda: ThresholdIndex(cube, "confirmed"))
+    _run("derived/trajectory_index", lambda: TrajectoryIndex(cube, "confirmed"))
+    _run("derived/table_index", lambda: TableIndex(snapshot.corona_table_data))
+    countries = list(snapshot.corona_table_data["Country"].iloc[:12])
+    threshold_index = snapshot.threshold_indices["confirmed"]
+    _run(
+        "derived/doubling_time_series",
+        lambda: get_doubling_time_series(countries, 100, threshold_index),
+    )
+    # the county level US data, only generated with --counties
+    region = None
+    if snapshot.regions.has_subregions((US,)):
+        region = US
+        _run("derived/region_view_us", lambda: RegionData().load().view((US,)))
+
+    start = time.perf_counter()
+    import app
+
+    _record("startup/import_app", _single(start))
+    _run_callbacks(app, _run, countries, cube.num_days, region)
+    return results
+
+
+def _run_http_ingestion(directory: str, jhu_sources: Dict[str, str], _run: Callable):
+    """Time fetching the JHU files from a local server, in full, unchanged and into the disk cache."""
+    from benchmarks.stub_server import StubServer
+    from model.cssegisand_data import get_cached_time_series_data
+    from model.fetch import HttpFetcher, http_fetcher
+
+    with StubServer(directory) as server:
+        for name, path in jhu_sources.items():
+            url = f"{server.url}/jhu/{os.path.basename(path)}"
+            # a new session has to connect first
+            _run(f"ingestion/http_{name}", lambda: HttpFetcher().get(url))
+            fetcher = HttpFetcher()
+            fetcher.get(url)
+            _run(f"ingestion/http_{name}_not_modified", lambda: fetcher.get(url))
+            _run(
+                f"ingestion/http_{name}_disk_cache",
+                lambda: get_cached_time_series_data(name, url),
+            )
+        http_fetcher.clear()
+
+
+def _run_callbacks(
+    app, _run: Callable, countries: List[str], num_days: int, region: str = None
+):
+    """Time every callback of the app called directly, with the figure cache cleared before each call."""
+
+    def _uncached(fn: Callable, *args) -> Callable[[], Any]:
+        def _call():
+            app.figure_cache.clear()
+            return fn(*args)
+
+        return _call
+
+    line_graph_args = {
+        "cumulative": ("cumulative", 100, "log", num_days - 1, []),
+        "daily_increase": ("daily_increase", 100, "log", num_days - 1, []),
+        "since_n": ("since_n", 100, "log", num_days - 1, []),
+        "trajectory": ("trajectory", 100, "log", num_days - 1, []),
+        "trajectory_animated": ("trajectory", 100, "log", num_days - 1, ["animate"]),
+    }
+    for name, (view, *args) in line_graph_args.items():
+        _run(
+            f"callback/update_time_series/{name}",
+            _uncached(app.update_time_series, countries, "confirmed", view, *args),
+        )
+    if region:
+        for name in ["cumulative", "trajectory"]:
+            view, *args = line_graph_args[name]
+            _run(
+                f"callback/update_time_series/region_{name}",
+                _uncached(
+                    app.update_time_series, countries, "confirmed", view, *args, region
+                ),
+            )
+        _run(
+            "callback/update_region_options",
+            _uncached(app.update_region_options, countries, region),
+        )
+    cached = app.update_time_series
+    _run(
+        "callback/update_time_series/cumulative_cached",
+        lambda: cached(countries, "confirmed", "cumulative", 100, "log", 0, []),
+    )
+
+    _run(
+        "callback/update_scatter_plot",
+        _uncached(
+            app.update_scatter_plot,
+            countries,
+            "Total Cases",
+            "Total Deaths",
+            "log",
+            "log",
+            "100",
+            [],
+        ),
+    )
+    _run(
+        "callback/update_table_page",
+        _uncached(app.update_table_page, countries, [], "", 0, 50),
+    )
+    _run(
+        "callback/update_table_page/sorted_filtered",
+        _uncached(
+            app.update_table_page,
+            countries,
+            [{"column_id": "Total Deaths", "direction": "desc"}],
+            "{Total Cases} > 100 && {Country} contains 1",
+            1,
+            50,
+        ),
+    )
+    _run(
+        "callback/hide_cases_since_dropdowns",
+        _uncached(app.hide_cases_since_dropdowns_if_case_fatalit_set, "confirmed"),
+    )
+    _run(
+        "callback/hide_date_slider",
+        _uncached(app.hide_date_slider_if_trajectory_not_set, "trajectory"),
+    )
+    _run(
+        "callback/hide_since_threshold",
+        _uncached(app.hide_since_threshold_if_since_not_set, "since_n"),
+    )
+    _run("callback/toggle_popover", _uncached(app._toggle_popover, 1, False))
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(previous: Dict, current: Dict, threshold: float = 1.2) -> List[str]:
+    """Print the median timings next to a previous run and return the benchmarks which got slower than the threshold."""
+    if previous["meta"]["scale"] != current["meta"]["scale"]:
+        print(
+            f"Warning: comparing different scales {previous['meta']['scale']}"
+            f" and {current['meta']['scale']}"
+        )
+
+    regressions = []
+    print(f"\n{'benchmark':>50}  {'previous':>10}  {'current':>10}  ratio")
+    for name, result in current["results"].items():
+        if name not in previous["results"]:
+            continue
+        before = previous["results"][name]["median_ms"]
+        after = result["median_ms"]
+        ratio = after / before if before else np.inf
+        flag = ""
+        if ratio > threshold and after - before > NOISE_MS:
+            regressions.append(name)
+            flag = "  <-- slower"
+        print(f"{name:>50}  {before:10.1f}  {after:10.1f}  {ratio:5.2f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--regions", type=int, default=200)
+    arg_parser.add_argument("--days", type=int, default=100)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--counties", type=int, default=0)
+    arg_parser.add_argument("--number", type=int, default=5)
+    arg_parser.add_argument("--output", help="json file to save the results to")
+    arg_parser.add_argument("--compare", help="json results of a previous run")
+    arg_parser.add_argument("--threshold", type=float, default=1.2)
+    args = arg_parser.parse_args()
+
+    output = os.path.abspath(
+        args.output
+        or os.path.join(
+            RESULTS_DIR,
+            f"{datetime.now():%Y_%m_%d_%H_%M_%S}_{args.regions}x{args.days}.json",
+        )
+    )
+    previous = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            previous = json.load(f)
+
+    with tempfile.TemporaryDirectory(prefix="covid_benchmark_") as directory:
+        start = time.perf_counter()
+        write_dataset(directory, args.regions, args.days, args.seed, args.counties)
+        size = sum(
+            os.path.getsize(os.path.join(directory, "jhu", f))
+            for f in os.listdir(os.path.join(directory, "jhu"))
+        )
+        print(
+            f"Generated {args.regions} regions x {args.days} days"
+            f" ({size / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s"
+        )
+        results = run_suite(directory, args.number)
+
+    current = {
+        "meta": {
+            "scale": {
+                "regions": args.regions,
+                "days": args.days,
+                "seed": args.seed,
+                "counties": args.counties,
+            },
+            "created": datetime.now().isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if previous and compare(previous, current, args.threshold):
+        sys.exit(1)
@@ -0,0 +1,218 @@
+"""Synthetic data sets in the formats of the JHU time series and the cached Worldometer table, at configurable scale.
+
+    python -m benchmarks.synthetic path/to/directory --regions 1000 --days 500 --counties 3300
+
+writes `jhu/time_series_covid19_*_global.csv` and `model/worldometer_*.csv` into the directory, so the app can run on
+them with `JHU_DATA_DIR=path/to/directory/jhu` from inside the directory. With `--counties`, the first country is the
+US, split into states and counties in `jhu/time_series_covid19_*_US.csv`.
+"""
+import argparse
+import os
+from datetime import date, timedelta
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# number of countries the regions are grouped into, regions beyond it become provinces/states
+MAX_COUNTRIES = 200
+
+JHU_FILES = {
+    "confirmed": "time_series_covid19_confirmed_global.csv",
+    "deaths": "time_series_covid19_deaths_global.csv",
+    "recovered": "time_series_covid19_recovered_global.csv",
+}
+JHU_US_FILES = {
+    "confirmed": "time_series_covid19_confirmed_US.csv",
+    "deaths": "time_series_covid19_deaths_US.csv",
+}
+WORLDOMETER_TIMESTAMP = "2020_04_10_12_00"
+
+# number of states the US counties are grouped into, like the states and territories of the JHU data
+NUM_STATES = 58
+
+
+def country_names(num_regions: int, us: bool = False) -> np.ndarray:
+    """Return the country of every region. Countries with more than one region are split into provinces."""
+    num_countries = min(num_regions, MAX_COUNTRIES)
+    names = np.array([f"Country {i % num_countries}" for i in range(num_regions)])
+    if us:
+        names[names == "Country 0"] = "US"
+    return names
+
+
+def _date_columns(num_days: int):
+    dates = [date(2020, 1, 22) + timedelta(days=int(d)) for d in range(num_days)]
+    return [f"{d.month}/{d.day}/{d:%y}" for d in dates]
+
+
+def _outbreaks(rng: np.random.Generator, num_regions: int, num_days: int):
+    """Return the cumulative confirmed cases of a logistic outbreak in each region."""
+    days = np.arange(num_days)
+    start = rng.integers(0, max(1, num_days // 2), num_regions)[:, None]
+    rate = rng.uniform(0.05, 0.35, num_regions)[:, None]
+    size = 10 ** rng.uniform(2, 7, num_regions)[:, None]
+    curve = size / (1 + np.exp(-rate * (days - start - 30)))
+    noise = rng.integers(0, 3, (num_regions, num_days))
+    confirmed = np.maximum.accumulate(np.floor(curve) + noise, axis=1)
+    confirmed[days < start] = 0
+    return confirmed
+
+
+def jhu_time_series(
+    num_regions: int, num_days: int, seed: int = 0, us: bool = False
+) -> Dict[str, pd.DataFrame]:
+    """Return the confirmed, deaths and recovered tables in the JHU global time series format.
+
+    Every region follows a logistic outbreak curve with its own start, growth rate and size plus noise, so the data
+    exercises the thresholds, growth factors and log scales like the real data does. If `us` is set, the first country
+    is the US.
+    """
+    rng = np.random.default_rng(seed)
+    countries = country_names(num_regions, us)
+    has_provinces = pd.Series(countries).duplicated(keep=False).to_numpy()
+    provinces = np.where(
+        has_provinces, [f"Province {i}" for i in range(num_regions)], None
+    )
+
+    confirmed = _outbreaks(rng, num_regions, num_days)
+    columns = _date_columns(num_days)
+    labels = pd.DataFrame(
+        {
+            "Province/State": provinces,
+            "Country/Region": countries,
+            "Lat": rng.uniform(-60, 70, num_regions).round(4),
+            "Long": rng.uniform(-180, 180, num_regions).round(4),
+        }
+    )
+
+    def _table(values: np.ndarray) -> pd.DataFrame:
+        return pd.concat([labels, pd.DataFrame(values, columns=columns)], axis=1)
+
+    fatality = rng.uniform(0.005, 0.1, num_regions)[:, None]
+    recovery = rng.uniform(0.2, 0.8, num_regions)[:, None]
+    return {
+        "confirmed": _table(confirmed),
+        "deaths": _table(np.floor(confirmed * fatality)),
+        "recovered": _table(np.floor(np.roll(confirmed, 14, axis=1) * recovery)),
+    }
+
+
+def jhu_us_time_series(
+    num_counties: int, num_days: int, seed: int = 0
+) -> Dict[str, pd.DataFrame]:
+    """Return the confirmed and deaths tables in the JHU US time series format, with counties grouped into states."""
+    rng = np.random.default_rng(seed)
+    confirmed = _outbreaks(rng, num_counties, num_days)
+    fips = np.arange(num_counties) + 1001
+    labels = pd.DataFrame(
+        {
+            "UID": 84000000 + fips,
+            "iso2": "US",
+            "iso3": "USA",
+            "code3": 840,
+            "FIPS": fips.astype(float),
+            "Admin2": [f"County {i}" for i in range(num_counties)],
+            "Province_State": [f"State {i % NUM_STATES}" for i in range(num_counties)],
+            "Country_Region": "US",
+            "Lat": rng.uniform(20, 65, num_counties).round(4),
+            "Long_": rng.uniform(-160, -65, num_counties).round(4),
+        }
+    )
+    labels["Combined_Key"] = labels["Admin2"] + ", " + labels["Province_State"] + ", US"
+    columns = _date_columns(num_days)
+
+    def _table(values: np.ndarray, extra: Dict = None) -> pd.DataFrame:
+        return pd.concat(
+            [labels.assign(**(extra or {})), pd.DataFrame(values, columns=columns)],
+            axis=1,
+        )
+
+    fatality = rng.uniform(0.005, 0.1, num_counties)[:, None]
+    population = (10 ** rng.uniform(3, 6.5, num_counties)).round()
+    return {
+        "confirmed": _table(confirmed),
+        "deaths": _table(np.floor(confirmed * fatality), {"Population": population}),
+    }
+
+
+def worldometer_table(jhu_confirmed: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """Return a table with the columns of the cached Worldometer csv, for the countries of the JHU data."""
+    rng = np.random.default_rng(seed)
+    total_cases = jhu_confirmed.groupby("Country/Region")[
+        jhu_confirmed.columns[-1]
+    ].sum()
+    num_countries = len(total_cases)
+
+    def _uniform(low: float, high: float) -> np.ndarray:
+        return rng.uniform(low, high, num_countries).round()
+
+    # the app matches the JHU names to the Worldometer names
+    df = pd.DataFrame(
+        {
+            "Country": total_cases.index.str.replace("^US$", "USA", regex=True),
+            "Total Cases": total_cases.to_numpy(),
+        }
+    )
+    df["New Cases"] = (df["Total Cases"] * rng.uniform(0, 0.1, num_countries)).round()
+    df["Total Deaths"] = (df["Total Cases"] * _uniform(0, 10) / 100).round()
+    df["New Deaths"] = (df["Total Deaths"] * rng.uniform(0, 0.1, num_countries)).round()
+    df["Total Recovered"] = (
+        df["Total Cases"] * rng.uniform(0.2, 0.8, num_countries)
+    ).round()
+    df["Active Cases"] = df["Total Cases"] - df["Total Deaths"] - df["Total Recovered"]
+    df["Serious/Critical"] = (
+        df["Active Cases"] * rng.uniform(0, 0.05, num_countries)
+    ).round()
+    df["Population"] = (10 ** rng.uniform(5, 9, num_countries)).round()
+    df["Cases/1M pop"] = (df["Total Cases"] / df["Population"] * 1e6).round()
+    df["Deaths/1M pop"] = (df["Total Deaths"] / df["Population"] * 1e6).round()
+    df["Total Tests"] = (df["Total Cases"] * rng.uniform(2, 50, num_countries)).round()
+    df["Tests/1M pop"] = (df["Total Tests"] / df["Population"] * 1e6).round()
+    df["Case Fatality Ratio"] = (df["Total Deaths"] / df["Total Cases"] * 100).round(2)
+    df["Density P/Km2"] = _uniform(1, 1000)
+    df["Land Area Km2"] = _uniform(1e3, 1e7)
+    df["Median Age"] = _uniform(15, 50)
+    df["Urban Population %"] = _uniform(10, 100)
+
+    # same column order as the table saved by WorldOMeterDataFetcher, with a world total
+    population = df.pop("Population")
+    df.insert(df.columns.get_loc("Case Fatality Ratio") + 1, "Population", population)
+    df.loc[len(df)] = ["World"] + list(df.drop(columns="Country").sum())
+    return df.sort_values("Total Cases", ascending=False).reset_index(drop=True)
+
+
+def write_dataset(
+    directory: str,
+    num_regions: int,
+    num_days: int,
+    seed: int = 0,
+    num_counties: int = 0,
+):
+    """Write the synthetic JHU csv files to `directory/jhu` and the Worldometer csv to `directory/model`."""
+    jhu_dir = os.path.join(directory, "jhu")
+    model_dir = os.path.join(directory, "model")
+    os.makedirs(jhu_dir, exist_ok=True)
+    os.makedirs(model_dir, exist_ok=True)
+
+    tables = jhu_time_series(num_regions, num_days, seed, us=num_counties > 0)
+    for name, df in tables.items():
+        df.to_csv(os.path.join(jhu_dir, JHU_FILES[name]), index=False)
+    if num_counties:
+        for name, df in jhu_us_time_series(num_counties, num_days, seed).items():
+            df.to_csv(os.path.join(jhu_dir, JHU_US_FILES[name]), index=False)
+    worldometer_table(tables["confirmed"], seed).to_csv(
+        os.path.join(model_dir, f"worldometer_{WORLDOMETER_TIMESTAMP}.csv"),
+        index=False,
+    )
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("directory")
+    arg_parser.add_argument("--regions", type=int, default=1000)
+    arg_parser.add_argument("--days", type=int, default=500)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--counties", type=int, default=0)
+    args = arg_parser.parse_args()
+    write_dataset(args.directory, args.regions, args.days, args.seed, args.counties)
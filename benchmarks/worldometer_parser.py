@@ -0,0 +1,94 @@
+"""Benchmark the single pass Worldometer parser against the BeautifulSoup parser.
+
+Run on HTML pages saved from Worldometer, or on a synthetic page when no files are given:
+
+    python -m benchmarks.worldometer_parser --save benchmarks/fixtures
+    python -m benchmarks.worldometer_parser benchmarks/fixtures/*.html
+"""
+import argparse
+import os
+import timeit
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from model.worldometer import WorldOMeterDataFetcher
+
+
+def synthetic_page(num_rows: int = 220, seed: int = 0) -> str:
+    """Return an HTML page shaped like the Worldometer coronavirus page, with a large table and surrounding markup."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(num_rows):
+        numbers = [f"{int(v):,}" for v in rng.integers(0, 10_000_000, 12)]
+        cells = (
+            [str(i), f'<a class="mt_a" href="country/land-{i}/">Land {i}</a>']
+            + [f"+{numbers[0]}"]
+            + numbers[1:]
+            + ["Europe"]
+        )
+        rows.append("<tr>{}</tr>".format("".join(f"<td>{c}</td>" for c in cells)))
+
+    table = "<table><thead><tr><th>#</th></tr></thead><tbody>{}</tbody></table>"
+    return "".join(
+        [
+            "<html><head><script>var x = 1;</script></head><body>",
+            "<div>" * 20 + "Last updated: April 10, 2020, 12:00 GMT" + "</div>" * 20,
+            table.format("".join(rows)),
+            # the page also contains the tables of the previous days, which are never read
+            table.format("".join(rows)) * 2,
+            "<div><p>footer</p></div>" * 500,
+            "</body></html>",
+        ]
+    )
+
+
+def _save_pages(directory: str):
+    os.makedirs(directory, exist_ok=True)
+    fetcher = WorldOMeterDataFetcher(use_cache=False)
+    for data_type, data_dict in fetcher._data_dicts.items():
+        path = os.path.join(directory, f"worldometer_{data_type}.html")
+        with open(path, "w") as f:
+            f.write(fetcher._get_html(data_dict["url"]))
+        print(f"saved {path}")
+
+
+def benchmark(name: str, page: str, columns: List[str], number: int = 10):
+    """Check that both parsers agree on the page, then time them."""
+    single_pass = WorldOMeterDataFetcher(use_cache=False, single_pass=True)
+    soup = WorldOMeterDataFetcher(use_cache=False, single_pass=False)
+
+    result = single_pass.parse_page(page, columns)
+    expected = soup.parse_page(page, columns)
+    pd.testing.assert_frame_equal(result[0], expected[0])
+    assert result[1] == expected[1], (result[1], expected[1])
+
+    print(f"{name} ({len(page) / 1e6:.1f} MB, {len(result[0])} rows)")
+    for label, fetcher in [("beautifulsoup", soup), ("single pass", single_pass)]:
+        seconds = timeit.timeit(
+            lambda: fetcher.parse_page(page, columns), number=number
+        )
+        print(f"  {label:>15}: {seconds / number * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("pages", nargs="*", help="saved Worldometer HTML pages")
+    arg_parser.add_argument("--save", help="directory to save the live pages to")
+    arg_parser.add_argument("--number", type=int, default=10)
+    args = arg_parser.parse_args()
+
+    data_dicts = WorldOMeterDataFetcher()._data_dicts
+    if args.save:
+        _save_pages(args.save)
+    elif not args.pages:
+        benchmark(
+            "synthetic", synthetic_page(), data_dicts["corona"]["columns"], args.number
+        )
+    for path in args.pages:
+        with open(path, "r") as f:
+            page = f.read()
+        # saved pages are named after their data type, see _save_pages
+        data_type = "population" if "population" in os.path.basename(path) else "corona"
+        benchmark(path, page, data_dicts[data_type]["columns"], args.number)
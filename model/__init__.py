@@ -1,6 +1,25 @@
-from .cssegisand_data import corona_country_data, get_doubling_time_ts_df
+import os
+
+from .cssegisand_data import get_doubling_time_series
+from .cube import TimeSeriesCube
+from .trajectory import TrajectoryIndex
+from .store import DataNotLoaded, DataSnapshot, DataStore
 from .worldometer import WorldOMeterDataFetcher
 
-# processed data
-worldometer_fetcher = WorldOMeterDataFetcher(use_cache=True)
-corona_table_data = worldometer_fetcher.get_worldometer_data()
+# processed data, loaded by `data_store.start()`, then rebuilt in the background and swapped in atomically.
+# with SHARED_DATA_DIR set, the data is built by a single `python -m model.shared_snapshot` process, and every worker
+# attaches to its published snapshots instead
+if os.environ.get("SHARED_DATA_DIR"):
+    from .shared_snapshot import POLL_INTERVAL, SHARED_DATA_DIR, SharedSnapshotReader
+
+    data_store = DataStore(
+        load=SharedSnapshotReader(SHARED_DATA_DIR),
+        refresh_interval=POLL_INTERVAL,
+        retry_interval=5,
+    )
+else:
+    data_store = DataStore()
+
+
+def get_data_version() -> str:
+    return data_store.snapshot.version
@@ -0,0 +1,82 @@
+import hashlib
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from .country_iso import continent_iso, get_iso_alpha3, get_iso_code
+
+
+def _hash_byte(s: str) -> int:
+    return int.from_bytes(hashlib.sha256(s.encode()).digest(), "big") % 255
+
+
+def country_color(country: str) -> str:
+    """Return a unique color hex code based on the country name."""
+    return "#%02X%02X%02X" % (
+        _hash_byte(country[0]),
+        _hash_byte(country[1]),
+        _hash_byte(country[2]) if len(country) > 2 else 128,
+    )
+
+
+class CountryIndex:
+    """Metadata of every country, built once per data version: integer ids, colors, ISO codes, population and groups.
+
+    Ids follow the order of the countries of the time series cube, so the ids of the cube index the metadata arrays
+    directly, and the countries only found in the worldometer table come after them. `table_ids` holds the id of each
+    row of the worldometer table. Callbacks look up metadata by indexing these arrays instead of recomputing it.
+    """
+
+    def __init__(self, countries: Iterable[str], corona_table_data: pd.DataFrame):
+        self.names = list(dict.fromkeys([*countries, *corona_table_data["Country"]]))
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.table_ids = np.array(
+            [self.ids[c] for c in corona_table_data["Country"]], dtype=int
+        )
+
+        self.colors = np.array([country_color(c) for c in self.names], dtype=object)
+        self.iso_codes = np.array([get_iso_code(c) for c in self.names], dtype=object)
+        self.iso_alpha3 = np.array(
+            [get_iso_alpha3(c) for c in self.names], dtype=object
+        )
+        self.populations = (
+            corona_table_data.set_index("Country")["Population"]
+            .reindex(self.names)
+            .to_numpy(dtype=float)
+        )
+
+        # members of each continent, by the ISO codes of the countries
+        continents = {
+            code: continent
+            for continent, codes in continent_iso.items()
+            for code in codes.split()
+        }
+        self.continents = np.array(
+            [continents.get(code) for code in self.iso_codes], dtype=object
+        )
+        self.groups = {
+            continent: np.flatnonzero(self.continents == continent)
+            for continent in continent_iso
+        }  # type: Dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, country: str) -> bool:
+        return country in self.ids
+
+    def lookup(self, countries: Iterable[str]) -> np.ndarray:
+        """Return the ids of the countries, -1 for unknown ones."""
+        return np.array([self.ids.get(c, -1) for c in countries], dtype=int)
+
+    def color(self, country: str) -> str:
+        """Return the color of a country, or compute it for names which are not countries, like regions."""
+        i = self.ids.get(country)
+        return country_color(country) if i is None else self.colors[i]
+
+    def colors_of(
+        self, ids: np.ndarray, highlighted: np.ndarray, default: str
+    ) -> List[str]:
+        """Return the colors of the countries, with only the highlighted ones in their own color."""
+        return np.where(np.isin(ids, highlighted), self.colors[ids], default).tolist()
@@ -1,3 +1,5 @@
+from typing import Optional
+
 country_iso = {
     "Afghanistan": "AF",
     "Albania": "AL",
@@ -251,3 +253,330 @@ country_iso = {
     "Zimbabwe": "ZW",
     "Åland Islands": "AX",
 }
+
+# app names of the countries named differently in `country_iso`, see `country_map`
+country_iso_aliases = {
+    "Bolivia": "Bolivia, Plurinational State of",
+    "Brunei": "Brunei Darussalam",
+    "Burma": "Myanmar",
+    "Cabo Verde": "Cape Verde",
+    "Congo (Brazzaville)": "Congo",
+    "Congo (Kinshasa)": "Congo, the Democratic Republic of the",
+    "Czechia": "Czech Republic",
+    "DRC": "Congo, the Democratic Republic of the",
+    "Eswatini": "Swaziland",
+    "Faeroe Islands": "Faroe Islands",
+    "Falkland Islands": "Falkland Islands (Malvinas)",
+    "Holy See": "Holy See (Vatican City State)",
+    "Iran": "Iran, Islamic Republic of",
+    "Ivory Coast": "Côte d'Ivoire",
+    "Laos": "Lao People's Democratic Republic",
+    "Macau": "Macao",
+    "Moldova": "Moldova, Republic of",
+    "North Macedonia": "Macedonia, the former Yugoslav Republic of",
+    "Palestine": "Palestine, State of",
+    "Russia": "Russian Federation",
+    "South Korea": "Korea, Republic of",
+    "St. Barth": "Saint Barthélemy",
+    "St. Vincent Grenadines": "Saint Vincent and the Grenadines",
+    "Syria": "Syrian Arab Republic",
+    "Taiwan": "Taiwan, Province of China",
+    "Tanzania": "Tanzania, United Republic of",
+    "UAE": "United Arab Emirates",
+    "UK": "United Kingdom",
+    "USA": "United States",
+    "Vatican City": "Holy See (Vatican City State)",
+    "Venezuela": "Venezuela, Bolivarian Republic of",
+    "Vietnam": "Viet Nam",
+}
+
+# ISO 3166 alpha-2 codes of the countries of each continent
+continent_iso = {
+    "Africa": (
+        "DZ AO BJ BW BF BI CV CM CF TD KM CG CD CI DJ EG GQ ER SZ ET GA GM GH GN GW KE "
+        "LS LR LY MG MW ML MR MU YT MA MZ NA NE NG RE RW SH ST SN SC SL SO ZA SS SD TZ "
+        "TG TN UG EH ZM ZW"
+    ),
+    "Asia": (
+        "AF AM AZ BH BD BT BN KH CN CX CC CY GE HK IN ID IR IQ IL JP JO KZ KP KR KW KG "
+        "LA LB MO MY MV MN MM NP OM PK PS PH QA SA SG LK SY TW TJ TH TL TR TM AE UZ VN "
+        "YE IO"
+    ),
+    "Europe": (
+        "AX AL AD AT BY BE BA BG HR CZ DK EE FO FI FR DE GI GR GG VA HU IS IE IM IT JE "
+        "LV LI LT LU MT MD MC ME NL MK NO PL PT RO RU SM RS SK SI ES SJ SE CH UA GB"
+    ),
+    "North America": (
+        "AI AG AW BS BB BZ BM BQ VG CA KY CR CU CW DM DO SV GL GD GP GT HT HN JM MQ MX "
+        "MS NI PA PR BL KN LC MF PM VC SX TT TC US VI UM"
+    ),
+    "South America": "AR BO BR CL CO EC FK GF GY PY PE SR UY VE",
+    "Oceania": (
+        "AS AU CK FJ PF GU KI MH FM NR NC NZ NU NF MP PW PG PN WS SB TK TO TV VU WF"
+    ),
+    "Antarctica": "AQ BV TF HM GS",
+}
+
+
+# ISO 3166 alpha-3 codes by alpha-2 code, plotly locates countries on its maps by the former
+iso_alpha3 = {
+    "AD": "AND",
+    "AE": "ARE",
+    "AF": "AFG",
+    "AG": "ATG",
+    "AI": "AIA",
+    "AL": "ALB",
+    "AM": "ARM",
+    "AO": "AGO",
+    "AQ": "ATA",
+    "AR": "ARG",
+    "AS": "ASM",
+    "AT": "AUT",
+    "AU": "AUS",
+    "AW": "ABW",
+    "AX": "ALA",
+    "AZ": "AZE",
+    "BA": "BIH",
+    "BB": "BRB",
+    "BD": "BGD",
+    "BE": "BEL",
+    "BF": "BFA",
+    "BG": "BGR",
+    "BH": "BHR",
+    "BI": "BDI",
+    "BJ": "BEN",
+    "BL": "BLM",
+    "BM": "BMU",
+    "BN": "BRN",
+    "BO": "BOL",
+    "BQ": "BES",
+    "BR": "BRA",
+    "BS": "BHS",
+    "BT": "BTN",
+    "BV": "BVT",
+    "BW": "BWA",
+    "BY": "BLR",
+    "BZ": "BLZ",
+    "CA": "CAN",
+    "CC": "CCK",
+    "CD": "COD",
+    "CF": "CAF",
+    "CG": "COG",
+    "CH": "CHE",
+    "CI": "CIV",
+    "CK": "COK",
+    "CL": "CHL",
+    "CM": "CMR",
+    "CN": "CHN",
+    "CO": "COL",
+    "CR": "CRI",
+    "CU": "CUB",
+    "CV": "CPV",
+    "CW": "CUW",
+    "CX": "CXR",
+    "CY": "CYP",
+    "CZ": "CZE",
+    "DE": "DEU",
+    "DJ": "DJI",
+    "DK": "DNK",
+    "DM": "DMA",
+    "DO": "DOM",
+    "DZ": "DZA",
+    "EC": "ECU",
+    "EE": "EST",
+    "EG": "EGY",
+    "EH": "ESH",
+    "ER": "ERI",
+    "ES": "ESP",
+    "ET": "ETH",
+    "FI": "FIN",
+    "FJ": "FJI",
+    "FK": "FLK",
+    "FM": "FSM",
+    "FO": "FRO",
+    "FR": "FRA",
+    "GA": "GAB",
+    "GB": "GBR",
+    "GD": "GRD",
+    "GE": "GEO",
+    "GF": "GUF",
+    "GG": "GGY",
+    "GH": "GHA",
+    "GI": "GIB",
+    "GL": "GRL",
+    "GM": "GMB",
+    "GN": "GIN",
+    "GP": "GLP",
+    "GQ": "GNQ",
+    "GR": "GRC",
+    "GS": "SGS",
+    "GT": "GTM",
+    "GU": "GUM",
+    "GW": "GNB",
+    "GY": "GUY",
+    "HK": "HKG",
+    "HM": "HMD",
+    "HN": "HND",
+    "HR": "HRV",
+    "HT": "HTI",
+    "HU": "HUN",
+    "ID": "IDN",
+    "IE": "IRL",
+    "IL": "ISR",
+    "IM": "IMN",
+    "IN": "IND",
+    "IO": "IOT",
+    "IQ": "IRQ",
+    "IR": "IRN",
+    "IS": "ISL",
+    "IT": "ITA",
+    "JE": "JEY",
+    "JM": "JAM",
+    "JO": "JOR",
+    "JP": "JPN",
+    "KE": "KEN",
+    "KG": "KGZ",
+    "KH": "KHM",
+    "KI": "KIR",
+    "KM": "COM",
+    "KN": "KNA",
+    "KP": "PRK",
+    "KR": "KOR",
+    "KW": "KWT",
+    "KY": "CYM",
+    "KZ": "KAZ",
+    "LA": "LAO",
+    "LB": "LBN",
+    "LC": "LCA",
+    "LI": "LIE",
+    "LK": "LKA",
+    "LR": "LBR",
+    "LS": "LSO",
+    "LT": "LTU",
+    "LU": "LUX",
+    "LV": "LVA",
+    "LY": "LBY",
+    "MA": "MAR",
+    "MC": "MCO",
+    "MD": "MDA",
+    "ME": "MNE",
+    "MF": "MAF",
+    "MG": "MDG",
+    "MH": "MHL",
+    "MK": "MKD",
+    "ML": "MLI",
+    "MM": "MMR",
+    "MN": "MNG",
+    "MO": "MAC",
+    "MP": "MNP",
+    "MQ": "MTQ",
+    "MR": "MRT",
+    "MS": "MSR",
+    "MT": "MLT",
+    "MU": "MUS",
+    "MV": "MDV",
+    "MW": "MWI",
+    "MX": "MEX",
+    "MY": "MYS",
+    "MZ": "MOZ",
+    "NA": "NAM",
+    "NC": "NCL",
+    "NE": "NER",
+    "NF": "NFK",
+    "NG": "NGA",
+    "NI": "NIC",
+    "NL": "NLD",
+    "NO": "NOR",
+    "NP": "NPL",
+    "NR": "NRU",
+    "NU": "NIU",
+    "NZ": "NZL",
+    "OM": "OMN",
+    "PA": "PAN",
+    "PE": "PER",
+    "PF": "PYF",
+    "PG": "PNG",
+    "PH": "PHL",
+    "PK": "PAK",
+    "PL": "POL",
+    "PM": "SPM",
+    "PN": "PCN",
+    "PR": "PRI",
+    "PS": "PSE",
+    "PT": "PRT",
+    "PW": "PLW",
+    "PY": "PRY",
+    "QA": "QAT",
+    "RE": "REU",
+    "RO": "ROU",
+    "RS": "SRB",
+    "RU": "RUS",
+    "RW": "RWA",
+    "SA": "SAU",
+    "SB": "SLB",
+    "SC": "SYC",
+    "SD": "SDN",
+    "SE": "SWE",
+    "SG": "SGP",
+    "SH": "SHN",
+    "SI": "SVN",
+    "SJ": "SJM",
+    "SK": "SVK",
+    "SL": "SLE",
+    "SM": "SMR",
+    "SN": "SEN",
+    "SO": "SOM",
+    "SR": "SUR",
+    "SS": "SSD",
+    "ST": "STP",
+    "SV": "SLV",
+    "SX": "SXM",
+    "SY": "SYR",
+    "SZ": "SWZ",
+    "TC": "TCA",
+    "TD": "TCD",
+    "TF": "ATF",
+    "TG": "TGO",
+    "TH": "THA",
+    "TJ": "TJK",
+    "TK": "TKL",
+    "TL": "TLS",
+    "TM": "TKM",
+    "TN": "TUN",
+    "TO": "TON",
+    "TR": "TUR",
+    "TT": "TTO",
+    "TV": "TUV",
+    "TW": "TWN",
+    "TZ": "TZA",
+    "UA": "UKR",
+    "UG": "UGA",
+    "UM": "UMI",
+    "US": "USA",
+    "UY": "URY",
+    "UZ": "UZB",
+    "VA": "VAT",
+    "VC": "VCT",
+    "VE": "VEN",
+    "VG": "VGB",
+    "VI": "VIR",
+    "VN": "VNM",
+    "VU": "VUT",
+    "WF": "WLF",
+    "WS": "WSM",
+    "YE": "YEM",
+    "YT": "MYT",
+    "ZA": "ZAF",
+    "ZM": "ZMB",
+    "ZW": "ZWE",
+}
+
+
+def get_iso_code(country: str) -> Optional[str]:
+    """Return the ISO 3166 alpha-2 code of a country as named in the app, or None."""
+    return country_iso.get(country_iso_aliases.get(country, country))
+
+
+def get_iso_alpha3(country: str) -> Optional[str]:
+    """Return the ISO 3166 alpha-3 code of a country as named in the app, or None."""
+    return iso_alpha3.get(get_iso_code(country))
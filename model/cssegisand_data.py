@@ -1,111 +1,249 @@
-from functools import partial
-from typing import Dict, List
+import io
+import os
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
+from . import disk_cache
+from .cube import TimeSeriesCube, same_values
+from .fetch import http_fetcher
+from .hierarchy import GLOBAL_LEVELS, RegionHierarchy, date_columns
 from .utils import country_map
 
 
-def _get_daily_increase(df: pd.DataFrame, num_days: int = 1) -> pd.DataFrame:
-    """Get the smoothed day-over-day increase."""
-    return (df - df.shift(num_days, axis=1)) / num_days
+def _get_country_time_series(hierarchy: RegionHierarchy) -> pd.DataFrame:
+    """Return the cumulative time series of every country and the world, from the country totals of the regions.
 
+    All other metrics are derived from it on first use, see derived.py.
+    """
+    df_cumulative = hierarchy.level_totals(0)
+    df_cumulative.index.name = "Country"
+    df_cumulative.loc["World"] = df_cumulative.sum()
+    return df_cumulative
 
-def _get_growth_factor(df: pd.DataFrame, period: int = 1) -> pd.DataFrame:
-    """Get the smoothed exponential growth factor"""
-    daily_increase_df = df / df.shift(period, axis=1)
-    daily_increase_df = daily_increase_df.fillna(1).replace(np.inf, 1)
-    return daily_increase_df.rolling(period).mean()
 
+def _get_region_hierarchy(data_source, levels: List[str]) -> RegionHierarchy:
+    """Given a URL, path or buffer pointing to a JHU time series file, return its regions as a hierarchy."""
+    if isinstance(data_source, str):
+        data_source = io.BytesIO(_read_raw_data(data_source))
+    # match the country names to the worldometer names
+    return RegionHierarchy.from_jhu(pd.read_csv(data_source), levels, country_map)
 
-def _random_index_cleanup(df: pd.DataFrame) -> pd.DataFrame:
-    # match country names of two dataframes, drop anything not in the intersection
-    df["Country"] = df["Country/Region"].apply(lambda x: country_map.get(x, x))
-    df = df.drop("Country/Region", axis=1)
-    return df
 
+def _get_time_series_data(data_source) -> pd.DataFrame:
+    """Given a URL, path or buffer pointing to a Covid-19 data source from Johns Hopkins University,
+    return a pd.DataFrame of the cumulative time series, indexed by country."""
+    return _get_country_time_series(_get_region_hierarchy(data_source, GLOBAL_LEVELS))
 
-def _get_time_series_data(data_source: str) -> Dict[str, pd.DataFrame]:
-    """Given a URL pointing to a Covid-19 data source from Johns Hopkins University,
-    return a processed pd.DataFrame of time series data, indexed by country."""
-    df_master = pd.read_csv(data_source)
 
-    # group time series data on country
-    df_groupby_country = df_master.groupby("Country/Region").sum().reset_index()
-    df_groupby_country = _random_index_cleanup(df_groupby_country)
+def _extend_time_series(
+    name: str, df: pd.DataFrame
+) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+    """If a JHU table only adds dates to the one of the source processed last, return its country and region level
+    frames, with only the added dates processed. Otherwise return None.
+
+    JHU revises earlier days now and then, so the regions and all values of the earlier days must match exactly.
+    """
+    previous_regions = disk_cache.load_latest_frames(f"{name}_regions")
+    previous_countries = disk_cache.load_latest_frames(name)
+    if previous_regions is None or previous_countries is None:
+        return None
+    df_regions = previous_regions["cumulative"]
+    df_countries = previous_countries["cumulative"]
+
+    dates = date_columns(df)
+    old_days = df_regions.shape[1]
+    if (
+        len(dates) <= old_days
+        or dates[:old_days] != list(df_regions.columns)
+        or list(df_countries.columns) != list(df_regions.columns)
+        or len(df) != len(df_regions)
+    ):
+        return None
+    values = df[dates].to_numpy(dtype=float)
+    if not same_values(values[:, :old_days], df_regions.to_numpy()):
+        return None
+
+    added = RegionHierarchy(
+        df[GLOBAL_LEVELS], values[:, old_days:], dates[old_days:], country_map
+    )
+    if not pd.MultiIndex.from_frame(added.labels).equals(df_regions.index):
+        return None
+    df_added = _get_country_time_series(added)
+    if not df_added.index.equals(df_countries.index):
+        return None
+    return (
+        pd.concat([df_countries, df_added], axis=1),
+        pd.DataFrame(values, index=df_regions.index, columns=dates),
+    )
+
+
+def _read_raw_data(data_source: str) -> bytes:
+    """Return the raw content of a data source, which is either a URL or a local file path.
+
+    URLs are fetched through the shared session, which retries failed requests and only downloads changed files.
+    """
+    if data_source.startswith(("http://", "https://")):
+        return http_fetcher.get(data_source).content
+    with open(data_source, "rb") as f:
+        return f.read()
 
-    df_groupby_country.index = df_groupby_country["Country"]
-    df_cumulative = df_groupby_country.drop(["Country", "Lat", "Long"], axis=1)
-    df_cumulative.loc["World"] = df_cumulative.sum()
 
-    df_daily_increase = _get_daily_increase(df_cumulative, 7)
-    df_growth_factor = _get_growth_factor(df_daily_increase, 7)
+def get_cached_time_series_data(name: str, data_source: str) -> pd.DataFrame:
+    """Return the cumulative time series of a source, from the binary cache if its content is unchanged."""
+    return load_cached_time_series_data(name, data_source)[0]
 
-    return {
-        "cumulative": df_cumulative,
-        "daily_increase": df_daily_increase,
-        "growth": df_growth_factor,
-    }
 
+def load_cached_time_series_data(
+    name: str, data_source: str
+) -> Tuple[pd.DataFrame, str]:
+    """Return the cumulative time series of a source and the digest of its content, from the binary cache if the
+    content is unchanged.
 
-corona_country_data = {
-    k: _get_time_series_data(v)
-    for k, v in {
-        "confirmed": "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_confirmed_global.csv",
-        "deaths": "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_deaths_global.csv",
-        "recovered": "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_recovered_global.csv",
-        # 'tested': None  # todo
-    }.items()
+    When the source is processed, its province/state level data is cached along with it, for drilling down later.
+    If the source only added dates since it was processed last, only the added dates are processed.
+    """
+    raw_data = _read_raw_data(data_source)
+    digest = disk_cache.source_digest(raw_data)
+    data = disk_cache.load_frames(name, digest)
+    if data is not None:
+        return data["cumulative"], digest
+
+    df = pd.read_csv(io.BytesIO(raw_data))
+    frames = _extend_time_series(name, df)
+    if frames is None:
+        hierarchy = RegionHierarchy.from_jhu(df, GLOBAL_LEVELS, country_map)
+        frames = _get_country_time_series(hierarchy), hierarchy.to_frame()
+    df_cumulative, df_regions = frames
+    disk_cache.save_frames(name, digest, {"cumulative": df_cumulative})
+    disk_cache.save_frames(f"{name}_regions", digest, {"cumulative": df_regions})
+    return df_cumulative, digest
+
+
+def load_cached_region_hierarchy(
+    name: str, data_source: str, levels: List[str]
+) -> Tuple[RegionHierarchy, str]:
+    """Return the regions of a source as a hierarchy and the digest of its content, from the binary cache if the
+    content is unchanged."""
+    raw_data = _read_raw_data(data_source)
+    digest = disk_cache.source_digest(raw_data)
+    data = disk_cache.load_frames(f"{name}_regions", digest)
+    if data is not None:
+        return RegionHierarchy.from_frame(data["cumulative"], country_map), digest
+
+    hierarchy = _get_region_hierarchy(io.BytesIO(raw_data), levels)
+    disk_cache.save_frames(
+        f"{name}_regions", digest, {"cumulative": hierarchy.to_frame()}
+    )
+    return hierarchy, digest
+
+
+# set to another server with the same files, e.g. `python -m benchmarks.stub_server`
+JHU_URL = os.environ.get(
+    "JHU_URL",
+    "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series",
+)
+JHU_FILES = {
+    "confirmed": "time_series_covid19_confirmed_global.csv",
+    "deaths": "time_series_covid19_deaths_global.csv",
+    "recovered": "time_series_covid19_recovered_global.csv",
+    # 'tested': None  # todo
 }
+# county level files of the US, there is no recovered file
+JHU_US_FILES = {
+    "confirmed": "time_series_covid19_confirmed_US.csv",
+    "deaths": "time_series_covid19_deaths_US.csv",
+}
+
+# set to a local directory containing the JHU csv files to run without network access
+JHU_DATA_DIR = os.environ.get("JHU_DATA_DIR")
 
-corona_country_data["case_fatality"] = {}
-corona_country_data["active_cases"] = {}
-for _type in ["cumulative", "daily_increase", "growth"]:
-    confirmed = corona_country_data["confirmed"][_type]
-    deaths = corona_country_data["deaths"][_type]
-    recovered = corona_country_data["recovered"][_type]
-    corona_country_data["case_fatality"][_type] = deaths / confirmed * 100
-    # corona_country_data["active_cases"][_type] = confirmed - (deaths + recovered)
 
+def get_jhu_sources(files: Dict[str, str] = JHU_FILES) -> Dict[str, str]:
+    """Return the URL, or local file path, of each JHU data source."""
+    if JHU_DATA_DIR:
+        return {k: os.path.join(JHU_DATA_DIR, v) for k, v in files.items()}
+    return {k: f"{JHU_URL}/{v}" for k, v in files.items()}
 
-def get_doubling_time_ts_df(
-    countries: List[str], line_graph_view: str, data_source: str
-) -> pd.DataFrame:
-    """Logic to filter data for "Development since 100 cases" category, where day of 100 cases becomes day 0.
-    For each row, shift daily data left for values greater than 100, and remove if less than 100.
+
+class ThresholdIndex:
+    """Lookup table which aligns the cumulative time series of each country on the day it first exceeds a threshold.
+
+    Cumulative counts only go up, so after flattening out the odd downwards reporting correction each row is sorted.
+    Shifting all values to start at 1 and offsetting every row by its position times the range of the values makes the
+    whole flattened array sorted, so the crossing day of any threshold resolves for all countries with a single
+    `np.searchsorted` call. Values may be negative, e.g. for active cases, and missing days before the first reported
+    one never exceed a threshold.
+    """
+
+    def __init__(self, cube: TimeSeriesCube, data_source: str):
+        self.cube = cube
+        self.values = cube.matrix(data_source, "cumulative")
+        self.num_days = cube.num_days
+
+        # missing days keep the previous maximum, and stay missing until the first reported day
+        monotonic = np.fmax.accumulate(self.values, axis=1)
+        reported = ~np.isnan(monotonic)
+        self._low = monotonic[reported].min() if reported.any() else 0.0
+        high = monotonic[reported].max() if reported.any() else 0.0
+        # unreported days at 0, below every reported value
+        shifted = np.where(reported, monotonic - self._low + 1, 0)
+        self._stride = high - self._low + 2
+        offsets = np.arange(len(monotonic)) * self._stride
+        self._sorted_flat = (shifted + offsets[:, None]).ravel()
+
+    def first_crossing(self, rows: np.ndarray, thresh: float) -> np.ndarray:
+        """Return the index of the first day where the rows exceed the threshold, or `num_days` if they never do."""
+        shifted = np.clip(thresh - self._low + 1, 0, self._stride - 1)
+        targets = shifted + rows * self._stride
+        positions = np.searchsorted(self._sorted_flat, targets, side="right")
+        return np.clip(positions - rows * self.num_days, 0, self.num_days)
+
+    def align(
+        self, countries: List[str], thresh: float
+    ) -> Tuple[List[str], np.ndarray]:
+        """Return the time series of the countries shifted left so that day 0 is the first day above the threshold.
+
+        Countries which are unknown or never exceed the threshold are dropped.
+        """
+        countries, rows = self.cube.lookup(list(dict.fromkeys(countries)))
+        first_days = self.first_crossing(rows, thresh)
+        crossed = first_days < self.num_days
+
+        rows, first_days = rows[crossed], first_days[crossed]
+        days = first_days[:, None] + np.arange(self.num_days)
+        aligned = np.where(
+            days < self.num_days,
+            self.values[rows[:, None], np.minimum(days, self.num_days - 1)],
+            np.nan,
+        )
+        return [c for c, keep in zip(countries, crossed) if keep], aligned
+
+
+def get_doubling_time_series(
+    countries: List[str], thresh: float, threshold_index: ThresholdIndex
+) -> Tuple[List[str], np.ndarray]:
+    """Logic to filter data for "Development since N cases" category, where day of N cases becomes day 0.
+    For each country, shift daily data left for values greater than N, and remove if never greater than N.
 
     Args:
         countries: list of countries to filter data
-        line_graph_view: filtering and viewing type of data
-        data_source: source of raw data
+        thresh: minimum number of cases which marks day 0
+        threshold_index: index over the cumulative data of the selected data source
 
     Returns:
-         filtered dataframe
+         names and a name x day array of the filtered time series, including reference rows for pure doubling times
     """
-
-    thresh = int(line_graph_view.split("_")[1])  # 10 or 100
-    df = corona_country_data[data_source]["cumulative"].copy()
-
-    for index, row in df.iterrows():
-        days_greater_thresh = np.argmax(row > thresh)
-        if days_greater_thresh == 0 and not df.loc[index][0] > thresh:
-            # drop indices where no data exceeds the threshold
-            df = df.drop(index, axis=0)
-        else:
-            # shift the values where > thresh to the left
-            df.loc[index] = df.loc[index].shift(-days_greater_thresh)
-    df.columns = list(range(len(df.columns)))
-
-    def _double(t, doubling_time_days):
-        """Return data for pure doubling time in "n" days"""
-        return thresh * 2 ** (t / doubling_time_days)
-
-    available_countries = set(countries).intersection(set(df.index))
-    max_val = df.loc[available_countries].max().max()
-    for d in [1, 2, 3, 7, 14]:
-        double_arr = list(map(partial(_double, doubling_time_days=d), df.columns,))
-        double_arr = [x if x < max_val else np.nan for x in double_arr]
-        df.loc[f"double in {d} days"] = double_arr
-
-    return df
+    names, aligned = threshold_index.align(countries, thresh)
+    if not names:
+        return names, aligned
+
+    max_val = np.nanmax(aligned)
+    doubling_times = np.array([1, 2, 3, 7, 14])
+    double_arr = thresh * 2 ** (np.arange(aligned.shape[1]) / doubling_times[:, None])
+    double_arr = np.where(double_arr < max_val, double_arr, np.nan)
+    return (
+        names + [f"double in {d} days" for d in doubling_times],
+        np.vstack([aligned, double_arr]),
+    )
@@ -0,0 +1,243 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .derived import (
+    COMBINED_SOURCES,
+    DERIVED_MEMORY_BUDGET,
+    METRICS,
+    DerivedCache,
+    metric_name,
+    parse_metric,
+)
+
+
+class TimeSeriesCube:
+    """The cumulative JHU time series in one contiguous float array of shape source x country x date.
+
+    Sources and countries are resolved to integer positions through lookup tables built once, and the date axis is
+    parsed once, so callbacks never do label based pandas indexing or date parsing per request. All other metrics and
+    the combined sources are derived on first use (see derived.py) and memoized within the memory budget.
+    """
+
+    def __init__(
+        self,
+        cumulative: np.ndarray,
+        sources: List[str],
+        countries: List[str],
+        dates: pd.DatetimeIndex,
+        populations: Optional[np.ndarray] = None,
+        memory_budget: float = DERIVED_MEMORY_BUDGET,
+    ):
+        self.cumulative = cumulative
+        self.loaded_sources = list(sources)
+        self.countries = list(countries)
+        self.dates = dates
+        self.populations = (
+            np.full(len(self.countries), np.nan) if populations is None else populations
+        )
+
+        # the combined sources which can be derived from the loaded ones
+        self.sources = self.loaded_sources + [
+            name
+            for name, combined in COMBINED_SOURCES.items()
+            if set(combined.depends) <= set(self.loaded_sources)
+        ]
+        self.metrics = list(METRICS)
+
+        # date labels in the original JHU format, and shortened for axis ticks
+        self.date_labels = [f"{d.month}/{d.day}/{d:%y}" for d in dates]
+        self.axis_labels = [f"{d.month}/{d.day}" for d in dates]
+
+        self._source_ids = {s: i for i, s in enumerate(self.loaded_sources)}
+        self.country_ids = {c: i for i, c in enumerate(self.countries)}
+        self.derived = DerivedCache(memory_budget)
+        # derived arrays of the previous data version, while they are extended by `reuse`
+        self._reusable = {}  # type: Dict[Tuple[str, str], np.ndarray]
+
+    @classmethod
+    def from_frames(
+        cls,
+        cumulative_frames: Dict[str, pd.DataFrame],
+        populations: Optional[pd.Series] = None,
+    ) -> "TimeSeriesCube":
+        """Stack the cumulative frames of each source, aligned on the union of countries and dates.
+
+        `populations` maps countries to their number of inhabitants, for the per capita metrics.
+        """
+        sources = list(cumulative_frames)
+        frames = list(cumulative_frames.values())
+        countries = list(dict.fromkeys(c for df in frames for c in df.index))
+        columns = list(dict.fromkeys(c for df in frames for c in df.columns))
+
+        dates = pd.to_datetime(columns, format="%m/%d/%y")
+        order = np.argsort(dates.values, kind="stable")
+        dates = dates[order]
+        columns = [columns[i] for i in order]
+
+        cumulative = np.full((len(sources), len(countries), len(dates)), np.nan)
+        for i, df in enumerate(frames):
+            cumulative[i] = df.reindex(index=countries, columns=columns).to_numpy(
+                dtype=float
+            )
+        if populations is not None:
+            populations = populations.reindex(countries).to_numpy(dtype=float)
+            populations[populations <= 0] = np.nan
+
+        return cls(cumulative, sources, countries, pd.DatetimeIndex(dates), populations)
+
+    @property
+    def num_days(self) -> int:
+        return len(self.dates)
+
+    def __contains__(self, country: str) -> bool:
+        return country in self.country_ids
+
+    def matrix(self, source: str, metric: str) -> np.ndarray:
+        """Return the country x date view of one source and metric. The view is not a copy, don't modify it.
+
+        Raises a KeyError for unknown sources and metrics.
+        """
+        name, window = parse_metric(metric)
+        if name == "cumulative" and source in self._source_ids:
+            return self.cumulative[self._source_ids[source]]
+        if source not in self.sources:
+            raise KeyError(f"Unknown source {source}")
+        return self.derived.get(
+            (source, metric_name(name, window)),
+            lambda: self._derive(source, name, window),
+        )
+
+    def _derive(self, source: str, name: str, window: Optional[int]) -> np.ndarray:
+        previous = self._reusable.pop((source, metric_name(name, window)), None)
+        if previous is None:
+            return self._compute(source, name, window, self.matrix)
+
+        # only the added days, from the dependencies of the days they look back on
+        combined = COMBINED_SOURCES.get(source)
+        if combined is not None and (combined.per_metric or name == "cumulative"):
+            lookback = 0
+        else:
+            lookback = METRICS[name].lookback(window)
+        old_days = previous.shape[1]
+        start = max(old_days - lookback, 0)
+        added = self._compute(
+            source, name, window, lambda s, m: self.matrix(s, m)[:, start:]
+        )[:, old_days - start :]
+        return np.concatenate([previous, added], axis=1)
+
+    def _compute(
+        self,
+        source: str,
+        name: str,
+        window: Optional[int],
+        dependency: Callable[[str, str], np.ndarray],
+    ) -> np.ndarray:
+        """Compute a derived array from its dependencies, as returned by `dependency(source, metric)`."""
+        combined = COMBINED_SOURCES.get(source)
+        if combined is not None and (combined.per_metric or name == "cumulative"):
+            metric = metric_name(name, window)
+            return combined.compute(*(dependency(s, metric) for s in combined.depends))
+
+        derived = METRICS[name]
+        dependencies = (
+            dependency(source, metric_name(d, window if METRICS[d].window else None))
+            for d in derived.depends
+        )
+        return derived.compute(self, window, *dependencies)
+
+    def reuse(self, previous: "TimeSeriesCube") -> int:
+        """Take over the derived arrays of the previous data version, computing only the days added since.
+
+        Arrays of sources whose earlier days were revised, and per capita arrays if a population changed, are not
+        reused and get derived in full when they are next used. Returns the number of reused arrays.
+        """
+        old_days = previous.num_days
+        if (
+            self.countries != previous.countries
+            or old_days > self.num_days
+            or not self.dates[:old_days].equals(previous.dates)
+        ):
+            return 0
+
+        unchanged = {
+            source
+            for source, i in self._source_ids.items()
+            if source in previous._source_ids
+            and same_values(
+                self.cumulative[i, :, :old_days],
+                previous.cumulative[previous._source_ids[source]],
+            )
+        }
+        same_populations = same_values(self.populations, previous.populations)
+        for (source, metric), values in previous.derived.items():
+            combined = COMBINED_SOURCES.get(source)
+            loaded = combined.depends if combined is not None else (source,)
+            if not unchanged.issuperset(loaded):
+                continue
+            if METRICS[parse_metric(metric)[0]].per_capita and not same_populations:
+                continue
+            self._reusable[(source, metric)] = values
+
+        reused = len(self._reusable)
+        try:
+            # dependencies are extended first, when the arrays depending on them ask for them
+            for source, metric in list(self._reusable):
+                self.matrix(source, metric)
+        finally:
+            self._reusable = {}
+        return reused
+
+    def lookup(self, countries: List[str]) -> Tuple[List[str], np.ndarray]:
+        """Return the known countries, in the given order, together with their integer ids."""
+        known = [c for c in countries if c in self.country_ids]
+        return known, np.array([self.country_ids[c] for c in known], dtype=int)
+
+    def select(
+        self, source: str, metric: str, countries: List[str]
+    ) -> Tuple[List[str], np.ndarray]:
+        """Return the known countries and a country x date array of their time series."""
+        known, ids = self.lookup(countries)
+        return known, self._rows(source, metric, ids)
+
+    def _rows(self, source: str, metric: str, ids: np.ndarray) -> np.ndarray:
+        """Return the rows of a metric. Windows other than the default are only computed for the rows.
+
+        The cumulative values are the prefix sums of the daily counts, so the average over any window is a difference
+        of two of them per day, cheap enough to not keep a whole matrix for every window size the app asks for.
+        """
+        name, window = parse_metric(metric)
+        canonical = metric_name(name, window)
+        if (
+            canonical == name
+            or METRICS[name].per_capita
+            or (source, canonical) in self.derived
+        ):
+            return self.matrix(source, metric)[ids]
+        if source not in self.sources:
+            raise KeyError(f"Unknown source {source}")
+        return self._compute(source, name, window, lambda s, m: self._rows(s, m, ids))
+
+    def series(self, source: str, metric: str, country: str) -> np.ndarray:
+        return self.matrix(source, metric)[self.country_ids[country]]
+
+
+def same_values(a: np.ndarray, b: np.ndarray) -> bool:
+    """Whether the arrays are equal, counting unknown values as equal."""
+    return a.shape == b.shape and bool(((a == b) | (np.isnan(a) & np.isnan(b))).all())
+
+
+class SourceIndices(dict):
+    """Indices over the data of each source of a cube, e.g. `ThresholdIndex`, built when a source is first looked up."""
+
+    def __init__(self, cube: TimeSeriesCube, index_type: type):
+        super().__init__()
+        self.cube = cube
+        self.index_type = index_type
+
+    def __missing__(self, source: str):
+        if source not in self.cube.sources:
+            raise KeyError(source)
+        index = self[source] = self.index_type(self.cube, source)
+        return index
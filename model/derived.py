@@ -0,0 +1,240 @@
+"""Registry of the metrics derived from the cumulative JHU time series.
+
+A metric is declared by the metrics of the same source it is computed from, and a combined source by the sources it
+is computed from. `TimeSeriesCube.matrix` resolves both on first use and memoizes the result for its data version,
+so adding a metric never touches the loaders and only the metrics the app asks for are ever computed.
+
+Windowed metrics take their window from the name, "daily_increase" uses the default window of 7 days and
+"daily_increase_14d" a window of 14 days. The dependencies of a windowed metric use the same window.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# window of the smoothed metrics when none is given in the name
+DEFAULT_WINDOW = 7
+MAX_WINDOW = 28
+
+# megabytes of derived arrays kept per data version, the least recently used ones are dropped beyond it
+DERIVED_MEMORY_BUDGET = float(os.environ.get("DERIVED_MEMORY_BUDGET", 512))
+
+_WINDOWED_NAME = re.compile(r"^(\w+)_(\d+)d$")
+
+
+class DerivedMetric(NamedTuple):
+    """A metric computed from other metrics of the same source, with `compute(cube, window, *dependencies)`."""
+
+    depends: Tuple[str, ...]
+    compute: Callable[..., np.ndarray]
+    # default window of windowed metrics, None for metrics without a window
+    window: Optional[int]
+    # days before a day whose dependency values the day depends on, for a given window
+    lookback: Callable[[Optional[int]], int]
+    # whether the metric also depends on the populations of the countries
+    per_capita: bool
+
+
+class CombinedSource(NamedTuple):
+    """A source computed from the same metric of other sources, with `compute(*dependencies)`.
+
+    Unless `per_metric` is set, only its cumulative values are combined and the other metrics derive from those.
+    """
+
+    depends: Tuple[str, ...]
+    compute: Callable[..., np.ndarray]
+    per_metric: bool
+
+
+# cumulative values are loaded, not derived
+METRICS = {
+    "cumulative": DerivedMetric((), None, None, lambda window: 0, False)
+}  # type: Dict[str, DerivedMetric]
+COMBINED_SOURCES = {}  # type: Dict[str, CombinedSource]
+
+
+def register_metric(
+    name: str,
+    depends: Tuple[str, ...],
+    window: int = None,
+    lookback: Callable[[Optional[int]], int] = lambda window: 0,
+    per_capita: bool = False,
+):
+    """Declare a metric, decorates its compute function."""
+
+    def _register(compute: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+        METRICS[name] = DerivedMetric(
+            tuple(depends), compute, window, lookback, per_capita
+        )
+        return compute
+
+    return _register
+
+
+def register_source(name: str, depends: Tuple[str, ...], per_metric: bool = False):
+    """Declare a combined source, decorates its compute function."""
+
+    def _register(compute: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+        COMBINED_SOURCES[name] = CombinedSource(tuple(depends), compute, per_metric)
+        return compute
+
+    return _register
+
+
+def parse_metric(metric: str) -> Tuple[str, Optional[int]]:
+    """Split a metric name into the registered metric and its window, raises a KeyError for unknown metrics."""
+    if metric in METRICS:
+        return metric, METRICS[metric].window
+    match = _WINDOWED_NAME.match(metric)
+    registered = METRICS.get(match.group(1)) if match else None
+    if registered and registered.window and 1 <= int(match.group(2)) <= MAX_WINDOW:
+        return match.group(1), int(match.group(2))
+    raise KeyError(f"Unknown metric {metric}")
+
+
+def metric_name(name: str, window: Optional[int]) -> str:
+    """The canonical name of a metric with a window, so that equal metrics share a cache entry."""
+    if window is None or window == METRICS[name].window:
+        return name
+    return f"{name}_{window}d"
+
+
+def _shift(values: np.ndarray, periods: int) -> np.ndarray:
+    """Shift the days of a country x date array right, like `DataFrame.shift(axis=1)`."""
+    shifted = np.full_like(values, np.nan)
+    if periods < values.shape[1]:
+        shifted[:, periods:] = values[:, : values.shape[1] - periods]
+    return shifted
+
+
+@register_metric(
+    "daily_increase",
+    depends=("cumulative",),
+    window=DEFAULT_WINDOW,
+    lookback=lambda window: window,
+)
+def _daily_increase(cube, window: int, cumulative: np.ndarray) -> np.ndarray:
+    """The smoothed day-over-day increase."""
+    return (cumulative - _shift(cumulative, window)) / window
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over the window of days from prefix sums, unknown for the first days. Values must be finite."""
+    sums = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(values, axis=1, out=sums[:, 1:])
+    mean = np.full_like(values, np.nan)
+    if window <= values.shape[1]:
+        mean[:, window - 1 :] = (sums[:, window:] - sums[:, :-window]) / window
+    return mean
+
+
+@register_metric(
+    "growth",
+    depends=("daily_increase",),
+    window=DEFAULT_WINDOW,
+    # the ratio to the daily increase a window before, averaged over a window
+    lookback=lambda window: 2 * window - 1,
+)
+def _growth_factor(cube, window: int, daily_increase: np.ndarray) -> np.ndarray:
+    """The smoothed exponential growth factor, days without a finite ratio count as no growth."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = daily_increase / _shift(daily_increase, window)
+    ratio[~np.isfinite(ratio)] = 1
+    return _rolling_mean(ratio, window)
+
+
+def _per_million(cube, window: Optional[int], values: np.ndarray) -> np.ndarray:
+    """Values per million inhabitants, unknown for countries without a known population."""
+    return values / cube.populations[:, None] * 1e6
+
+
+register_metric("cumulative_per_1m", depends=("cumulative",), per_capita=True)(
+    _per_million
+)
+register_metric(
+    "daily_increase_per_1m",
+    depends=("daily_increase",),
+    window=DEFAULT_WINDOW,
+    per_capita=True,
+)(_per_million)
+
+
+@register_source("case_fatality", depends=("deaths", "confirmed"), per_metric=True)
+def _case_fatality(deaths: np.ndarray, confirmed: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return deaths / confirmed * 100
+
+
+@register_source("active_cases", depends=("confirmed", "deaths", "recovered"))
+def _active_cases(
+    confirmed: np.ndarray, deaths: np.ndarray, recovered: np.ndarray
+) -> np.ndarray:
+    return confirmed - (deaths + recovered)
+
+
+class DerivedCache:
+    """Derived arrays of one data version, the least recently used are dropped once they exceed the memory budget.
+
+    Arrays are computed outside the lock, so a slow metric never blocks reads of the others. Two threads asking for
+    the same missing metric at once may both compute it, and the first result is kept. Arrays unpickled with the cache,
+    e.g. mapped from a published snapshot, are shared with other processes: they don't count against the budget and
+    are never dropped.
+    """
+
+    def __init__(self, memory_budget: float = DERIVED_MEMORY_BUDGET):
+        self.max_bytes = memory_budget * 2 ** 20
+        self.nbytes = 0
+        self._arrays = OrderedDict()  # type: OrderedDict
+        self._shared = {}  # type: Dict[Tuple[str, str], np.ndarray]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._arrays) + len(self._shared)
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._arrays or key in self._shared
+
+    def __getstate__(self) -> dict:
+        # keep the arrays, e.g. to publish them along with the snapshot, but not the lock
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        state["_shared"] = {**state.get("_shared", {}), **state["_arrays"]}
+        state["_arrays"] = OrderedDict()
+        state["nbytes"] = 0
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def items(self) -> List[Tuple[Tuple[str, str], np.ndarray]]:
+        """The cached arrays, the shared ones first, then from the least to the most recently used."""
+        with self._lock:
+            return list(self._shared.items()) + list(self._arrays.items())
+
+    def get(
+        self, key: Tuple[str, str], compute: Callable[[], np.ndarray]
+    ) -> np.ndarray:
+        with self._lock:
+            if key in self._shared:
+                return self._shared[key]
+            if key in self._arrays:
+                self._arrays.move_to_end(key)
+                return self._arrays[key]
+
+        values = compute()
+        # shared by all callbacks, so no one may modify it
+        values.flags.writeable = False
+        with self._lock:
+            if key in self._arrays:
+                return self._arrays[key]
+            self._arrays[key] = values
+            self.nbytes += values.nbytes
+            # the newest array is kept even if it is larger than the whole budget
+            while self.nbytes > self.max_bytes and len(self._arrays) > 1:
+                _, evicted = self._arrays.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+        return values
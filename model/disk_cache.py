@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from glob import glob
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .hierarchy import GLOBAL_LEVELS, US_LEVELS
+from .utils import country_map
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CACHE_DIR = os.path.join("model", "cache")
+
+# bump whenever the processing changes, so stale arrays are never loaded
+CACHE_FORMAT_VERSION = 2
+
+DIGEST_LENGTH = 16
+
+
+def source_digest(raw_data: bytes) -> str:
+    """Return the key identifying the content of a raw data source."""
+    return hashlib.sha256(raw_data).hexdigest()[:DIGEST_LENGTH]
+
+
+def processing_digest() -> str:
+    """Return the key identifying how the raw data is processed, from the format version and the processing parameters.
+
+    Entries processed with another country name mapping or other region levels are never loaded, even if nobody
+    remembered to bump `CACHE_FORMAT_VERSION`.
+    """
+    parameters = {
+        "format": CACHE_FORMAT_VERSION,
+        "country_map": country_map,
+        "levels": [GLOBAL_LEVELS, US_LEVELS],
+    }
+    return source_digest(json.dumps(parameters, sort_keys=True).encode())
+
+
+def _version_dir() -> str:
+    return os.path.join(CACHE_DIR, f"v{CACHE_FORMAT_VERSION}_{processing_digest()}")
+
+
+def _entry_dir(name: str, digest: str) -> str:
+    return os.path.join(_version_dir(), f"{name}_{digest}")
+
+
+def _entry_pattern(name: str) -> str:
+    # only match the digest, so e.g. "confirmed" doesn't match "confirmed_regions"
+    return f"{name}_" + "[0-9a-f]" * DIGEST_LENGTH
+
+
+def load_frames(name: str, digest: str) -> Optional[Dict[str, pd.DataFrame]]:
+    """Load the processed frames of a data source from the binary cache, or None if they are not cached.
+
+    The arrays are memory-mapped read-only, so loading neither parses nor copies the data.
+    """
+    entry_dir = _entry_dir(name, digest)
+    labels_file = os.path.join(entry_dir, "labels.json")
+    if not os.path.exists(labels_file):
+        return None
+
+    with open(labels_file, "r") as f:
+        labels = json.load(f)
+    logger.info(f"Using cached {name} time series {entry_dir}")
+    if "index_names" in labels:
+        index = pd.MultiIndex.from_tuples(
+            [tuple(i) for i in labels["index"]], names=labels["index_names"]
+        )
+    else:
+        index = pd.Index(labels["index"], name=labels["index_name"])
+    return {
+        metric: pd.DataFrame(
+            np.load(os.path.join(entry_dir, f"{metric}.npy"), mmap_mode="r"),
+            index=index,
+            columns=labels["columns"],
+        )
+        for metric in labels["metrics"]
+    }
+
+
+def load_latest_frames(name: str) -> Optional[Dict[str, pd.DataFrame]]:
+    """Load the most recently cached frames of a data source, whatever content they were processed from."""
+    entry_dirs = glob(os.path.join(_version_dir(), _entry_pattern(name)))
+    if not entry_dirs:
+        return None
+    latest = max(entry_dirs, key=os.path.getmtime)
+    return load_frames(name, latest.rsplit("_", 1)[1])
+
+
+def save_frames(name: str, digest: str, frames: Dict[str, pd.DataFrame]):
+    """Save the processed frames of a data source to the binary cache, replacing older versions of the source.
+
+    All frames of a source must share the same index and columns. The index may be a MultiIndex of strings.
+    """
+    first = next(iter(frames.values()))
+    labels = {
+        "index": list(first.index),
+        "index_name": first.index.name,
+        "columns": list(first.columns),
+        "metrics": list(frames),
+    }
+    if isinstance(first.index, pd.MultiIndex):
+        labels["index_names"] = list(first.index.names)
+
+    # write into a temporary directory and rename it, so readers never see a partial entry
+    version_dir = _version_dir()
+    os.makedirs(version_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f".{name}_", dir=version_dir)
+    for metric, df in frames.items():
+        np.save(os.path.join(tmp_dir, f"{metric}.npy"), df.to_numpy())
+    with open(os.path.join(tmp_dir, "labels.json"), "w") as f:
+        json.dump(labels, f)
+
+    entry_dir = _entry_dir(name, digest)
+    try:
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # another process cached the same content first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return
+    logger.info(f"saved cached {name} time series to {entry_dir}")
+
+    for old_entry_dir in glob(os.path.join(version_dir, _entry_pattern(name))):
+        if old_entry_dir != entry_dir:
+            shutil.rmtree(old_entry_dir, ignore_errors=True)
@@ -0,0 +1,114 @@
+import logging
+import os
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# retries after the first attempt, on connection errors, timeouts and the statuses below
+FETCH_RETRIES = int(os.environ.get("FETCH_RETRIES", 3))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# seconds before the retries, doubling with every retry
+RETRY_BACKOFF = 0.5
+
+# seconds to connect, and to wait for the next bytes of the response
+TIMEOUT = (5, 30)
+
+# connections kept open per host, enough for all data sources loading at once
+MAX_CONNECTIONS = 8
+
+
+class FetchResult(NamedTuple):
+    content: bytes
+    encoding: Optional[str]
+    # False if the server answered that the content did not change since the last request
+    modified: bool
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+class _Validated(NamedTuple):
+    headers: Dict[str, str]
+    content: bytes
+    encoding: Optional[str]
+
+
+class HttpFetcher:
+    """One pooled HTTP session for all data sources, with bounded retries and conditional requests.
+
+    Connections are kept open and shared by all threads, so concurrent loads and hourly refreshes skip the connection
+    and TLS setup. Connection errors, timeouts and 429/5xx responses are retried with exponential backoff, honoring
+    Retry-After. The ETag and Last-Modified of every response are kept with its content, and sent with the next
+    request of the same URL, so an unchanged source is answered with a 304 without a body and the kept content is
+    returned instead.
+    """
+
+    def __init__(
+        self,
+        retries: int = FETCH_RETRIES,
+        backoff: float = RETRY_BACKOFF,
+        timeout: Tuple[float, float] = TIMEOUT,
+        max_connections: int = MAX_CONNECTIONS,
+    ):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max_connections,
+            pool_maxsize=max_connections,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff,
+                status_forcelist=RETRY_STATUSES,
+                # the last response is returned, and raises in `get` like any other error status
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._validated = {}  # type: Dict[str, _Validated]
+        self._lock = threading.Lock()
+
+    def get(self, url: str, conditional: bool = True) -> FetchResult:
+        """Return the content of the URL, the content of the previous response if it did not change.
+
+        Raises a `requests.RequestException` once the retries are used up, `requests.HTTPError` for error statuses.
+        """
+        with self._lock:
+            previous = self._validated.get(url) if conditional else None
+        response = self.session.get(
+            url, headers=previous.headers if previous else None, timeout=self.timeout
+        )
+        if response.status_code == 304 and previous is not None:
+            logger.info(f"{url} not modified")
+            return FetchResult(previous.content, previous.encoding, modified=False)
+        response.raise_for_status()
+
+        headers = {}
+        if response.headers.get("ETag"):
+            headers["If-None-Match"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            headers["If-Modified-Since"] = response.headers["Last-Modified"]
+        with self._lock:
+            if headers:
+                self._validated[url] = _Validated(
+                    headers, response.content, response.encoding
+                )
+            else:
+                self._validated.pop(url, None)
+        return FetchResult(response.content, response.encoding, modified=True)
+
+    def clear(self):
+        """Forget the kept responses, so the next requests fetch the full content."""
+        with self._lock:
+            self._validated.clear()
+
+
+# shared by all data sources
+http_fetcher = HttpFetcher()
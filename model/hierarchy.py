@@ -0,0 +1,155 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# label columns of the JHU files, from the coarsest to the finest level
+GLOBAL_LEVELS = ["Country/Region", "Province/State"]
+US_LEVELS = ["Country_Region", "Province_State", "Admin2"]
+
+_DATE_COLUMN = re.compile(r"^\d{1,2}/\d{1,2}/\d{2}$")
+
+
+def date_columns(df: pd.DataFrame) -> List[str]:
+    """Return the date columns of a JHU time series table, in their order."""
+    return [c for c in df.columns if _DATE_COLUMN.match(str(c))]
+
+
+class RegionHierarchy:
+    """Cumulative time series at the finest regional level, with precomputed totals of every coarser level.
+
+    Level k groups the regions by their first k + 1 labels, e.g. country, then province/state, then county. The
+    membership of the regions in the groups of a level is a sparse 0/1 matrix, stored like a CSR matrix as the
+    member regions of each group (`members`, `indptr`), and the groups of the next level within each group alike
+    (`child_ids`, `child_indptr`). The totals of all levels are summed once on construction, so the total of any
+    country, state or county is a row lookup, and drilling down only selects rows.
+    """
+
+    def __init__(
+        self,
+        labels: pd.DataFrame,
+        values: np.ndarray,
+        dates: List[str],
+        rename: Optional[Dict[str, str]] = None,
+    ):
+        labels = labels.astype(object).reset_index(drop=True)
+        # regions without a finer label, like the main part of a country with provinces, are named after the parent
+        for i in range(1, labels.shape[1]):
+            missing = labels.iloc[:, i].isna() | (labels.iloc[:, i] == "")
+            labels.iloc[missing.to_numpy(), i] = labels.iloc[missing.to_numpy(), i - 1]
+
+        self.levels = list(labels.columns)
+        self.labels = labels
+        self.values = np.asarray(values, dtype=float)
+        self.dates = list(dates)
+        self._rename = rename or {}
+
+        self.paths = []  # type: List[List[Tuple[str, ...]]]
+        self.parents = []  # type: List[np.ndarray]
+        self.members = []  # type: List[np.ndarray]
+        self.indptr = []  # type: List[np.ndarray]
+        self.child_ids = []  # type: List[np.ndarray]
+        self.child_indptr = []  # type: List[np.ndarray]
+        self.totals = []  # type: List[np.ndarray]
+        self._group_ids = []  # type: List[Dict[Tuple[str, ...], int]]
+
+        # missing counts add nothing, like in a pandas groupby sum
+        values = np.nan_to_num(self.values)
+        for level in range(len(self.levels)):
+            keys = pd.MultiIndex.from_frame(labels.iloc[:, : level + 1])
+            codes, groups = pd.factorize(keys, sort=True)
+            members = np.argsort(codes, kind="stable")
+            counts = np.bincount(codes, minlength=len(groups))
+            indptr = np.concatenate([[0], np.cumsum(counts)])
+            if len(members):
+                totals = np.add.reduceat(values[members], indptr[:-1], axis=0)
+            else:
+                totals = np.empty((0, len(self.dates)))
+
+            paths = [self._renamed(path) for path in groups]
+            self.paths.append(paths)
+            self.members.append(members)
+            self.indptr.append(indptr)
+            self.totals.append(totals)
+            self._group_ids.append({path: i for i, path in enumerate(paths)})
+            if level:
+                parent_ids = self._group_ids[level - 1]
+                parents = np.array([parent_ids[p[:-1]] for p in paths], dtype=int)
+                counts = np.bincount(parents, minlength=len(parent_ids))
+                self.child_ids.append(np.argsort(parents, kind="stable"))
+                self.child_indptr.append(np.concatenate([[0], np.cumsum(counts)]))
+            else:
+                parents = np.full(len(paths), -1)
+                self.child_ids.append(np.empty(0, dtype=int))
+                self.child_indptr.append(np.zeros(1, dtype=int))
+            self.parents.append(parents)
+
+    def _renamed(self, path: Tuple[str, ...]) -> Tuple[str, ...]:
+        return (self._rename.get(path[0], path[0]),) + tuple(path[1:])
+
+    @classmethod
+    def from_jhu(cls, df: pd.DataFrame, levels: List[str], rename=None):
+        """Build the hierarchy from a JHU time series table, global or US."""
+        dates = date_columns(df)
+        return cls(df[levels], df[dates].to_numpy(dtype=float), dates, rename)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, rename=None):
+        """Build the hierarchy from a frame indexed by the labels of the regions, as returned by `to_frame`."""
+        return cls(df.index.to_frame(index=False), df.to_numpy(), df.columns, rename)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the finest level time series, indexed by the labels of all levels."""
+        return pd.DataFrame(
+            self.values,
+            index=pd.MultiIndex.from_frame(self.labels),
+            columns=self.dates,
+        )
+
+    def level_totals(self, level: int = 0) -> pd.DataFrame:
+        """Return the totals of all groups of a level, indexed by their names."""
+        return pd.DataFrame(
+            self.totals[level],
+            index=[path[-1] for path in self.paths[level]],
+            columns=self.dates,
+        )
+
+    def __contains__(self, path: Tuple[str, ...]) -> bool:
+        return 0 < len(path) <= len(self.levels) and tuple(path) in self._group_ids[
+            len(path) - 1
+        ]
+
+    def _child_ids(self, path: Tuple[str, ...]) -> np.ndarray:
+        """The ids of the groups one level below the path, within their level."""
+        path = tuple(path)
+        if path not in self or len(path) == len(self.levels):
+            return np.empty(0, dtype=int)
+        level = len(path)
+        group = self._group_ids[level - 1][path]
+        start, end = self.child_indptr[level][group : group + 2]
+        return self.child_ids[level][start:end]
+
+    def child_names(self, path: Tuple[str, ...]) -> List[str]:
+        """Return the names of the groups one level below the path, e.g. the states of ("USA",)."""
+        level = len(path)
+        return [self.paths[level][i][-1] for i in self._child_ids(path)]
+
+    def children(self, path: Tuple[str, ...]) -> pd.DataFrame:
+        """Return the totals of the groups one level below the path, e.g. the states of ("USA",)."""
+        child_ids = self._child_ids(path)
+        if not len(child_ids):
+            return pd.DataFrame(columns=self.dates)
+        level = len(path)
+        return pd.DataFrame(
+            self.totals[level][child_ids],
+            index=[self.paths[level][i][-1] for i in child_ids],
+            columns=self.dates,
+        )
+
+    def has_children(self, path: Tuple[str, ...]) -> bool:
+        """Whether the region is split into more than just itself at the next level."""
+        child_ids = self._child_ids(path)
+        return len(child_ids) > 1 or (
+            len(child_ids) == 1 and self.paths[len(path)][child_ids[0]][-1] != path[-1]
+        )
@@ -0,0 +1,164 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .cssegisand_data import (
+    JHU_US_FILES,
+    ThresholdIndex,
+    get_jhu_sources,
+    load_cached_region_hierarchy,
+)
+from .cube import SourceIndices, TimeSeriesCube
+from .hierarchy import GLOBAL_LEVELS, US_LEVELS, RegionHierarchy
+from .trajectory import TrajectoryIndex
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# the country with county level data, as named in the app
+US = "USA"
+
+# separates the levels of a region path in the region dropdown values
+PATH_SEPARATOR = "|"
+
+
+class RegionView(NamedTuple):
+    """Processed time series of the subregions of one region, shaped like the country level data of a snapshot."""
+
+    path: Tuple[str, ...]
+    cube: TimeSeriesCube
+    threshold_indices: Dict[str, ThresholdIndex]
+    trajectories: Dict[str, TrajectoryIndex]
+
+
+class RegionData:
+    """Province/state and US county level data, processed on the first drill-down into a region.
+
+    The JHU global files are only split into provinces/states for some countries, the much larger US files split the
+    US into states and counties. The hierarchies of all sources are read by `load`, along with the rest of a snapshot
+    and off the request path, so callbacks never wait for files. The views of the most recently visited regions are
+    kept.
+    """
+
+    def __init__(
+        self,
+        sources: Optional[Dict[str, str]] = None,
+        us_sources: Optional[Dict[str, str]] = None,
+        max_views: int = 32,
+    ):
+        self.sources = sources or get_jhu_sources()
+        self.us_sources = us_sources or get_jhu_sources(JHU_US_FILES)
+        self.max_views = max_views
+        self._hierarchies = {}  # type: Dict[Tuple[str, str], Optional[RegionHierarchy]]
+        # digests of the content of the loaded sources, by source name and "global" or "US"
+        self.digests = {}  # type: Dict[str, str]
+        self._views = OrderedDict()  # type: OrderedDict
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # keep the hierarchies, e.g. to publish them along with the snapshot, but not the lock and the views
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_views"] = OrderedDict()
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def load(self) -> "RegionData":
+        """Read the hierarchies of all sources concurrently. Sources which can't be read are left out with a warning."""
+        keys = [(name, False) for name in self.sources]
+        keys += [(name, True) for name in self.us_sources]
+        with ThreadPoolExecutor(max_workers=len(keys)) as pool:
+            loaded = list(pool.map(lambda key: self._load_hierarchy(*key), keys))
+        with self._lock:
+            for (name, us), (hierarchy, digest) in zip(keys, loaded):
+                self._hierarchies[(name, "US" if us else "global")] = hierarchy
+                if digest is not None:
+                    self.digests[f"{name}_{'US' if us else 'global'}"] = digest
+        return self
+
+    def _load_hierarchy(
+        self, name: str, us: bool
+    ) -> Tuple[Optional[RegionHierarchy], Optional[str]]:
+        if us:
+            source, levels = self.us_sources.get(name), US_LEVELS
+        else:
+            source, levels = self.sources.get(name), GLOBAL_LEVELS
+        if not source:
+            return None, None
+        try:
+            return load_cached_region_hierarchy(
+                f"{name}_US" if us else name, source, levels
+            )
+        except Exception as e:
+            logger.warning(f"Could not load the regions of {source}: {e}")
+            return None, None
+
+    def _hierarchy(self, name: str, us: bool) -> Optional[RegionHierarchy]:
+        """The loaded hierarchy of a source, None if it was not loaded."""
+        with self._lock:
+            return self._hierarchies.get((name, "US" if us else "global"))
+
+    def hierarchies(self, path: Tuple[str, ...]) -> Dict[str, RegionHierarchy]:
+        """Return the hierarchy of each source which splits up the region.
+
+        Regions of the US come from the county level US files if they are available, which have no recovered cases.
+        Sources are never mixed between the two, as the global files only have the US as a whole.
+        """
+        if path[0] == US and self._hierarchy("confirmed", us=True) is not None:
+            names, us = self.us_sources, True
+        else:
+            names, us = self.sources, False
+        hierarchies = {name: self._hierarchy(name, us) for name in names}
+        return {
+            name: hierarchy
+            for name, hierarchy in hierarchies.items()
+            if hierarchy is not None and path in hierarchy
+        }
+
+    def has_subregions(self, path: Tuple[str, ...]) -> bool:
+        """Whether there is data below the region, e.g. for the states of the US but not for a single county."""
+        hierarchy = self.hierarchies(path).get("confirmed")
+        return hierarchy is not None and hierarchy.has_children(path)
+
+    def subregions(self, path: Tuple[str, ...]) -> List[Tuple[str, ...]]:
+        """Return the paths of the regions one level below which can be split up further, e.g. the US states."""
+        hierarchy = self.hierarchies(path).get("confirmed")
+        if hierarchy is None:
+            return []
+        children = [path + (child,) for child in hierarchy.child_names(path)]
+        return [child for child in children if hierarchy.has_children(child)]
+
+    def view(self, path: Tuple[str, ...]) -> Optional[RegionView]:
+        """Return the processed time series of the regions one level below the path, or None if it has none."""
+        path = tuple(path)
+        with self._lock:
+            if path in self._views:
+                self._views.move_to_end(path)
+                return self._views[path]
+
+        hierarchies = self.hierarchies(path)
+        if "confirmed" not in hierarchies or "deaths" not in hierarchies:
+            return None
+        if not hierarchies["confirmed"].has_children(path):
+            return None
+        cube = TimeSeriesCube.from_frames(
+            {name: hierarchy.children(path) for name, hierarchy in hierarchies.items()}
+        )
+        view = RegionView(
+            path=path,
+            cube=cube,
+            threshold_indices=SourceIndices(cube, ThresholdIndex),
+            trajectories=SourceIndices(cube, TrajectoryIndex),
+        )
+        logger.info(f"Loaded {len(cube.countries)} regions of {' / '.join(path)}")
+
+        with self._lock:
+            self._views[path] = view
+            while len(self._views) > self.max_views:
+                self._views.popitem(last=False)
+        return view
@@ -0,0 +1,180 @@
+"""Publish processed data snapshots to a directory, for every worker of a multi-worker deployment to attach to.
+
+    python -m model.shared_snapshot model/shared
+    SHARED_DATA_DIR=model/shared gunicorn app:server --workers 4
+
+The publisher loads and refreshes the data like a single app process, and writes every new snapshot as a pickle whose
+arrays are stored out-of-band in one flat file. Workers memory-map that file read-only and unpickle the arrays as views
+into it, so all workers share the same pages of the page cache and memory stays flat as workers are added. Besides
+the cumulative time series, the metrics of the line graph and the map and the indices of every source are derived
+before publishing and shared as well. Workers poll the directory and attach to new versions without restarting. Only
+point workers to a directory written by the publisher, the snapshots are pickles.
+"""
+import argparse
+import logging
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from typing import List, Optional
+
+from .store import DataSnapshot
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# set to the directory written by the publisher to attach to its snapshots, instead of loading the data sources
+SHARED_DATA_DIR = os.environ.get("SHARED_DATA_DIR")
+
+# seconds between checks of workers for a new version
+POLL_INTERVAL = 30
+
+# versions kept on disk, older ones are deleted when a new one is published. workers still attached to a deleted
+# version keep their mapping until they attach to a newer one
+KEEP_VERSIONS = 3
+
+CURRENT_FILE = "CURRENT"
+PAYLOAD_FILE = "snapshot.pickle"
+BUFFERS_FILE = "buffers.bin"
+
+# start every array on a cache line
+ALIGNMENT = 64
+
+# metrics of the line graph and the map, derived by the publisher so that all workers share them. other metrics and
+# windows are derived by each worker on first use, within its own DERIVED_MEMORY_BUDGET
+PUBLISHED_METRICS = (
+    "cumulative",
+    "daily_increase",
+    "cumulative_per_1m",
+    "daily_increase_per_1m",
+)
+
+
+def materialize_snapshot(snapshot: DataSnapshot) -> DataSnapshot:
+    """Derive the published metrics and build the indices of every source, which are otherwise built on first use."""
+    cube = snapshot.cube
+    for source in cube.sources:
+        for metric in PUBLISHED_METRICS:
+            cube.matrix(source, metric)
+            snapshot.world_map.values(source, metric)
+        snapshot.threshold_indices[source]
+        snapshot.trajectories[source]
+    return snapshot
+
+
+def publish_snapshot(
+    snapshot: DataSnapshot, root: str, keep: int = KEEP_VERSIONS
+) -> str:
+    """Write the snapshot to `root/<version>` and make it the current version, returns the directory of the version.
+
+    The region hierarchies are published along with the country level data, only the views of the regions are built
+    by each worker when they are first shown.
+    """
+    materialize_snapshot(snapshot)
+    buffers = []  # type: List[pickle.PickleBuffer]
+    payload = pickle.dumps(snapshot, protocol=5, buffer_callback=buffers.append)
+
+    # write into a temporary directory and rename it, so workers never see a partial version
+    os.makedirs(root, exist_ok=True)
+    version_dir = os.path.join(root, snapshot.version)
+    tmp_dir = tempfile.mkdtemp(dir=root, prefix=".tmp_")
+    try:
+        # workers may run as another user
+        os.chmod(tmp_dir, 0o755)
+        offsets = []
+        with open(os.path.join(tmp_dir, BUFFERS_FILE), "wb") as f:
+            for buffer in buffers:
+                raw = buffer.raw()
+                f.write(b"\0" * (-f.tell() % ALIGNMENT))
+                offsets.append((f.tell(), raw.nbytes))
+                f.write(raw)
+        with open(os.path.join(tmp_dir, PAYLOAD_FILE), "wb") as f:
+            pickle.dump({"offsets": offsets, "payload": payload}, f, protocol=5)
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.rename(tmp_dir, version_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    tmp_file = os.path.join(root, f".{CURRENT_FILE}.tmp")
+    with open(tmp_file, "w") as f:
+        f.write(snapshot.version)
+    os.replace(tmp_file, os.path.join(root, CURRENT_FILE))
+    logger.info(f"Published data version {snapshot.version} to {version_dir}")
+
+    # versions are content digests, so order them by the time they were published
+    versions = sorted(
+        (
+            d
+            for d in os.listdir(root)
+            if not d.startswith(".") and os.path.isdir(os.path.join(root, d))
+        ),
+        key=lambda d: os.path.getmtime(os.path.join(root, d)),
+    )
+    for old_version in versions[: max(len(versions) - keep, 0)]:
+        if old_version != snapshot.version:
+            shutil.rmtree(os.path.join(root, old_version), ignore_errors=True)
+    return version_dir
+
+
+def current_version(root: str) -> Optional[str]:
+    """Return the most recently published version, or None if nothing was published yet."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def attach_snapshot(root: str, version: str) -> DataSnapshot:
+    """Map a published version into memory and return it as a snapshot, without copying any of its arrays."""
+    version_dir = os.path.join(root, version)
+    with open(os.path.join(version_dir, PAYLOAD_FILE), "rb") as f:
+        published = pickle.load(f)
+
+    buffers = []
+    if published["offsets"]:
+        with open(os.path.join(version_dir, BUFFERS_FILE), "rb") as f:
+            # the mapping stays valid after closing the file, and lives as long as the arrays viewing it
+            mapped = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        buffers = [mapped[start : start + size] for start, size in published["offsets"]]
+
+    snapshot = pickle.loads(published["payload"], buffers=buffers)
+    logger.info(f"Attached to data version {version} in {version_dir}")
+    return snapshot
+
+
+class SharedSnapshotReader:
+    """Load function of a worker's DataStore, which attaches to the current published version.
+
+    Returns the same snapshot until a new version is published, so polling is cheap.
+    """
+
+    def __init__(self, root: str = SHARED_DATA_DIR):
+        self.root = root
+        self._snapshot = None  # type: Optional[DataSnapshot]
+        self._lock = threading.Lock()
+
+    def __call__(self, previous: Optional[DataSnapshot] = None) -> DataSnapshot:
+        version = current_version(self.root)
+        if version is None:
+            raise FileNotFoundError(f"No data has been published to {self.root} yet")
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = attach_snapshot(self.root, version)
+            return self._snapshot
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("directory", help="directory to publish the snapshots to")
+    args = arg_parser.parse_args()
+
+    # SHARED_DATA_DIR must not be set for the publisher, or it would wait for its own data
+    from model import data_store
+
+    data_store.add_listener(lambda s: publish_snapshot(s, args.directory))
+    data_store.start()
+    threading.Event().wait()
@@ -0,0 +1,227 @@
+import copy
+import json
+import logging
+import os
+import re
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+from glob import glob
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, fall back to the in process lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+HISTORY_DIR = os.path.join("model", "history")
+WORLDOMETER_CSV_PATTERN = os.path.join("model", "worldometer_*.csv")
+
+_CSV_TIMESTAMP = re.compile(r"worldometer_(\d{4}_\d{2}_\d{2}_\d{2}_\d{2})\.csv$")
+
+
+class SnapshotHistory:
+    """Append-only store of all worldometer snapshots, with a timestamp index.
+
+    Rows of all snapshots are appended to one flat binary file per column, plus a file of integer country ids, so a
+    snapshot is a contiguous slice of every column. `index.json` keeps the numeric columns, the country names and the
+    offset and length of every snapshot, sorted by timestamp. Data is always written before the index, so a crash
+    mid-append leaves trailing rows which are not referenced and get truncated by the next append.
+
+    Reading the latest or any past snapshot only reads its own slice, and the values of one country across all
+    snapshots are gathered from memory mapped columns in one vectorized pass.
+    """
+
+    key = "Country"
+
+    def __init__(self, root: str = HISTORY_DIR):
+        self.root = root
+        self._index_file = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        self._index = None  # type: Optional[Dict]
+        self._index_mtime = None  # type: Optional[float]
+
+    def _empty_index(self) -> Dict:
+        return {"columns": [], "countries": [], "num_rows": 0, "snapshots": []}
+
+    def _load_index(self) -> Dict:
+        """Return the index, only re-reading it from disk if another writer changed it."""
+        try:
+            mtime = os.stat(self._index_file).st_mtime
+        except FileNotFoundError:
+            return self._empty_index()
+        if self._index is None or mtime != self._index_mtime:
+            with open(self._index_file, "r") as f:
+                self._index = json.load(f)
+            self._index_mtime = mtime
+        return self._index
+
+    def _write_index(self, index: Dict):
+        tmp_file = f"{self._index_file}.tmp{os.getpid()}"
+        with open(tmp_file, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_file, self._index_file)
+        self._index = index
+        self._index_mtime = os.stat(self._index_file).st_mtime
+
+    @contextmanager
+    def _write_lock(self):
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, open(os.path.join(self.root, ".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    @property
+    def timestamps(self) -> List[str]:
+        """Timestamps of all snapshots in format `year_month_day_hour_minute`, oldest first."""
+        return [s["timestamp"] for s in self._load_index()["snapshots"]]
+
+    def __len__(self) -> int:
+        return len(self._load_index()["snapshots"])
+
+    def __contains__(self, timestamp: str) -> bool:
+        return timestamp in self.timestamps
+
+    def _column_file(self, i: int) -> str:
+        return os.path.join(self.root, f"column_{i}.f8")
+
+    def _country_file(self) -> str:
+        return os.path.join(self.root, "country_ids.i4")
+
+    def _read_slice(self, path: str, dtype: str, offset: int, length: int):
+        itemsize = np.dtype(dtype).itemsize
+        return np.fromfile(path, dtype=dtype, count=length, offset=offset * itemsize)
+
+    def append(self, timestamp: str, df: pd.DataFrame):
+        """Add a snapshot. Snapshots may be added in any order, an existing timestamp is left untouched."""
+        with self._write_lock():
+            # work on a copy, so a failed append leaves the cached index untouched
+            index = copy.deepcopy(self._load_index())
+            timestamps = [s["timestamp"] for s in index["snapshots"]]
+            if timestamp in timestamps:
+                logger.info(f"Worldometer snapshot {timestamp} is already stored")
+                return
+
+            columns = [c for c in df.columns if c != self.key]
+            if not index["columns"]:
+                index["columns"] = columns
+            unknown = set(columns) - set(index["columns"])
+            if unknown:
+                raise ValueError(
+                    f"Snapshot has columns unknown to the history {unknown}"
+                )
+
+            country_ids = {c: i for i, c in enumerate(index["countries"])}
+            for country in df[self.key]:
+                if country not in country_ids:
+                    country_ids[country] = len(index["countries"])
+                    index["countries"].append(country)
+
+            # drop rows left over from an interrupted append before writing new ones
+            num_rows = index["num_rows"]
+            files = [
+                (self._country_file(), "int32", df[self.key].map(country_ids))
+            ] + [
+                (
+                    self._column_file(i),
+                    "float64",
+                    df[c] if c in df.columns else pd.Series(np.nan, index=df.index),
+                )
+                for i, c in enumerate(index["columns"])
+            ]
+            for path, dtype, values in files:
+                with open(path, "ab") as f:
+                    f.truncate(num_rows * np.dtype(dtype).itemsize)
+                    f.write(values.to_numpy(dtype=dtype).tobytes())
+
+            snapshot = {"timestamp": timestamp, "offset": num_rows, "length": len(df)}
+            index["snapshots"].insert(bisect_right(timestamps, timestamp), snapshot)
+            index["num_rows"] = num_rows + len(df)
+            self._write_index(index)
+        logger.info(f"Stored worldometer snapshot {timestamp} in {self.root}")
+
+    def sync_csv_files(self, pattern: str = WORLDOMETER_CSV_PATTERN) -> int:
+        """Append the worldometer csv files which are not stored yet. Returns how many were added.
+
+        Only the file names are compared against the index, so the csv files are parsed once, not on every start.
+        """
+        stored = set(self.timestamps)
+        added = 0
+        for csv_file in sorted(glob(pattern)):
+            match = _CSV_TIMESTAMP.search(csv_file)
+            if match and match.group(1) not in stored:
+                self.append(match.group(1), pd.read_csv(csv_file))
+                added += 1
+        return added
+
+    def _read_snapshot(self, snapshot: Dict) -> pd.DataFrame:
+        index = self._load_index()
+        offset, length = snapshot["offset"], snapshot["length"]
+        countries = np.array(index["countries"], dtype=object)
+        data = {
+            self.key: countries[
+                self._read_slice(self._country_file(), "int32", offset, length)
+            ]
+        }
+        for i, column in enumerate(index["columns"]):
+            data[column] = self._read_slice(
+                self._column_file(i), "float64", offset, length
+            )
+        return pd.DataFrame(data)
+
+    def latest(self) -> Optional[pd.DataFrame]:
+        """Return the newest snapshot, or None if the history is empty."""
+        snapshots = self._load_index()["snapshots"]
+        return self._read_snapshot(snapshots[-1]) if snapshots else None
+
+    def latest_timestamp(self) -> Optional[str]:
+        snapshots = self._load_index()["snapshots"]
+        return snapshots[-1]["timestamp"] if snapshots else None
+
+    def at(self, timestamp: str) -> Optional[pd.DataFrame]:
+        """Return the snapshot as it was at the timestamp, i.e. the newest one not after it."""
+        snapshots = self._load_index()["snapshots"]
+        i = bisect_right([s["timestamp"] for s in snapshots], timestamp)
+        return self._read_snapshot(snapshots[i - 1]) if i else None
+
+    def country_series(
+        self, country: str, columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """Return the values of one country in all snapshots, as a timestamp x column frame."""
+        index = self._load_index()
+        columns = columns or index["columns"]
+        if country not in index["countries"] or not index["num_rows"]:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name="timestamp"))
+
+        num_rows = index["num_rows"]
+        country_ids = np.memmap(
+            self._country_file(), dtype="int32", mode="r", shape=(num_rows,)
+        )
+        positions = np.flatnonzero(country_ids == index["countries"].index(country))
+
+        # map the row positions to snapshots, ordered by timestamp
+        snapshots = index["snapshots"]
+        storage_order = np.argsort([s["offset"] for s in snapshots], kind="stable")
+        offsets = np.array([snapshots[i]["offset"] for i in storage_order])
+        snapshot_ids = storage_order[np.searchsorted(offsets, positions, "right") - 1]
+        order = np.argsort(snapshot_ids, kind="stable")
+        positions = positions[order]
+
+        data = {}
+        for column in columns:
+            values = np.memmap(
+                self._column_file(index["columns"].index(column)),
+                dtype="float64",
+                mode="r",
+                shape=(num_rows,),
+            )
+            data[column] = np.asarray(values[positions])
+        timestamps = [snapshots[i]["timestamp"] for i in snapshot_ids[order]]
+        return pd.DataFrame(data, index=pd.Index(timestamps, name="timestamp"))
@@ -0,0 +1,265 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from . import disk_cache
+from .cssegisand_data import (
+    ThresholdIndex,
+    get_jhu_sources,
+    load_cached_time_series_data,
+)
+from .country_index import CountryIndex
+from .cube import SourceIndices, TimeSeriesCube
+from .regions import RegionData
+from .table_index import TableIndex
+from .table_series import TableTimeSeries
+from .trajectory import TrajectoryIndex
+from .world_map import WorldMap
+from .worldometer import WorldOMeterDataFetcher
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class DataSnapshot(NamedTuple):
+    """Immutable view of the fully processed data. Callbacks should grab one snapshot and only read from it."""
+
+    cube: TimeSeriesCube
+    corona_table_data: pd.DataFrame
+    table_index: TableIndex
+    table_series: TableTimeSeries
+    countries: CountryIndex
+    world_map: WorldMap
+    threshold_indices: Dict[str, ThresholdIndex]
+    trajectories: Dict[str, TrajectoryIndex]
+    regions: RegionData
+    # identifies the content of the data sources, the same data loaded again has the same version
+    version: str
+    loaded_at: datetime
+    load_timings: Dict[str, float]
+
+
+def _timed(fn: Callable[..., Any], *args) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def data_version(digests: Dict[str, str]) -> str:
+    """Return the version of data loaded from sources with the given content digests, by source name."""
+    content = "|".join(f"{name}={digest}" for name, digest in sorted(digests.items()))
+    return disk_cache.source_digest(content.encode())
+
+
+def load_snapshot(previous: Optional[DataSnapshot] = None) -> DataSnapshot:
+    """Fetch and process all data sources into a new snapshot, or return the previous one if no source changed.
+
+    The sources are independent and mostly bound by network and disk I/O, so they load concurrently in a thread pool
+    and the total load time is set by the slowest source rather than the sum of all of them. The metrics derived for
+    the previous snapshot are carried over, and only computed for the days added since.
+    """
+    start = time.perf_counter()
+    jhu_sources = get_jhu_sources()
+    with ThreadPoolExecutor(max_workers=len(jhu_sources) + 1) as pool:
+        futures = {
+            name: pool.submit(_timed, load_cached_time_series_data, name, data_source)
+            for name, data_source in jhu_sources.items()
+        }
+        futures["worldometer"] = pool.submit(
+            _timed, WorldOMeterDataFetcher(use_cache=True).get_worldometer_data
+        )
+        results = {name: future.result() for name, future in futures.items()}
+
+    load_timings = {name: seconds for name, (_, seconds) in results.items()}
+    corona_table_data = results.pop("worldometer")[0]
+    # after the country level data, whose processing also caches the province/state level data of the global files
+    regions, load_timings["regions"] = _timed(RegionData(jhu_sources).load)
+
+    digests = {name: digest for name, ((_, digest), _) in results.items()}
+    digests.update(regions.digests)
+    digests["worldometer"] = disk_cache.source_digest(
+        corona_table_data.to_csv().encode()
+    )
+    # the same content processed differently is different data
+    digests["processing"] = disk_cache.processing_digest()
+    version = data_version(digests)
+    if previous is not None and previous.version == version:
+        logger.info(f"Data version {version} is unchanged")
+        return previous
+
+    # the derived metrics and the indices of each source are built when the app first asks for them
+    cube = TimeSeriesCube.from_frames(
+        {name: data for name, ((data, _), _) in results.items()},
+        corona_table_data.set_index("Country")["Population"],
+    )
+    if previous is not None:
+        reused, load_timings["reuse"] = _timed(cube.reuse, previous.cube)
+        logger.info(f"Reused {reused} derived arrays of version {previous.version}")
+    load_timings["total"] = time.perf_counter() - start
+    logger.info(
+        "Loaded data sources in "
+        + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in load_timings.items())
+    )
+
+    loaded_at = datetime.now()
+    countries = CountryIndex(cube.countries, corona_table_data)
+    return DataSnapshot(
+        cube=cube,
+        corona_table_data=corona_table_data,
+        table_index=TableIndex(corona_table_data),
+        table_series=TableTimeSeries(cube, countries, corona_table_data),
+        countries=countries,
+        # the values of each metric are arranged by date when first shown on the map
+        world_map=WorldMap(cube, countries),
+        threshold_indices=SourceIndices(cube, ThresholdIndex),
+        trajectories=SourceIndices(cube, TrajectoryIndex),
+        # province/state and county level data is only processed when a region is viewed
+        regions=regions,
+        version=version,
+        loaded_at=loaded_at,
+        load_timings=load_timings,
+    )
+
+
+class DataNotLoaded(RuntimeError):
+    """Raised when the data is read before the first snapshot is loaded, with the error of the last load attempt."""
+
+    def __init__(self, last_error: Optional[str] = None):
+        super().__init__(
+            f"No data has been loaded yet: {last_error or 'still loading'}"
+        )
+        self.last_error = last_error
+
+
+class DataStore:
+    """Holds the current data snapshot and rebuilds it in a background thread.
+
+    A refresh builds a complete new snapshot off the request path and then swaps the reference in one assignment,
+    so readers either see the old or the new data, never a mix. If a refresh fails the old snapshot keeps being served.
+    `load` is called with the snapshot being served, or None, so that it can reuse what did not change.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[Optional[DataSnapshot]], DataSnapshot] = load_snapshot,
+        refresh_interval: float = 60 * 60,
+        retry_interval: float = 60,
+    ):
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self._load = load
+        self._snapshot = None  # type: Optional[DataSnapshot]
+        self._refresh_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+        self._listeners = []  # type: List[Callable[[DataSnapshot], Any]]
+        self.last_attempt = None  # type: Optional[datetime]
+        self.last_success = None  # type: Optional[datetime]
+        self.last_error = None  # type: Optional[str]
+
+    @property
+    def snapshot(self) -> DataSnapshot:
+        """The current snapshot. Raises `DataNotLoaded` until `start` loaded the first one, accessing never loads."""
+        if self._snapshot is None:
+            raise DataNotLoaded(self.last_error)
+        return self._snapshot
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def add_listener(self, listener: Callable[[DataSnapshot], Any]):
+        """Call the listener with every new snapshot after it is swapped in, e.g. to publish it to other processes."""
+        self._listeners.append(listener)
+
+    def refresh(self) -> bool:
+        """Build a new snapshot and swap it in. Returns whether the refresh succeeded."""
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _load_if_missing(self) -> bool:
+        """Load the first snapshot, unless another thread did while waiting for the lock."""
+        with self._refresh_lock:
+            return self._snapshot is not None or self._refresh()
+
+    def _refresh(self) -> bool:
+        self.last_attempt = datetime.now()
+        try:
+            snapshot = self._load(self._snapshot)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.exception("Data refresh failed, keep serving the previous data")
+            return False
+
+        self.last_error = None
+        # loads return the same snapshot until there is a new version, so unchanged data keeps its derived arrays
+        if snapshot is self._snapshot:
+            self.last_success = self.last_attempt
+            return True
+        self._snapshot = snapshot
+        self.last_success = snapshot.loaded_at
+        logger.info(f"Swapped in data version {snapshot.version}")
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception:
+                logger.exception(f"Data listener failed on version {snapshot.version}")
+        return True
+
+    def start(self, block: bool = True):
+        """Load the initial snapshot, then keep refreshing it in a background daemon thread.
+
+        With `block`, waits until the first load succeeds, retrying instead of exiting if a data source is
+        unavailable. Otherwise the first load happens in the background thread as well. Starting again does nothing.
+        """
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            if block and not self._load_initial():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="data-refresh", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _load_initial(self) -> bool:
+        while not self._load_if_missing():
+            logger.error(f"Initial load failed, retrying in {self.retry_interval}s")
+            if self._stop.wait(self.retry_interval):
+                return False
+        return True
+
+    def _run(self):
+        if self._load_initial():
+            self._refresh_loop()
+
+    def _refresh_loop(self):
+        interval = self.refresh_interval
+        while not self._stop.wait(interval):
+            success = self.refresh()
+            interval = self.refresh_interval if success else self.retry_interval
+
+    def status(self) -> Dict[str, Any]:
+        """Report the currently served version, when the data was last refreshed and how long each source took."""
+
+        def _isoformat(d: Optional[datetime]) -> Optional[str]:
+            return d.isoformat() if d else None
+
+        return {
+            "loaded": self.is_loaded,
+            "version": self._snapshot.version if self._snapshot else None,
+            "loaded_at": _isoformat(self._snapshot and self._snapshot.loaded_at),
+            "last_attempt": _isoformat(self.last_attempt),
+            "last_success": _isoformat(self.last_success),
+            "last_error": self.last_error,
+            "load_timings": self._snapshot.load_timings if self._snapshot else None,
+        }
@@ -0,0 +1,138 @@
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# filter operators of the Dash DataTable query syntax, see https://dash.plotly.com/datatable/filtering
+_FILTER_OPERATORS = [
+    ("ge", ">="),
+    ("le", "<="),
+    ("lt", "<"),
+    ("gt", ">"),
+    ("ne", "!="),
+    ("eq", "="),
+    ("contains",),
+    ("datestartswith",),
+]
+_FILTER_PART = re.compile(r"\{(?P<column>[^}]+)\}\s*(?P<operator>\S+)\s*(?P<value>.*)")
+
+
+class TableIndex:
+    """Precomputed sort orders and row records of the worldometer table, for server side paging, sorting and filtering.
+
+    Every column is sorted once per data version, so a request only reorders row positions and converts the rows of
+    the visible page to records.
+    """
+
+    def __init__(self, df: pd.DataFrame, default_sort: str = "Total Cases"):
+        self.columns = list(df.columns)
+        self.records = df.to_dict("records")
+        self.num_rows = len(df)
+        self._values = {c: df[c].to_numpy() for c in self.columns}
+        self._row_ids = {country: i for i, country in enumerate(df["Country"])}
+
+        # ascending orders with missing values last, and the number of non missing values
+        self._sort_orders = {}  # type: Dict[str, Tuple[np.ndarray, int]]
+        for c in self.columns:
+            column = df[c].reset_index(drop=True)
+            order = column.sort_values(kind="mergesort", na_position="last").index
+            self._sort_orders[c] = (order.to_numpy(), int(column.notna().sum()))
+        self.default_order = self.sort_order(default_sort, descending=True)
+
+    def sort_order(self, column: str, descending: bool = False) -> np.ndarray:
+        """Return the row positions sorted by the column. Missing values are always last."""
+        order, num_valid = self._sort_orders[column]
+        if descending:
+            return np.concatenate([order[:num_valid][::-1], order[num_valid:]])
+        return order
+
+    def filter_mask(self, filter_query: str) -> np.ndarray:
+        """Return which rows match a DataTable filter query like `{Total Cases} > 100 && {Country} contains A`."""
+        mask = np.ones(self.num_rows, dtype=bool)
+        for part in filter(None, (filter_query or "").split(" && ")):
+            match = _FILTER_PART.match(part.strip())
+            if not match or match.group("column") not in self._values:
+                continue
+            values = self._values[match.group("column")]
+            operator = match.group("operator")
+            value = match.group("value").strip()
+            if value[:1] == value[-1:] and value[:1] in ("'", '"', "`"):
+                value = value[1:-1]
+            mask &= self._compare(values, operator, value)
+        return mask
+
+    @staticmethod
+    def _compare(values: np.ndarray, operator: str, value: str) -> np.ndarray:
+        for names in _FILTER_OPERATORS:
+            if operator in names:
+                operator = names[0]
+                break
+
+        if operator in ("contains", "datestartswith"):
+            strings = pd.Series(values).astype(str)
+            if operator == "contains":
+                return strings.str.contains(value, case=False, regex=False).to_numpy()
+            return strings.str.startswith(value).to_numpy()
+
+        try:
+            numbers = values.astype(float)
+            value = float(value)
+        except ValueError:
+            # compare strings, e.g. for the country column
+            numbers = values.astype(str)
+        with np.errstate(invalid="ignore"):
+            if operator == "ge":
+                return numbers >= value
+            if operator == "le":
+                return numbers <= value
+            if operator == "lt":
+                return numbers < value
+            if operator == "gt":
+                return numbers > value
+            if operator == "ne":
+                return numbers != value
+            return numbers == value
+
+    def query(
+        self,
+        selected_countries: List[str],
+        sort_by: List[Dict[str, str]],
+        filter_query: str,
+        page_current: int,
+        page_size: int,
+    ) -> Tuple[List[Dict], List[int], int, int]:
+        """Return the records of one page, the page positions of the selected rows, the total number of pages and the
+        page returned.
+
+        Selected countries are moved to the top of the sorted and filtered rows. A page past the last one, e.g. after
+        filtering removed rows, returns the last page.
+        """
+        if sort_by and sort_by[0]["column_id"] in self._sort_orders:
+            order = self.sort_order(
+                sort_by[0]["column_id"], descending=sort_by[0]["direction"] == "desc"
+            )
+        else:
+            order = self.default_order
+
+        selected_ids = [
+            self._row_ids[c] for c in selected_countries if c in self._row_ids
+        ]
+        selected = np.zeros(self.num_rows, dtype=bool)
+        selected[selected_ids] = True
+        selected = selected[order]
+        order = np.concatenate([order[selected], order[~selected]])
+        num_selected = int(selected.sum())
+
+        if filter_query:
+            mask = self.filter_mask(filter_query)
+            num_selected = int(mask[order[:num_selected]].sum())
+            order = order[mask[order]]
+
+        page_count = max(1, -(-len(order) // page_size))
+        page_current = min(max(page_current, 0), page_count - 1)
+        start = page_current * page_size
+        page_rows = order[start : start + page_size]
+        selected_rows = list(range(max(0, min(num_selected - start, len(page_rows)))))
+        records = [self.records[i] for i in page_rows]
+        return records, selected_rows, page_count, page_current
@@ -0,0 +1,57 @@
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .country_index import CountryIndex
+from .cube import TimeSeriesCube
+
+# columns of the worldometer table which the JHU time series have for every date, as source and metric
+TIME_SERIES_COLUMNS = {
+    "Total Cases": ("confirmed", "cumulative"),
+    "New Cases": ("confirmed", "daily_increase_1d"),
+    "Total Deaths": ("deaths", "cumulative"),
+    "New Deaths": ("deaths", "daily_increase_1d"),
+    "Total Recovered": ("recovered", "cumulative"),
+    "Active Cases": ("active_cases", "cumulative"),
+    "Cases/1M pop": ("confirmed", "cumulative_per_1m"),
+    "Deaths/1M pop": ("deaths", "cumulative_per_1m"),
+    "Case Fatality Ratio": ("case_fatality", "cumulative"),
+}  # type: Dict[str, Tuple[str, str]]
+
+
+class TableTimeSeries:
+    """The columns of the worldometer table on every date of the JHU time series, for the countries found in both.
+
+    Columns which the JHU time series have, like the total cases or the deaths per 1M inhabitants, take their values
+    from the cube. All others, like the population or the median age, keep their latest value on every date. A column
+    is a country x date array, so all frames of an animation are slices of the same arrays.
+    """
+
+    def __init__(
+        self,
+        cube: TimeSeriesCube,
+        countries: CountryIndex,
+        corona_table_data: pd.DataFrame,
+    ):
+        # the ids of the cube countries come first in the country index
+        in_cube = countries.table_ids < len(cube.countries)
+        self.table_rows = np.flatnonzero(in_cube)
+        self.cube_ids = countries.table_ids[in_cube]
+        self.names = [countries.names[i] for i in self.cube_ids]
+        self.num_days = cube.num_days
+        self._cube = cube
+        self._table = corona_table_data
+
+    def column(self, column: str) -> np.ndarray:
+        """Return the country x date values of a column, unknown for values which are not numbers.
+
+        The array may be a view of shared data, don't modify it. Raises a KeyError for unknown columns.
+        """
+        if column in TIME_SERIES_COLUMNS:
+            source, metric = TIME_SERIES_COLUMNS[column]
+            return self._cube.matrix(source, metric)[self.cube_ids]
+        latest = pd.to_numeric(self._table[column], errors="coerce").to_numpy(
+            dtype=float
+        )[self.table_rows]
+        return np.broadcast_to(latest[:, None], (len(latest), self.num_days))
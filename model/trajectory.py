@@ -0,0 +1,45 @@
+from typing import Tuple
+
+import numpy as np
+
+from .cube import TimeSeriesCube
+
+# a country only gets plotted in the trajectory chart once it exceeds this cumulative count
+TRAJECTORY_MIN_CASES = 50
+
+
+class TrajectoryIndex:
+    """Trajectory (cumulative vs. daily increase) of every country of one data source, computed once per data version.
+
+    Only the days above the minimum count are kept, packed country by country into flat arrays. `prefix_lengths` counts
+    for each country and day how many kept days lie on or before that day, so the trace for any position of the date
+    slider is a slice of the flat arrays.
+    """
+
+    def __init__(
+        self,
+        cube: TimeSeriesCube,
+        data_source: str,
+        min_cases: float = TRAJECTORY_MIN_CASES,
+    ):
+        cumulative = cube.matrix(data_source, "cumulative")
+        daily = cube.matrix(data_source, "daily_increase")
+        keep = cumulative > min_cases
+
+        self.min_cases = min_cases
+        self.num_days = cube.num_days
+        self.x = cumulative[keep]
+        self.y = daily[keep]
+        self.prefix_lengths = np.cumsum(keep, axis=1, dtype=np.int32)
+        self.offsets = np.concatenate([[0], np.cumsum(keep.sum(axis=1))[:-1]])
+
+    def trace(self, country_id: int, day: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the x (cumulative) and y (daily increase) values of a country up to and including the day."""
+        start = self.offsets[country_id]
+        end = start + self.prefix_lengths[country_id, day]
+        return self.x[start:end], self.y[start:end]
+
+    def first_visible_day(self, country_ids: np.ndarray) -> int:
+        """Return the first day on which any of the countries has a point in the chart."""
+        visible = self.prefix_lengths[country_ids].max(axis=0, initial=0) > 0
+        return int(np.argmax(visible)) if visible.any() else self.num_days - 1
@@ -0,0 +1,60 @@
+from typing import Tuple
+
+import numpy as np
+
+from .country_index import CountryIndex
+from .cube import TimeSeriesCube
+from .derived import DERIVED_MEMORY_BUDGET, DerivedCache
+
+
+class WorldMap:
+    """Values of the countries of the cube on a world map, located by ISO 3166 alpha-3 code, once per data version.
+
+    Countries without a known code are left out, and of countries sharing a code only the first one is kept. The values
+    of a source and metric are stored date by date, so the values of any date are one contiguous row and moving the
+    date slider only sends that row, while the locations of the countries stay in the figure. Values are shown on a log
+    scale by the browser, so only the color range is computed for it.
+    """
+
+    def __init__(
+        self,
+        cube: TimeSeriesCube,
+        countries: CountryIndex,
+        memory_budget: float = DERIVED_MEMORY_BUDGET / 4,
+    ):
+        # the ids of the countries index cube and country index alike
+        rows = {}
+        for i, code in enumerate(countries.iso_alpha3[: len(cube.countries)]):
+            if code is not None:
+                rows.setdefault(code, i)
+        self.locations = list(rows)
+        self.rows = np.array(list(rows.values()), dtype=int)
+        self.names = [cube.countries[i] for i in self.rows]
+        self._cube = cube
+        self._values = DerivedCache(memory_budget)
+
+    def values(self, source: str, metric: str) -> np.ndarray:
+        """Return the date x location array of a source and metric. Raises a KeyError for unknown ones."""
+        return self._values.get(
+            (source, metric),
+            lambda: np.ascontiguousarray(
+                self._cube.matrix(source, metric)[self.rows].T
+            ),
+        )
+
+    def day(self, source: str, metric: str, day: int) -> np.ndarray:
+        """Return the values of every location on one day."""
+        return self.values(source, metric)[day]
+
+    def color_range(
+        self, source: str, metric: str, log: bool = False
+    ) -> Tuple[float, float]:
+        """Return the range of the color scale for all dates, as log10 if `log`. Outliers don't stretch it."""
+        values = self.values(source, metric)
+        finite = values[np.isfinite(values)]
+        if log:
+            finite = np.log10(finite[finite > 0])
+        if not finite.size:
+            return 0.0, 1.0
+        low, high = np.percentile(finite, [1, 99])
+        return float(low), float(max(high, low + 1e-9))
@@ -1,9 +1,9 @@
 import logging
 import os
 import re
-import sys
-from glob import glob
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -11,19 +11,100 @@ import requests
 from bs4 import BeautifulSoup
 from dateutil import parser
 
+from model.fetch import http_fetcher
+from model.snapshot_history import SnapshotHistory
 from model.utils import country_map
 
 logger = logging.getLogger(__name__)
 logging.basicConfig()
 logger.setLevel(logging.INFO)
 
+# set to another server with the same pages, e.g. `python -m benchmarks.stub_server`
+WORLDOMETER_URL = os.environ.get("WORLDOMETER_URL", "https://www.worldometers.info")
+
+
+class _WorldOMeterPageParser(HTMLParser):
+    """Single pass parser, which only keeps the cell texts of the first table body and the "Last updated" text.
+
+    Unlike BeautifulSoup, no tree of the document is built, and parsing stops once the table body is complete.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []  # type: List[List[str]]
+        self.last_updated = None  # type: Optional[str]
+        self._in_table = False
+        self._tbody_depth = 0
+        self._table_done = False
+        self._row = None  # type: Optional[List[str]]
+        self._cell = None  # type: Optional[List[str]]
+        # text outside of cells up to the next tag, which the chunks may have split into several pieces
+        self._text = []  # type: List[str]
+
+    def handle_starttag(self, tag, attrs):
+        self._end_text()
+        if self._table_done:
+            return
+        if tag == "table":
+            self._in_table = True
+        elif tag == "tbody" and self._in_table:
+            self._tbody_depth += 1
+        elif self._tbody_depth:
+            if tag == "tr" and self._tbody_depth == 1:
+                self._row = []
+            elif tag == "td" and self._row is not None:
+                self._cell = []
+
+    def handle_endtag(self, tag):
+        self._end_text()
+        if self._table_done or not self._tbody_depth:
+            return
+        if tag == "td" and self._cell is not None:
+            self._row.append("".join(self._cell))
+            self._cell = None
+        elif tag == "tr" and self._row is not None and self._tbody_depth == 1:
+            self.rows.append(self._row)
+            self._row = None
+        elif tag == "tbody":
+            self._tbody_depth -= 1
+            self._table_done = not self._tbody_depth
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+        elif self.last_updated is None:
+            self._text.append(data)
+
+    def _end_text(self):
+        """Check the complete text before a tag for the "Last updated" text."""
+        if self._text:
+            text = "".join(self._text)
+            self._text = []
+            if "Last updated: " in text:
+                self.last_updated = text
+
+    def close(self):
+        super().close()
+        self._end_text()
+
+    def feed_until_done(self, raw_data: str):
+        """Parse up to the end of the first table body, and on until the "Last updated" text if it comes later."""
+        chunk_size = 1 << 16
+        for start in range(0, len(raw_data), chunk_size):
+            self.feed(raw_data[start : start + chunk_size])
+            if self._table_done and self.last_updated is not None:
+                break
+        self.close()
+
 
 class WorldOMeterDataFetcher:
-    def __init__(self, use_cache=True):
+    def __init__(self, use_cache=True, single_pass=True, history=None):
         self.use_cache = use_cache
+        self.single_pass = single_pass
+        self.history = history or SnapshotHistory()
         self._data_dicts = {
             "corona": {
-                "url": "https://www.worldometers.info/coronavirus/#countries",
+                "url": f"{WORLDOMETER_URL}/coronavirus/#countries",
                 "columns": [
                     "idx",
                     "Country",
@@ -43,7 +124,7 @@ class WorldOMeterDataFetcher:
                 ],
             },
             "population": {
-                "url": "https://www.worldometers.info/world-population/population-by-country/",
+                "url": f"{WORLDOMETER_URL}/world-population/population-by-country/",
                 "columns": [
                     "Index",
                     "Country",
@@ -61,31 +142,41 @@ class WorldOMeterDataFetcher:
             },
         }
 
-    @staticmethod
-    def _read_from_cache():
-        """Read the latest csv file from the cache."""
-        try:
-            cached_file = sorted(glob("model/*.csv"))[0]
-        except IndexError as e:
-            logger.error(
+    def _read_from_cache(self) -> pd.DataFrame:
+        """Read the latest snapshot from the snapshot history, after adding any new csv files to it."""
+        added = self.history.sync_csv_files()
+        if added:
+            logger.info(f"Added {added} worldometer csv files to the snapshot history")
+
+        data = self.history.latest()
+        if data is None:
+            raise CacheError(
                 "Cache is empty."
                 " Please run `python -m model.worldometer` to update the cache before starting the app."
             )
-            sys.exit(1)
 
-        logger.info(f"Using cached worldometer {cached_file}")
-        return pd.read_csv(cached_file)
+        logger.info(f"Using cached worldometer {self.history.latest_timestamp()}")
+        return data
 
     def get_worldometer_data(self) -> pd.DataFrame:
         if self.use_cache:
             return self._read_from_cache()
 
-        corona_df = self._get_worldometer_data_single_source("corona")
+        # the two pages are independent, so fetch them concurrently
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            corona_future = pool.submit(
+                self._get_worldometer_data_single_source, "corona"
+            )
+            population_future = pool.submit(
+                self._get_worldometer_data_single_source, "population"
+            )
+            corona_df = corona_future.result()
+            population_df = population_future.result()
+
         corona_df = corona_df.drop(["Continent", "idx", "Population"], axis=1)
         corona_df["Case Fatality Ratio"] = np.round(
             corona_df["Total Deaths"] / corona_df["Total Cases"] * 100, 2
         )
-        population_df = self._get_worldometer_data_single_source("population")
 
         def _normalize_population_names(
             p: pd.DataFrame, c: pd.DataFrame
@@ -144,6 +235,8 @@ class WorldOMeterDataFetcher:
         _save_path = os.path.join("model", f"worldometer_{_last_updated}.csv")
         data.to_csv(_save_path, index=False)
         logger.info(f"saved cached worldometer csv to {_save_path}")
+        if _last_updated:
+            self.history.append(_last_updated, data)
 
         return data
 
@@ -156,13 +249,39 @@ class WorldOMeterDataFetcher:
         data_dict = self._data_dicts[data_type]
         logger.info(f"fetching worldometer data for {data_dict['url']}")
         latest_data = self._get_html(data_dict["url"])
-        data = self._get_worldometer_table_data(latest_data, data_dict["columns"])
-        self._data_dicts[data_type]["last_updated"] = self._parse_last_updated(
-            latest_data
-        )
+        data, last_updated = self.parse_page(latest_data, data_dict["columns"])
+        self._data_dicts[data_type]["last_updated"] = last_updated
 
         return data
 
+    def parse_page(
+        self, raw_data: str, columns: List[str]
+    ) -> Tuple[pd.DataFrame, Optional[str]]:
+        """Parse the table and last updated time from a Worldometer page.
+
+        Args:
+            raw_data (string): request.text html from Worldometer
+            columns: names of the table columns
+
+        Returns:
+            the table DataFrame, and the last updated time in format `year_month_day_hour_minute`
+        """
+        if not self.single_pass:
+            return (
+                self._get_worldometer_table_data(raw_data, columns),
+                self._parse_last_updated(raw_data),
+            )
+
+        page_parser = _WorldOMeterPageParser()
+        page_parser.feed_until_done(raw_data)
+        data = self._to_numeric(pd.DataFrame(page_parser.rows, columns=columns))
+
+        last_updated = None
+        if page_parser.last_updated:
+            last_updated_str = page_parser.last_updated.replace("Last updated: ", "")
+            last_updated = parser.parse(last_updated_str).strftime("%Y_%m_%d_%H_%M")
+        return data, last_updated
+
     def _get_worldometer_table_data(
         self, raw_data: str, columns: List[str]
     ) -> pd.DataFrame:
@@ -186,6 +305,17 @@ class WorldOMeterDataFetcher:
                 data[col] = data[col].apply(self._cleanup)
         return data
 
+    @staticmethod
+    def _to_numeric(data: pd.DataFrame) -> pd.DataFrame:
+        """Vectorized version of `_cleanup`, converting every column except the country names to floats."""
+        for col in data.columns:
+            if col != "Country":
+                data[col] = pd.to_numeric(
+                    data[col].str.replace(r"[+,%]", "", regex=True).str.strip(),
+                    errors="coerce",
+                ).astype(float)
+        return data
+
     @staticmethod
     def _cleanup(s: str):
         try:
@@ -212,23 +342,22 @@ class WorldOMeterDataFetcher:
 
     @staticmethod
     def _get_html(url: str) -> str:
-        """Gets raw HTML from worldometers/coronavirus"""
+        """Gets raw HTML from worldometers/coronavirus, through the shared session which retries failed requests"""
         try:
             logging.info(f"Scraping data from {url}")
-            res = requests.get(url, timeout=15)
+            res = http_fetcher.get(url)
             logging.info(f"Scraped data. 200")
         except requests.Timeout:
             raise GatewayError(
                 "Timeout received whilst retrieving data from WorldOMeter"
             )
-        except requests.RequestException:
+        except requests.HTTPError:
+            raise GatewayError("Website returned a Non-200 status code")
+        except requests.RequestException as e:
             raise GatewayError(
-                "Some Error Ocurred whils fetching data from WorldOMeter({str(requests.RequestException)})"
+                f"Some Error Ocurred whils fetching data from WorldOMeter({e})"
             )
 
-        if res.status_code != 200:
-            raise GatewayError("Website returned a Non-200 status code")
-
         return res.text
 
 
@@ -236,6 +365,10 @@ class GatewayError(Exception):
     pass
 
 
+class CacheError(Exception):
+    pass
+
+
 if __name__ == "__main__":
     data_parser = WorldOMeterDataFetcher(use_cache=False)
     data_parser.get_worldometer_data()
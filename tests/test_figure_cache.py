@@ -0,0 +1,32 @@
+from view.figure_cache import FigureCache, _serialized_size
+
+
+def _figure(n: int) -> dict:
+    return {"data": [{"x": list(range(n))}]}
+
+
+def test_bounded_by_serialized_size():
+    cache = FigureCache(
+        lambda: "v1", memory_budget=3 * _serialized_size(_figure(50)) / 2**20
+    )
+    for i in range(5):
+        cache.get_or_create(i, lambda: _figure(50))
+    assert cache.info()["size"] == 3
+    assert cache.nbytes <= cache.max_bytes
+    # the least recently used ones were dropped
+    cache.get_or_create(4, lambda: _figure(0))
+    assert cache.hits == 1
+
+    # a figure larger than the whole budget is still kept, alone
+    cache.get_or_create("large", lambda: _figure(1000))
+    assert cache.info()["size"] == 1
+    assert cache.nbytes == _serialized_size(_figure(1000))
+
+
+def test_cleared_with_a_new_data_version():
+    version = ["v1"]
+    cache = FigureCache(lambda: version[0])
+    cache.get_or_create("a", lambda: _figure(10))
+    version[0] = "v2"
+    assert cache.get_or_create("a", lambda: _figure(20)) == _figure(20)
+    assert cache.nbytes == _serialized_size(_figure(20))
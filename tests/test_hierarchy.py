@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from model.hierarchy import RegionHierarchy
+
+
+@pytest.fixture(scope="module")
+def hierarchy() -> RegionHierarchy:
+    labels = pd.DataFrame(
+        {
+            "Country": ["A", "A", "A", "A", "B", "C", "C"],
+            "State": ["A1", "A1", "A2", None, "B", "C1", "C1"],
+            "County": ["x", "y", "z", None, None, "C1", None],
+        }
+    )
+    values = np.arange(len(labels) * 3, dtype=float).reshape(len(labels), 3)
+    return RegionHierarchy(labels, values, ["1/22/20", "1/23/20", "1/24/20"])
+
+
+def _scanned_children(hierarchy: RegionHierarchy, path: tuple) -> list:
+    """The names of the groups below the path, by scanning the parents of the next level."""
+    level = len(path)
+    parent = hierarchy.paths[level - 1].index(path)
+    return [
+        hierarchy.paths[level][i][-1]
+        for i in np.flatnonzero(hierarchy.parents[level] == parent)
+    ]
+
+
+def test_children_match_scan(hierarchy: RegionHierarchy):
+    for level in range(len(hierarchy.levels) - 1):
+        for path in hierarchy.paths[level]:
+            names = _scanned_children(hierarchy, path)
+            assert hierarchy.child_names(path) == names
+            assert list(hierarchy.children(path).index) == names
+            has_children = len(names) > 1 or (len(names) == 1 and names[0] != path[-1])
+            assert hierarchy.has_children(path) == has_children
+
+
+def test_has_children(hierarchy: RegionHierarchy):
+    assert hierarchy.has_children(("A",))
+    assert hierarchy.has_children(("A", "A1"))
+    assert not hierarchy.has_children(("B",))
+    assert not hierarchy.has_children(("C", "C1"))
+    assert not hierarchy.has_children(("A", "A1", "x"))
+    assert not hierarchy.has_children(("D",))
+    assert hierarchy.child_names(("D",)) == []
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.stub_server import StubServer
+from benchmarks.synthetic import jhu_time_series
+from model import disk_cache
+from model.cssegisand_data import (
+    _extend_time_series,
+    _get_country_time_series,
+    _get_region_hierarchy,
+    _get_time_series_data,
+    get_cached_time_series_data,
+)
+from model.cube import TimeSeriesCube
+from model.fetch import HttpFetcher
+from model.hierarchy import GLOBAL_LEVELS, RegionHierarchy, date_columns
+
+
+@pytest.fixture(autouse=True)
+def working_dir(tmp_path, monkeypatch):
+    # the disk cache is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def confirmed() -> pd.DataFrame:
+    return jhu_time_series(40, 30)["confirmed"]
+
+
+def _ingest(df: pd.DataFrame, path: str) -> pd.DataFrame:
+    df.to_csv(path, index=False)
+    return get_cached_time_series_data("confirmed", path)
+
+
+def _assert_recomputed(df_cumulative: pd.DataFrame, path: str):
+    """The country and region level frames equal a full recompute of the file."""
+    pd.testing.assert_frame_equal(df_cumulative, _get_time_series_data(path))
+    pd.testing.assert_frame_equal(
+        disk_cache.load_latest_frames("confirmed_regions")["cumulative"],
+        _get_region_hierarchy(path, GLOBAL_LEVELS).to_frame(),
+    )
+
+
+def test_added_day_is_extended(confirmed: pd.DataFrame):
+    path = "confirmed.csv"
+    _ingest(confirmed.drop(columns=date_columns(confirmed)[-1]), path)
+    assert _extend_time_series("confirmed", confirmed) is not None
+    _assert_recomputed(_ingest(confirmed, path), path)
+
+
+def test_cache_is_keyed_by_processing(confirmed: pd.DataFrame, monkeypatch):
+    path = "confirmed.csv"
+    _ingest(confirmed, path)
+    digest = disk_cache.source_digest(open(path, "rb").read())
+    assert disk_cache.load_frames("confirmed", digest) is not None
+
+    country = confirmed["Country/Region"].iloc[0]
+    monkeypatch.setitem(disk_cache.country_map, country, "Renamed")
+    assert disk_cache.load_frames("confirmed", digest) is None
+    assert disk_cache.load_latest_frames("confirmed") is None
+    assert "Renamed" in _ingest(confirmed, path).index
+
+
+def test_revised_day_is_recomputed(confirmed: pd.DataFrame):
+    path = "confirmed.csv"
+    dates = date_columns(confirmed)
+    _ingest(confirmed.drop(columns=dates[-1]), path)
+    revised = confirmed.copy()
+    revised[dates[0]] += 1
+    assert _extend_time_series("confirmed", revised) is None
+    _assert_recomputed(_ingest(revised, path), path)
+
+
+@pytest.mark.parametrize(
+    "source, metric",
+    [
+        ("confirmed", "daily_increase"),
+        ("confirmed", "growth"),
+        ("case_fatality", "daily_increase"),
+        ("active_cases", "growth"),
+    ],
+)
+def test_reused_metrics_equal_recomputed(source: str, metric: str):
+    frames = {
+        name: _get_country_time_series(RegionHierarchy.from_jhu(df, GLOBAL_LEVELS))
+        for name, df in jhu_time_series(40, 30).items()
+    }
+    previous = TimeSeriesCube.from_frames(
+        {name: df.iloc[:, :-1] for name, df in frames.items()}
+    )
+    previous.matrix(source, metric)
+    extended = TimeSeriesCube.from_frames(frames)
+    assert extended.reuse(previous) > 0
+    np.testing.assert_allclose(
+        extended.matrix(source, metric),
+        TimeSeriesCube.from_frames(frames).matrix(source, metric),
+    )
+
+
+def test_unchanged_file_is_served_from_memory(working_dir, confirmed: pd.DataFrame):
+    confirmed.to_csv("confirmed.csv", index=False)
+    with open("confirmed.csv", "rb") as f:
+        content = f.read()
+    with StubServer(working_dir) as server:
+        url = f"{server.url}/confirmed.csv"
+        fetcher = HttpFetcher()
+        assert fetcher.get(url).modified
+        result = fetcher.get(url)
+        assert not result.modified
+        assert result.content == content
+        assert server.requests[("/confirmed.csv", 304)] == 1
+        pd.testing.assert_frame_equal(
+            get_cached_time_series_data("confirmed", url),
+            _get_time_series_data("confirmed.csv"),
+        )
+
+
+def test_failed_requests_are_retried(working_dir, confirmed: pd.DataFrame):
+    confirmed.to_csv("confirmed.csv", index=False)
+    with open("confirmed.csv", "rb") as f:
+        content = f.read()
+    with StubServer(working_dir, failures=2) as server:
+        assert (
+            HttpFetcher(backoff=0).get(f"{server.url}/confirmed.csv").content == content
+        )
+        assert server.requests[("/confirmed.csv", 503)] == 2
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from model.cssegisand_data import ThresholdIndex
+from model.cube import TimeSeriesCube
+
+
+def _first_crossings(values: np.ndarray, thresh: float) -> np.ndarray:
+    """The first day each row exceeds the threshold, by scanning every row."""
+    crossed = values > thresh
+    return np.where(crossed.any(axis=1), np.argmax(crossed, axis=1), values.shape[1])
+
+
+@pytest.fixture(scope="module")
+def values() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    values = rng.integers(-50, 50, (60, 40)).cumsum(axis=1).astype(float)
+    # missing days, a row which is never reported and one with a downwards correction
+    values[rng.random(values.shape) < 0.1] = np.nan
+    values[5] = np.nan
+    values[6, 20:] -= 500
+    return values
+
+
+@pytest.fixture(scope="module")
+def threshold_index(values: np.ndarray) -> ThresholdIndex:
+    dates = pd.date_range("2020-01-22", periods=values.shape[1])
+    df = pd.DataFrame(
+        values,
+        index=[f"Country {i}" for i in range(len(values))],
+        columns=[f"{d.month}/{d.day}/{d:%y}" for d in dates],
+    )
+    return ThresholdIndex(
+        TimeSeriesCube.from_frames({"active_cases": df}), "active_cases"
+    )
+
+
+@pytest.mark.parametrize("thresh", [-2000, -300, -1, 0, 0.5, 1, 10, 100, 250, 10000])
+def test_first_crossing(values: np.ndarray, threshold_index: ThresholdIndex, thresh):
+    rows = np.arange(len(values))
+    np.testing.assert_array_equal(
+        threshold_index.first_crossing(rows, thresh), _first_crossings(values, thresh)
+    )
+
+
+def test_align_drops_countries_which_never_cross(threshold_index: ThresholdIndex):
+    countries, aligned = threshold_index.align(
+        ["Country 5", "Country 0", "Nowhere"], -1e9
+    )
+    assert countries == ["Country 0"]
+    assert aligned.shape == (1, threshold_index.num_days)
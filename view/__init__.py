@@ -1,12 +1,14 @@
-import hashlib
 import logging
 
+import dash_core_components as dcc
 import dash_html_components as html
 
+from model import data_store
 from .line_graph import line_graph_panel
 from .scatter_plot import scatter_panel
 from .table import table_panel
 from .title import title_panel
+from .world_map import world_map_panel
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -23,11 +25,13 @@ title_mapping = {
     "growth": "Growth Factor",
     "daily_increase": "Daily Increase",
     "cumulative": "Cumulative",
+    "cumulative_per_1m": "Cumulative per 1M",
+    "daily_increase_per_1m": "Daily Increase per 1M",
     "log": "Logarithmic",
     "linear": "Linear",
     "case_fatality": "Case Fatality Ratio",
-    "since_100": "Growth Since 100 Cases",
-    "since_10": "Growth Since 10 Cases",
+    "active_cases": "Active Cases",
+    "since_n": "Growth Since {:,} Cases",
 }
 
 
@@ -38,31 +42,48 @@ layout_parent = dict(
     legend=dict(font=dict(size=10), orientation="v"),
 )
 
-app_layout = html.Div(
+
+def app_layout() -> html.Div:
+    """Build the layout of the app from the current data."""
+    return html.Div(
+        [
+            html.Div(
+                id="output-clientside"
+            ),  # empty Div to trigger javascript file for graph resizing
+            title_panel,
+            line_graph_panel(),
+            world_map_panel(),
+            scatter_panel(),
+            table_panel(),
+        ],
+        id="mainContainer",
+        style={"display": "flex", "flex-direction": "column"},
+    )
+
+
+# served until the data is loaded, polls the server and reloads the page once it is
+loading_layout = html.Div(
     [
-        html.Div(
-            id="output-clientside"
-        ),  # empty Div to trigger javascript file for graph resizing
         title_panel,
-        line_graph_panel,
-        scatter_panel,
-        table_panel,
+        html.H5("Loading the latest data...", className="pretty_container"),
+        dcc.Interval(id="loading_interval", interval=2000),
+        dcc.Location(id="loading_location", refresh=True),
     ],
     id="mainContainer",
     style={"display": "flex", "flex-direction": "column"},
 )
 
 
+def serve_layout() -> html.Div:
+    """Layout function of the app, called on every page load. Starts loading the data if that did not happen yet."""
+    data_store.start(block=False)
+    if not data_store.is_loaded:
+        return loading_layout
+    return app_layout()
+
+
 def get_color(country: str) -> str:
-    """Return a unique color hex code based on the country name."""
+    """Return a unique color hex code based on the country name, precomputed for the countries of the current data."""
     if "double" in country:
         return GRAY
-
-    def _get_unique_int_from_str(s):
-        return int.from_bytes(hashlib.sha256(s.encode()).digest(), "big") % 255
-
-    return "#%02X%02X%02X" % (
-        _get_unique_int_from_str(country[0]),
-        _get_unique_int_from_str(country[1]),
-        _get_unique_int_from_str(country[2]) if len(country) > 2 else 128,
-    )
+    return data_store.snapshot.countries.color(country)
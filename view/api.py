@@ -0,0 +1,173 @@
+import gzip
+import hashlib
+import json
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import flask
+import numpy as np
+import pandas as pd
+
+from model import data_store
+from model.derived import parse_metric
+
+# the processed JHU metrics as plain JSON or CSV, for other services
+api = flask.Blueprint("api", __name__, url_prefix="/api/v1")
+
+JSON_TYPE = "application/json"
+CSV_TYPE = "text/csv"
+FORMATS = {"json": JSON_TYPE, "csv": CSV_TYPE}
+
+# smaller responses gain less from compression than they cost to compress
+MIN_GZIP_SIZE = 1024
+GZIP_LEVEL = 6
+
+
+class _BadRequest(ValueError):
+    pass
+
+
+@api.errorhandler(_BadRequest)
+def _bad_request(e: _BadRequest):
+    return flask.jsonify(error=str(e)), 400
+
+
+def _mimetype() -> str:
+    """Pick the format from the `format` parameter, or else from the Accept header. JSON is the default."""
+    requested = flask.request.args.get("format")
+    if requested:
+        if requested not in FORMATS:
+            raise _BadRequest(f"Unknown format {requested}, use one of {list(FORMATS)}")
+        return FORMATS[requested]
+    return flask.request.accept_mimetypes.best_match([JSON_TYPE, CSV_TYPE], JSON_TYPE)
+
+
+def _parse_date(name: str) -> Optional[datetime]:
+    value = flask.request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise _BadRequest(f"{name} must be a date like 2020-03-31, got {value}")
+
+
+def _cached_response(key: str, mimetype: str, render: Callable[[], str]):
+    """Answer with 304 if the client has the current representation, else render, compress and tag the body.
+
+    The ETag covers the data version, so it changes with every data refresh, and the representation.
+    """
+    use_gzip = "gzip" in flask.request.accept_encodings
+    digest = hashlib.sha256(f"{key}|{mimetype}".encode()).hexdigest()[:32]
+    etag = f"{digest}-gzip" if use_gzip else digest
+    if flask.request.if_none_match.contains(etag):
+        response = flask.Response(status=304)
+    else:
+        body = render().encode()
+        response = flask.Response(body, mimetype=mimetype)
+        if use_gzip and len(body) >= MIN_GZIP_SIZE:
+            response.set_data(gzip.compress(body, GZIP_LEVEL))
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag)
+    # always revalidate, which is a cheap 304 as long as the data is unchanged
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Vary"] = "Accept, Accept-Encoding"
+    return response
+
+
+@api.route("/")
+def index():
+    """List the available sources, metrics, countries and dates."""
+    snapshot = data_store.snapshot
+    cube = snapshot.cube
+
+    def _render() -> str:
+        return json.dumps(
+            {
+                "version": snapshot.version,
+                "sources": cube.sources,
+                "metrics": cube.metrics,
+                "countries": cube.countries,
+                "start": f"{cube.dates[0]:%Y-%m-%d}" if cube.num_days else None,
+                "end": f"{cube.dates[-1]:%Y-%m-%d}" if cube.num_days else None,
+                "time_series": flask.url_for(".time_series", _external=False),
+            }
+        )
+
+    return _cached_response(f"{snapshot.version}|index", JSON_TYPE, _render)
+
+
+@api.route("/time_series")
+def time_series():
+    """Time series of one source and metric, for some or all countries and a date range.
+
+    Query parameters:
+        source: one of the cube's sources, e.g. confirmed or case_fatality, default confirmed
+        metric: one of the cube's metrics, optionally with a window like daily_increase_14d, default cumulative
+        countries: comma separated country names, default all countries
+        start, end: first and last date to include as YYYY-MM-DD, default all dates
+        format: json or csv, default from the Accept header
+    """
+    snapshot = data_store.snapshot
+    cube = snapshot.cube
+    source = flask.request.args.get("source", "confirmed")
+    metric = flask.request.args.get("metric", "cumulative")
+    if source not in cube.sources:
+        raise _BadRequest(f"Unknown source {source}, use one of {cube.sources}")
+    try:
+        parse_metric(metric)
+    except KeyError:
+        raise _BadRequest(f"Unknown metric {metric}, use one of {cube.metrics}")
+
+    countries = flask.request.args.get("countries")
+    countries = (
+        list(dict.fromkeys(c.strip() for c in countries.split(",") if c.strip()))
+        if countries
+        else cube.countries
+    )
+    unknown = [c for c in countries if c not in cube.country_ids]
+    if unknown:
+        raise _BadRequest(f"Unknown countries {unknown}")
+
+    start, end = _parse_date("start"), _parse_date("end")
+    first = cube.dates.searchsorted(start) if start else 0
+    last = cube.dates.searchsorted(end, side="right") if end else cube.num_days
+    mimetype = _mimetype()
+    key = f"{snapshot.version}|{source}|{metric}|{','.join(countries)}|{first}|{last}"
+
+    def _render() -> str:
+        names, values = cube.select(source, metric, countries)
+        values = values[:, first:last]
+        dates = [f"{d:%Y-%m-%d}" for d in cube.dates[first:last]]
+        if mimetype == CSV_TYPE:
+            return _to_csv(names, dates, values)
+        return _to_json(snapshot.version, source, metric, names, dates, values)
+
+    return _cached_response(key, mimetype, _render)
+
+
+def _to_json(
+    version: str,
+    source: str,
+    metric: str,
+    names: List[str],
+    dates: List[str],
+    values: np.ndarray,
+) -> str:
+    """Countries map to their values by date, missing values are null."""
+    rows = np.where(np.isfinite(values), values, None).tolist()
+    return json.dumps(
+        {
+            "version": version,
+            "source": source,
+            "metric": metric,
+            "dates": dates,
+            "countries": dict(zip(names, rows)),
+        }
+    )
+
+
+def _to_csv(names: List[str], dates: List[str], values: np.ndarray) -> str:
+    """One row per country and one column per date like the JHU files, missing values are empty."""
+    df = pd.DataFrame(values, index=pd.Index(names, name="Country"), columns=dates)
+    return df.to_csv()
@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import plotly
+
+logger = logging.getLogger(__name__)
+
+# megabytes of serialized figures kept per process, the least recently used ones are dropped beyond it
+FIGURE_CACHE_BUDGET = float(os.environ.get("FIGURE_CACHE_BUDGET", 64))
+
+
+def _normalize(value: Any) -> Hashable:
+    """Turn callback inputs (lists, dicts from the browser) into hashable cache key components."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    return value
+
+
+def _serialized_size(figure: Any) -> int:
+    """The size of a figure in the JSON response of a callback."""
+    return len(json.dumps(figure, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+class FigureCache:
+    """Bounded, thread safe LRU cache for figure dicts returned by the Dash callbacks.
+
+    Entries are keyed on the normalized inputs of the figure function together with a data version token.
+    When the token returned by `get_data_version` changes, the underlying data was reloaded and the cache clears itself.
+    Figures range from a few kB to several MB for animations, so the cache is bounded by their serialized size rather
+    than their number, measured once when a figure is added.
+    """
+
+    def __init__(
+        self,
+        get_data_version: Callable[[], Hashable],
+        memory_budget: float = FIGURE_CACHE_BUDGET,
+    ):
+        self.max_bytes = memory_budget * 2 ** 20
+        self.nbytes = 0
+        self._get_data_version = get_data_version
+        self._data_version = None
+        self._figures = OrderedDict()  # type: OrderedDict[Hashable, Tuple[Dict, int]]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def memoize(self, fn: Callable[..., Dict]) -> Callable[..., Dict]:
+        """Decorator caching the figure returned by `fn` for each distinct set of arguments."""
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (fn.__name__, _normalize(args), _normalize(kwargs))
+            return self.get_or_create(key, lambda: fn(*args, **kwargs))
+
+        return wrapper
+
+    def get_or_create(self, key: Hashable, create: Callable[[], Dict]) -> Dict:
+        data_version = self._get_data_version()
+        with self._lock:
+            if data_version != self._data_version:
+                if self._figures:
+                    logger.info(f"Data version is now {data_version}, clearing cache")
+                self._clear()
+                self._data_version = data_version
+
+            entry = self._figures.get(key)
+            if entry is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # build and measure outside the lock so slow figures don't serialize unrelated requests
+        figure = create()
+        size = _serialized_size(figure)
+        with self._lock:
+            if data_version == self._data_version and key not in self._figures:
+                self._figures[key] = figure, size
+                self.nbytes += size
+                # the newest figure is kept even if it is larger than the whole budget
+                while self.nbytes > self.max_bytes and len(self._figures) > 1:
+                    _, (_, evicted_size) = self._figures.popitem(last=False)
+                    self.nbytes -= evicted_size
+        return figure
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._figures.clear()
+        self.nbytes = 0
+
+    def info(self) -> Dict[str, Any]:
+        """Return the hit/miss counters and current size, in the spirit of `functools.lru_cache.cache_info`."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._figures),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "data_version": self._data_version,
+            }
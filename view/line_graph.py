@@ -1,87 +1,143 @@
 import dash_core_components as dcc
 import dash_html_components as html
 
-from model import corona_country_data, corona_table_data
+from model import data_store
+from model.derived import DEFAULT_WINDOW, MAX_WINDOW
 from .utils import create_popover
 
 # use a default number of countries on first page load
 FIRST_N_COUNTRIES = 12
 
+# default number of cases which marks day 0 in the "Development Since N" view
+DEFAULT_SINCE_THRESHOLD = 100
+
+# views of averaged daily counts, which can be smoothed over a selectable number of days
+SMOOTHED_VIEWS = ["daily_increase", "growth"]
+
 # extract out because we dont want to show "Development X" in case_fatality view
 line_graph_view_options = [
     {"label": "Cumulative ", "value": "cumulative"},
     {"label": "Daily Increase  ", "value": "daily_increase"},
     {"label": "Trajectory ", "value": "trajectory"},
-    {"label": "Development 100 ", "value": "since_100"},
-    {"label": "Development 10 ", "value": "since_10"},
+    {"label": "Development Since N ", "value": "since_n"},
     # {"label": "Growth Factor  ", "value": "growth"},
 ]
 
-# just an example of the data we expect, so we can build the controls around it
-ts_df_example = corona_country_data["confirmed"]["cumulative"].copy()
+_line_graph_popover = create_popover("assets/about_line.md", "line-graph")
 
-# just the controls for the graph
-_line_graph_control_panel = html.Div(
-    [
-        create_popover("assets/about_line.md", "line-graph"),
-        html.P("Data Source:", className="control_label"),
-        dcc.Dropdown(
-            id="data_source",
-            options=[
-                {"label": "Confirmed Cases ", "value": "confirmed"},
-                {"label": "Deaths  ", "value": "deaths"},
-                {"label": "Recovered  ", "value": "recovered"},
-                {"label": "Case Fatality Ratio ", "value": "case_fatality"},
-            ],
-            value="confirmed",
-            multi=False,
-            className="dcc_control",
-        ),
-        html.P("View:", className="control_label"),
-        dcc.Dropdown(
-            id="line_graph_view",
-            options=line_graph_view_options,
-            value="trajectory",
-            multi=False,
-            className="dcc_control",
-        ),
-        html.P("Scaling:", className="control_label"),
-        dcc.RadioItems(
-            id="line_graph_scaler",
-            options=[
-                {"label": "  Log  ", "value": "log"},
-                {"label": "  Linear  ", "value": "linear"},
-            ],
-            value="log",
-            labelStyle={"display": "inline-block"},
-            className="dcc_control",
-        ),
-        html.P("Countries:", className="control_label"),
-        dcc.Dropdown(
-            id="countries",
-            options=[{"label": c, "value": c} for c in ts_df_example.index],
-            multi=True,
-            value=list(corona_table_data["Country"].iloc[:FIRST_N_COUNTRIES]),
-            className="dcc_control",
-        ),
-        # date slider wrapped in another div so we can hide it when trajectory not set
-        html.Div(
-            [
-                html.P("Date:", id="current_date", className="control_label",),
-                dcc.Slider(
-                    id="date_slider",
-                    min=0,
-                    max=len(ts_df_example.columns) - 1,
-                    step=1,
-                    value=len(ts_df_example.columns) - 1,
-                ),
-            ],
-            id="date_slider_div",
-            style={"display": "none"},
-        ),
-    ],
-    className="pretty_container three columns",
-)
+
+def _line_graph_control_panel() -> html.Div:
+    """Just the controls for the graph, with the countries and dates of the current data."""
+    cube = data_store.snapshot.cube
+    corona_table_data = data_store.snapshot.corona_table_data
+    return html.Div(
+        [
+            _line_graph_popover,
+            html.P("Data Source:", className="control_label"),
+            dcc.Dropdown(
+                id="data_source",
+                options=[
+                    {"label": "Confirmed Cases ", "value": "confirmed"},
+                    {"label": "Deaths  ", "value": "deaths"},
+                    {"label": "Recovered  ", "value": "recovered"},
+                    {"label": "Case Fatality Ratio ", "value": "case_fatality"},
+                    {"label": "Active Cases ", "value": "active_cases"},
+                ],
+                value="confirmed",
+                multi=False,
+                className="dcc_control",
+            ),
+            html.P("View:", className="control_label"),
+            dcc.Dropdown(
+                id="line_graph_view",
+                options=line_graph_view_options,
+                value="trajectory",
+                multi=False,
+                className="dcc_control",
+            ),
+            html.P("Scaling:", className="control_label"),
+            dcc.RadioItems(
+                id="line_graph_scaler",
+                options=[
+                    {"label": "  Log  ", "value": "log"},
+                    {"label": "  Linear  ", "value": "linear"},
+                ],
+                value="log",
+                labelStyle={"display": "inline-block"},
+                className="dcc_control",
+            ),
+            html.P("Countries:", className="control_label"),
+            dcc.Dropdown(
+                id="countries",
+                options=[{"label": c, "value": c} for c in cube.countries],
+                multi=True,
+                value=list(corona_table_data["Country"].iloc[:FIRST_N_COUNTRIES]),
+                className="dcc_control",
+            ),
+            # the subregions of a region replace the countries in the graph, options are filled in for the countries
+            html.P("Region:", className="control_label"),
+            dcc.Dropdown(
+                id="region",
+                options=[],
+                placeholder="All Countries",
+                multi=False,
+                className="dcc_control",
+            ),
+            # threshold input wrapped in another div so we can hide it when since_n not set
+            html.Div(
+                [
+                    html.P("Since N Cases:", className="control_label"),
+                    dcc.Input(
+                        id="since_threshold",
+                        type="number",
+                        min=0,
+                        value=DEFAULT_SINCE_THRESHOLD,
+                        debounce=True,
+                        className="dcc_control",
+                    ),
+                ],
+                id="since_threshold_div",
+                style={"display": "none"},
+            ),
+            # smoothing window wrapped in another div so we can hide it for views which are not smoothed
+            html.Div(
+                [
+                    html.P("Smoothing (days):", className="control_label"),
+                    dcc.Slider(
+                        id="smoothing_window",
+                        min=1,
+                        max=MAX_WINDOW,
+                        step=1,
+                        value=DEFAULT_WINDOW,
+                        marks={d: str(d) for d in [1, 7, 14, 21, MAX_WINDOW]},
+                    ),
+                ],
+                id="smoothing_window_div",
+                style={"display": "none"},
+            ),
+            # date slider wrapped in another div so we can hide it when trajectory not set
+            html.Div(
+                [
+                    html.P("Date:", id="current_date", className="control_label",),
+                    dcc.Slider(
+                        id="date_slider",
+                        min=0,
+                        max=cube.num_days - 1,
+                        step=1,
+                        value=cube.num_days - 1,
+                    ),
+                    dcc.Checklist(
+                        id="trajectory_animate",
+                        options=[{"label": " Animate All Dates", "value": "animate"}],
+                        value=[],
+                    ),
+                ],
+                id="date_slider_div",
+                style={"display": "none"},
+            ),
+        ],
+        className="pretty_container three columns",
+    )
 
 
 # just the graph
@@ -93,6 +149,8 @@ _line_graph_panel = html.Div(
                     id="count_graph",
                     config={"editable": True, "displayModeBar": False},
                 ),
+                # figure built on the server, before the hovered country is highlighted in the browser
+                dcc.Store(id="count_graph_data"),
             ],
             className="pretty_container",
         ),
@@ -100,6 +158,8 @@ _line_graph_panel = html.Div(
     className="nine columns",
 )
 
-line_graph_panel = html.Div(
-    [_line_graph_control_panel, _line_graph_panel], className="row flex-display",
-)
+
+def line_graph_panel() -> html.Div:
+    return html.Div(
+        [_line_graph_control_panel(), _line_graph_panel], className="row flex-display",
+    )
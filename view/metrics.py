@@ -0,0 +1,158 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import dash
+from dash.exceptions import PreventUpdate
+
+from view.figure_cache import FigureCache
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# upper bounds of the histogram buckets, in seconds and bytes
+LATENCY_BUCKETS = (1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1e3, 1e4, 1e5, 2.5e5, 1e6, 2.5e6, 1e7)
+
+# metric name, FigureCache.info key, type and description of the cache metrics
+_CACHE_METRICS = [
+    ("figure_cache_hits_total", "hits", "counter", "Figure cache hits."),
+    ("figure_cache_misses_total", "misses", "counter", "Figure cache misses."),
+    ("figure_cache_hit_ratio", "hit_rate", "gauge", "Share of cache hits."),
+    ("figure_cache_size", "size", "gauge", "Number of cached figures."),
+    ("figure_cache_bytes", "bytes", "gauge", "Serialized size of the cached figures."),
+    ("figure_cache_max_bytes", "max_bytes", "gauge", "Cache capacity in bytes."),
+]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+class _Histogram:
+    """Bucket counts, sum and count of observations, like a Prometheus histogram."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        bounds = [str(float(b)) for b in self.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class CallbackMetrics:
+    """Wall time and response size of every server side Dash callback, exported in the Prometheus text format.
+
+    Dash serializes the output of a callback to JSON inside the function it registers, so wrapping the registered
+    function measures the full time of a request's callback work and the exact size of the response body.
+    """
+
+    def __init__(
+        self,
+        latency_buckets: Sequence[float] = LATENCY_BUCKETS,
+        size_buckets: Sequence[float] = SIZE_BUCKETS,
+    ):
+        self.latency_buckets = latency_buckets
+        self.size_buckets = size_buckets
+        self._latencies = {}  # type: Dict[str, _Histogram]
+        self._sizes = {}  # type: Dict[str, _Histogram]
+        self._calls = {}  # type: Dict[Tuple[str, str], int]
+        self._lock = threading.Lock()
+
+    def instrument(self, app: dash.Dash) -> int:
+        """Wrap all callbacks registered on the app so far, returns how many were newly wrapped.
+
+        Call it after the last callback is registered, including the ones registered in loops.
+        """
+        instrumented = 0
+        for callback_id, callback in app.callback_map.items():
+            # clientside callbacks never reach the server
+            fn = callback.get("callback")
+            if fn is None or getattr(fn, "_instrumented", False):
+                continue
+            callback["callback"] = self._wrap(callback_id, fn)
+            instrumented += 1
+        return instrumented
+
+    def _wrap(self, callback_id: str, fn: Callable[..., str]) -> Callable[..., str]:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            response = None
+            try:
+                response = fn(*args, **kwargs)
+                outcome = "ok"
+                return response
+            except PreventUpdate:
+                outcome = "prevented"
+                raise
+            finally:
+                size = len(response) if response is not None else None
+                self.observe(callback_id, time.perf_counter() - start, size, outcome)
+
+        wrapper._instrumented = True
+        return wrapper
+
+    def observe(self, callback_id: str, seconds: float, size: int, outcome: str):
+        with self._lock:
+            if callback_id not in self._latencies:
+                self._latencies[callback_id] = _Histogram(self.latency_buckets)
+                self._sizes[callback_id] = _Histogram(self.size_buckets)
+            self._latencies[callback_id].observe(seconds)
+            if size is not None:
+                self._sizes[callback_id].observe(size)
+            key = (callback_id, outcome)
+            self._calls[key] = self._calls.get(key, 0) + 1
+
+    def render(self, caches: Dict[str, FigureCache] = None) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP dash_callback_duration_seconds Wall time of Dash callbacks, including JSON serialization.",
+            "# TYPE dash_callback_duration_seconds histogram",
+        ]
+        with self._lock:
+            for callback_id, histogram in sorted(self._latencies.items()):
+                labels = f'callback="{_escape(callback_id)}"'
+                lines += histogram.render("dash_callback_duration_seconds", labels)
+
+            lines += [
+                "# HELP dash_callback_response_bytes Size of the serialized callback responses.",
+                "# TYPE dash_callback_response_bytes histogram",
+            ]
+            for callback_id, histogram in sorted(self._sizes.items()):
+                labels = f'callback="{_escape(callback_id)}"'
+                lines += histogram.render("dash_callback_response_bytes", labels)
+
+            lines += [
+                "# HELP dash_callback_calls_total Callback calls by outcome: ok, prevented or error.",
+                "# TYPE dash_callback_calls_total counter",
+            ]
+            for (callback_id, outcome), count in sorted(self._calls.items()):
+                labels = f'callback="{_escape(callback_id)}",outcome="{outcome}"'
+                lines.append(f"dash_callback_calls_total{{{labels}}} {count}")
+
+        cache_infos = {name: cache.info() for name, cache in (caches or {}).items()}
+        for metric, key, metric_type, description in _CACHE_METRICS:
+            lines += [
+                f"# HELP {metric} {description}",
+                f"# TYPE {metric} {metric_type}",
+            ]
+            for name, info in sorted(cache_infos.items()):
+                lines.append(f'{metric}{{cache="{_escape(name)}"}} {info[key]}')
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,174 @@
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+# a chart is a few hundred to a thousand pixels wide, more points per trace are not visible.
+# set to 0 to always send every point
+MAX_TRACE_POINTS = int(os.environ.get("MAX_TRACE_POINTS", 1000))
+
+# an animation sends every trace once per frame, so it gets fewer frames and fewer points per trace of a frame
+MAX_ANIMATION_FRAMES = int(os.environ.get("MAX_ANIMATION_FRAMES", 100))
+MAX_FRAME_POINTS = int(os.environ.get("MAX_FRAME_POINTS", 200))
+
+# values are rounded to the fewest significant digits within this relative error, 1e-4 keeps counts below 100,000
+# exact. set to 0 to send the values unrounded
+MAX_RELATIVE_ERROR = float(os.environ.get("MAX_RELATIVE_ERROR", 1e-4))
+
+
+def _log10(values: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(values > 0, np.log10(values), np.nan)
+
+
+def lttb_indices(
+    x: np.ndarray, y: np.ndarray, num_points: int, lengths: np.ndarray = None
+) -> List[np.ndarray]:
+    """Pick the points of each row of `y` that preserve its shape best, with Largest-Triangle-Three-Buckets.
+
+    The first and last point of a row are always kept, and from each bucket in between the point forming the largest
+    triangle with the previously kept point and the average of the next bucket. Every bucket is processed for all rows
+    at once, so the cost barely grows with the number of rows. Missing values never win a bucket unless the whole
+    bucket is missing.
+
+    Args:
+        x: the x values of shape (n,) shared by all rows, or of shape (rows, n)
+        y: the y values of shape (rows, n)
+        num_points: number of points to keep per row
+        lengths: number of valid values per row, if rows are padded at the end
+
+    Returns:
+        the indices of the kept points of each row, or of all points of rows with not more than num_points
+    """
+    num_rows, n = y.shape
+    lengths = np.full(num_rows, n) if lengths is None else np.asarray(lengths)
+    indices = [np.arange(length) for length in lengths]
+    rows = np.flatnonzero(lengths > num_points)
+    if num_points < 3 or not len(rows):
+        return indices
+
+    x = np.broadcast_to(x, y.shape)[rows].astype(float)
+    y = y[rows].astype(float)
+    lengths = lengths[rows]
+    finite = np.isfinite(x) & np.isfinite(y) & (np.arange(n) < lengths[:, None])
+
+    # prefix sums to average the next bucket of every row in O(1)
+    def _prefix_sum(values: np.ndarray) -> np.ndarray:
+        return np.hstack([np.zeros((len(rows), 1)), np.cumsum(values, axis=1)])
+
+    sum_finite = _prefix_sum(finite)
+    sum_x = _prefix_sum(np.where(finite, x, 0.0))
+    sum_y = _prefix_sum(np.where(finite, y, 0.0))
+
+    # num_points - 2 buckets per row between the first and the last point, then the last point alone
+    # in integers, a float ratio can round an edge down by one
+    edges = 1 + (lengths[:, None] - 2) * np.arange(num_points - 1) // (num_points - 2)
+    edges = np.hstack([edges, lengths[:, None]])
+    offsets = np.arange(np.diff(edges[:, :-1], axis=1).max())
+    r = np.arange(len(rows))
+
+    kept = np.empty((len(rows), num_points), dtype=int)
+    kept[:, 0] = 0
+    kept[:, -1] = lengths - 1
+    previous = np.zeros(len(rows), dtype=int)
+    for i in range(num_points - 2):
+        start, end, next_end = edges[:, i], edges[:, i + 1], edges[:, i + 2]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            count = sum_finite[r, next_end] - sum_finite[r, end]
+            next_x = (sum_x[r, next_end] - sum_x[r, end]) / count
+            next_y = (sum_y[r, next_end] - sum_y[r, end]) / count
+
+        candidates = start[:, None] + offsets
+        in_bucket = candidates < end[:, None]
+        candidates = np.minimum(candidates, n - 1)
+        x_a, y_a = x[r, previous], y[r, previous]
+        area = np.abs(
+            (x_a - next_x)[:, None] * (y[r[:, None], candidates] - y_a[:, None])
+            - (x_a[:, None] - x[r[:, None], candidates]) * (next_y - y_a)[:, None]
+        )
+        # prefer finite areas, then finite points, so gaps stay gaps
+        fallback = np.where(finite[r[:, None], candidates], -1, -2)
+        area = np.where(np.isfinite(area), area, fallback)
+        area[~in_bucket] = -3
+        previous = candidates[r, np.argmax(area, axis=1)]
+        kept[:, i + 1] = previous
+
+    for row, row_kept in zip(rows, kept):
+        indices[row] = row_kept
+    return indices
+
+
+def downsample_indices(
+    x: np.ndarray,
+    y: np.ndarray,
+    num_points: int = MAX_TRACE_POINTS,
+    log_x: bool = False,
+    log_y: bool = False,
+    lengths: np.ndarray = None,
+) -> List[np.ndarray]:
+    """Return the indices of the points to keep of each row of `y`, judging shapes on the scale of the axes."""
+    if not num_points:
+        num_points = y.shape[1]
+    return lttb_indices(
+        _log10(x) if log_x else x,
+        _log10(y) if log_y else y,
+        num_points,
+        lengths,
+    )
+
+
+def frame_days(
+    first_day: int, num_days: int, max_frames: int = MAX_ANIMATION_FRAMES
+) -> np.ndarray:
+    """Return the days of the frames of an animation, evenly spaced from the first day and always ending on the last day.
+
+    Set `max_frames` to 0 for a frame on every day.
+    """
+    days = np.arange(first_day, num_days)
+    if not max_frames or len(days) <= max_frames:
+        return days
+    stride = int(np.ceil(len(days) / max_frames))
+    return days[::-1][::stride][::-1]
+
+
+def downsample_traces(
+    traces: List[Tuple[np.ndarray, np.ndarray]],
+    num_points: int = MAX_TRACE_POINTS,
+    log_x: bool = False,
+    log_y: bool = False,
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Downsample (x, y) traces of different lengths together, by padding them into one array."""
+    lengths = np.array([len(x) for x, _ in traces], dtype=int)
+    if not len(traces) or not num_points or lengths.max() <= num_points:
+        return traces
+
+    x = np.full((len(traces), lengths.max()), np.nan)
+    y = np.full((len(traces), lengths.max()), np.nan)
+    for i, (trace_x, trace_y) in enumerate(traces):
+        x[i, : len(trace_x)] = trace_x
+        y[i, : len(trace_y)] = trace_y
+    indices = downsample_indices(x, y, num_points, log_x, log_y, lengths)
+    return [
+        (trace_x[idx], trace_y[idx]) for (trace_x, trace_y), idx in zip(traces, indices)
+    ]
+
+
+def round_relative(
+    values: np.ndarray, max_relative_error: float = MAX_RELATIVE_ERROR
+) -> np.ndarray:
+    """Round each value to the fewest significant digits within the relative error, so it serializes compactly.
+
+    Rounding to d significant digits has a relative error of at most 0.5 * 10 ** (1 - d).
+    """
+    values = np.asarray(values, dtype=float)
+    if not max_relative_error or not values.size:
+        return values
+    digits = int(np.ceil(1 - np.log10(2 * max_relative_error)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        magnitude = np.floor(np.log10(np.abs(values)))
+    decimals = np.where(np.isfinite(magnitude), digits - 1 - magnitude, 0)
+
+    # divide and multiply by exact powers of ten, so the results are the closest floats to the rounded decimals
+    positive = 10.0 ** np.maximum(decimals, 0)
+    negative = 10.0 ** np.maximum(-decimals, 0)
+    return np.round(values * positive / negative) * negative / positive
@@ -0,0 +1,91 @@
+import dash_core_components as dcc
+import dash_html_components as html
+
+from model import data_store
+from .utils import create_popover
+
+# metrics of the JHU time series which can color the map
+world_map_metric_options = [
+    {"label": "Cumulative ", "value": "cumulative"},
+    {"label": "Daily Increase ", "value": "daily_increase"},
+    {"label": "Cumulative per 1M ", "value": "cumulative_per_1m"},
+    {"label": "Daily Increase per 1M ", "value": "daily_increase_per_1m"},
+]
+
+_world_map_popover = create_popover("assets/about_map.md", "world-map")
+
+
+def _world_map_control_panel() -> html.Div:
+    """Just the controls for the map, with the dates of the current data."""
+    cube = data_store.snapshot.cube
+    return html.Div(
+        [
+            _world_map_popover,
+            html.P("Data Source:", className="control_label"),
+            dcc.Dropdown(
+                id="map_data_source",
+                options=[
+                    {"label": "Confirmed Cases ", "value": "confirmed"},
+                    {"label": "Deaths  ", "value": "deaths"},
+                    {"label": "Recovered  ", "value": "recovered"},
+                    {"label": "Case Fatality Ratio ", "value": "case_fatality"},
+                    {"label": "Active Cases ", "value": "active_cases"},
+                ],
+                value="confirmed",
+                multi=False,
+                className="dcc_control",
+            ),
+            html.P("Metric:", className="control_label"),
+            dcc.Dropdown(
+                id="map_metric",
+                options=world_map_metric_options,
+                value="cumulative_per_1m",
+                multi=False,
+                className="dcc_control",
+            ),
+            html.P("Scaling:", className="control_label"),
+            dcc.RadioItems(
+                id="map_scaler",
+                options=[
+                    {"label": "  Log  ", "value": "log"},
+                    {"label": "  Linear  ", "value": "linear"},
+                ],
+                value="log",
+                labelStyle={"display": "inline-block"},
+                className="dcc_control",
+            ),
+            html.P("Date:", className="control_label"),
+            dcc.Slider(
+                id="map_date_slider",
+                min=0,
+                max=cube.num_days - 1,
+                step=1,
+                value=cube.num_days - 1,
+            ),
+        ],
+        className="pretty_container three columns",
+    )
+
+
+# just the map
+_world_map_graph_panel = html.Div(
+    [
+        html.Div(
+            [
+                dcc.Graph(id="world_map", config={"displayModeBar": False}),
+                # the map without values is only rebuilt for another metric, the slider only changes the values
+                dcc.Store(id="world_map_base"),
+                dcc.Store(id="world_map_values"),
+            ],
+            className="pretty_container",
+        ),
+    ],
+    className="nine columns",
+)
+
+
+def world_map_panel() -> html.Div:
+    return html.Div(
+        [_world_map_control_panel(), _world_map_graph_panel],
+        className="row flex-display",
+    )